@@ -1,17 +1,17 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from adjustText import adjust_text
-from sklearn.cluster import KMeans
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure, COUNTRY_RU, POSITION_GROUPS
+from china_trace import stage
+from label_placer import place_labels
+from china_clusters import fit_clusters, request_period
+
+COLUMNS = ['gdi_idx', 'gsi_idx']
+OUTPUTS = ['Clusters_Positions_Shapes.jpg']
+PARAMS = ('periods',)
 
 # Группировка стран
-GROUPS_MAP = {
-    "SUPPORTED_ALL": ["Bhutan", "Kazakhstan", "Kyrgyzstan", "Laos", "Mongolia", "Myanmar", "Pakistan", "Russia", "Tajikistan", "Malaysia", "Brunei"],
-    "PARTIALLY": ["Nepal", "Vietnam", "Philippines", "Indonesia"],
-    "NOTHING_SAID": ["Afghanistan", "North Korea", "South Korea"],
-    "NOT_SUPPORTED": ["India", "Japan"]
-}
+GROUPS_MAP = POSITION_GROUPS
 
 POS_COLORS = {
     "SUPPORTED_ALL": "#27AE60", # Зеленый
@@ -33,16 +33,12 @@ def get_pos_group(name):
         if name in v: return k
     return "NOTHING_SAID"
 
-df, _, _, _ = load_data()
 
-if df is not None:
-    # Берем данные за последние годы для актуальности
-    recent_df = df[df['year'] >= 2021]
-    stats = recent_df.groupby('recipient')[['gdi_idx', 'gsi_idx']].mean().reset_index()
-    
-    # Считаем кластеры
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10).fit(stats[['gdi_idx', 'gsi_idx']])
-    stats['cluster'] = kmeans.labels_
+def render(df, periods=None):
+    # Средние за период (по умолчанию 2021+) и кластеры — общая подгонка с Dynamic_Clusters
+    fit = fit_clusters(df, period=request_period(periods))
+    stats = fit.stats.reset_index()
+    stats['cluster'] = fit.labels.to_numpy()
     stats['pos_group'] = stats['recipient'].apply(get_pos_group)
     stats['recipient_ru'] = stats['recipient'].map(COUNTRY_RU).fillna(stats['recipient'])
 
@@ -66,7 +62,8 @@ if df is not None:
     # Подписи стран
     texts = [ax.text(row['gdi_idx'], row['gsi_idx'], row['recipient_ru'], 
                      fontweight='bold', fontsize=11) for i, row in stats.iterrows()]
-    adjust_text(texts, arrowprops=dict(arrowstyle='->', color='#BDC3C7', lw=1))
+    with stage('place_labels'):
+        place_labels(texts, sizes=[750] * len(texts), arrowprops=dict(arrowstyle='->', color='#BDC3C7', lw=1))
 
     ax.set_xlabel('Интенсивность экономического взаимодействия (GDI) →', fontweight='bold', fontsize=12)
     ax.set_ylabel('Интенсивность военного сотрудничества (GSI) →', fontweight='bold', fontsize=12)
@@ -92,5 +89,10 @@ if df is not None:
     add_source(fig, CUSTOM_SOURCES, use_default=False)
     
     plt.subplots_adjust(bottom=0.18, top=0.98, left=0.1, right=0.9)
-    plt.savefig('Clusters_Positions_Shapes.jpg', dpi=300)
-    print("Сохранен Clusters_Positions_Shapes.jpg")
\ No newline at end of file
+    save_figure('Clusters_Positions_Shapes.jpg')
+    print("Сохранен Clusters_Positions_Shapes.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
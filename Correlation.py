@@ -1,8 +1,12 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-from china_config import load_data, add_source, GDI_COLS, GSI_COLS, GCI_COLS
+from china_config import load_data, add_source, save_figure, GDI_COLS, GSI_COLS, GCI_COLS
+from china_trace import stage
+from china_correlation import corr_frame
+
+COLUMNS = GDI_COLS + GSI_COLS + GCI_COLS
+OUTPUTS = ['5_Correlation.jpg']
 
-df, _, _, _ = load_data()
 
 RU_LABELS = {
     'dev_02_infrastructure_usd': 'Инфраструктура',
@@ -16,20 +20,27 @@ RU_LABELS = {
     'civ_04_csps_ct': 'Медиа'
 }
 
-if df is not None:
+def render(df):
     plt.figure(figsize=(12, 10))
     cols = GDI_COLS + GSI_COLS + GCI_COLS
-    corr_data = df[cols].corr()
+    with stage('data'):
+        corr_data = corr_frame(df[cols])
     
     corr_data.columns = [RU_LABELS.get(c, c) for c in corr_data.columns]
     corr_data.index = [RU_LABELS.get(c, c) for c in corr_data.index]
     
-    sns.heatmap(corr_data, annot=True, cmap='coolwarm', center=0, fmt=".2f",
-                linewidths=1, linecolor='white')
+    with stage('heatmap'):
+        sns.heatmap(corr_data, annot=True, cmap='coolwarm', center=0, fmt=".2f",
+                    linewidths=1, linecolor='white')
     
     # plt.title('Взаимосвязь инструментов влияния КНР', fontsize=16, fontweight='bold')
     plt.xticks(rotation=45, ha='right')
     add_source(plt.gcf())
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
-    plt.savefig('5_Correlation.jpg', dpi=300)
-    print("Сохранен Correlation.jpg")
\ No newline at end of file
+    save_figure('5_Correlation.jpg')
+    print("Сохранен Correlation.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
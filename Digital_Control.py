@@ -1,17 +1,21 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure, COUNTRY_RU
+from china_trace import stage
 
-df, _, _, _ = load_data()
 col_surv = 'sec_02_surveillance_usd'
 
-if df is not None:
+COLUMNS = [col_surv]
+OUTPUTS = ['Digital_Surveillance_Comp.jpg']
+
+def render(df):
     # Разделяем на периоды
-    df['period'] = df['year'].apply(lambda x: '2013-2020 (BRI)' if 2013 <= x <= 2020 else '2021+ (GSI Era)' if x >= 2021 else 'Other')
+    with stage('data'):
+        df = df.assign(period=df['year'].apply(lambda x: '2013-2020 (BRI)' if 2013 <= x <= 2020 else '2021+ (GSI Era)' if x >= 2021 else 'Other'))
     
-    # Считаем среднегодовые расходы, чтобы сравнение было честным (периоды разной длины)
-    stats = df[df['period'] != 'Other'].groupby(['period', 'recipient'])[col_surv].mean().reset_index()
+        # Считаем среднегодовые расходы, чтобы сравнение было честным (периоды разной длины)
+        stats = df[df['period'] != 'Other'].groupby(['period', 'recipient'])[col_surv].mean().reset_index()
     
     # Берем ТОП-8 стран по суммарной активности
     top_recipients = stats.groupby('recipient')[col_surv].sum().sort_values(ascending=False).head(8).index
@@ -30,4 +34,9 @@ if df is not None:
     plt.legend(loc='upper center', bbox_to_anchor=(0.5, -0.12), ncol=2, frameon=True)
     add_source(plt.gcf())
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
-    plt.savefig('Digital_Surveillance_Comp.jpg', dpi=300)
\ No newline at end of file
+    save_figure('Digital_Surveillance_Comp.jpg')
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
@@ -1,22 +1,24 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from adjustText import adjust_text
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure, COUNTRY_RU
+from china_trace import stage
+from label_placer import place_labels
+from china_clusters import fit_clusters, period_features, request_period
 
-# Загружаем данные
-df, _, _, col_visits = load_data()
+COLUMNS = ['gdi_idx', 'gsi_idx', 'sec_03_military_engagement_ct']
+OUTPUTS = ['Clusters.jpg']
+PARAMS = ('periods',)
 
-if df is not None:
-    # 1. Подготовка данных
-    recent_df = df[df['year'] >= 2021].copy()
-    stats = recent_df.groupby('recipient')[['gdi_idx', 'gsi_idx', col_visits]].mean().reset_index()
+def render(df, col_visits='sec_03_military_engagement_ct', periods=None):
+    # 1. Подготовка данных: средние за период (по умолчанию 2021+)
+    period = request_period(periods)
+    with stage('data'):
+        stats = period_features(df, ['gdi_idx', 'gsi_idx', col_visits], period).reset_index()
     
-    # 2. Кластерный анализ
-    X = stats[['gdi_idx', 'gsi_idx']]
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
-    stats['cluster'] = kmeans.fit_predict(X)
+    # 2. Кластерный анализ (та же подгонка, что в Clusters_Positions)
+    fit = fit_clusters(df, period=period)
+    stats['cluster'] = stats['recipient'].map(fit.labels)
     
     stats['name_ru'] = [COUNTRY_RU.get(c, c) for c in stats['recipient']]
 
@@ -40,7 +42,7 @@ if df is not None:
     }
 
     # 4. Отрисовка
-    texts = []
+    texts, sizes = [], []
     for i, row in stats.iterrows():
         cluster = row['cluster']
         is_russia = row['recipient'] == 'Russia'
@@ -56,11 +58,13 @@ if df is not None:
                    edgecolors='black', alpha=0.85, 
                    zorder=10 if is_russia else 3)
         
+        sizes.append(size)
         texts.append(ax.text(row['gdi_idx'], row['gsi_idx'], row['name_ru'], 
                              fontweight='bold' if is_russia else 'normal',
                              fontsize=12 if is_russia else 10))
 
-    adjust_text(texts, arrowprops=dict(arrowstyle='->', color='gray', lw=0.5))
+    with stage('place_labels'):
+        place_labels(texts, sizes=sizes, arrowprops=dict(arrowstyle='->', color='gray', lw=0.5))
 
     # ax.set_title('Кластерный анализ стратегий взаимодействия Китая с соседями (2021-2024)', fontsize=18, fontweight='bold', pad=25)
     ax.set_xlabel('Индекс экономического взаимодействия (FDI + Swaps) →', fontweight='bold')
@@ -86,5 +90,10 @@ if df is not None:
     add_source(fig)
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
     
-    plt.savefig('Clusters.jpg', dpi=300)
-    print("Сохранен Clusters.jpg")
\ No newline at end of file
+    save_figure('Clusters.jpg')
+    print("Сохранен Clusters.jpg")
+
+if __name__ == "__main__":
+    df, _, _, col_visits = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df, col_visits)
@@ -1,50 +1,27 @@
 import matplotlib.pyplot as plt
-import pandas as pd
-from matplotlib.lines import Line2D
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure
+from dumbbell_charts import compare_metric, finish, draw_dumbbell, legend_handles, split_periods, span_label, PRE
 
-df, _, _, _ = load_data()
+COLUMNS = ['civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct']
+OUTPUTS = ['Humanitarian_Dumbbell.jpg']
+PARAMS = ('periods',)
 
-if df is not None:
-    # 1. Формируем метрику "Гуманитарка"
-    df['civ_activity'] = (df['civ_02_healthcare_ct'] + 
-                          df['civ_06_ci_ct'] + 
-                          df['civ_05_judicial_engagement_ct'])
-
-    # 2. Считаем СРЕДНЕЕ в год
-    df_bri = df[(df['year'] >= 2013) & (df['year'] <= 2020)].groupby('recipient')['civ_activity'].mean()
-    df_new = df[df['year'] >= 2021].groupby('recipient')['civ_activity'].mean()
-    
-    comp = pd.DataFrame({'Pre-2021': df_bri, 'Post-2021': df_new}).fillna(0)
-    comp['diff'] = comp['Post-2021'] - comp['Pre-2021']
+def render(df, periods=None):
+    pre, post = split_periods(periods)
+    # 1. Метрика "Гуманитарка" (сумма событий), СРЕДНЕЕ в год
+    comp = compare_metric(df, COLUMNS, pre, post)
     
-    comp = comp.sort_values('diff', ascending=True)
-    subset = comp[(comp['Pre-2021'] > 0) | (comp['Post-2021'] > 0)].copy()
-    
-    labels = [COUNTRY_RU.get(c, c) for c in subset.index]
+    comp = finish(comp, fill=0)
+    subset = comp[(comp['pre'] > 0) | (comp['post'] > 0)].copy()
     
     fig, ax = plt.subplots(figsize=(13, 10))
-    
-    ax.hlines(y=range(len(subset)), xmin=subset['Pre-2021'], xmax=subset['Post-2021'], 
-              color='gray', alpha=0.4, linewidth=2)
-    
-    ax.scatter(subset['Pre-2021'], range(len(subset)), color='#95A5A6', marker='o', s=120, zorder=3)
-    for i, val in enumerate(subset['diff']):
-        m_style = 's' if val < 0 else 'o'
-        m_color = '#E74C3C' if val < 0 else '#27AE60'
-        ax.scatter(subset['Post-2021'].iloc[i], i, color=m_color, marker=m_style, s=180, zorder=4)
-    
-    ax.set_yticks(range(len(subset)))
-    ax.set_yticklabels(labels, fontweight='bold', fontsize=11)
+    draw_dumbbell(ax, subset)
     
     # ax.set_title('Гуманитарное влияние (GCI): Смена интенсивности', fontsize=18, fontweight='bold', pad=20)
     ax.set_xlabel('Среднее количество гуманитарных проектов и встреч в год (ед.)', fontweight='bold', fontsize=12)
     
-    custom_lines =[
-        Line2D([0], [0], marker='o', color='w', markerfacecolor='#95A5A6', markersize=12, label='Эпоха BRI (ср. уровень)'),
-        Line2D([0], [0], marker='o', color='w', markerfacecolor='#27AE60', markersize=12, label='Рост влияния'),
-        Line2D([0], [0], marker='s', color='w', markerfacecolor='#E74C3C', markersize=12, label='Спад влияния')
-    ]
+    pre_label = 'Эпоха BRI' if pre == PRE else span_label(pre, int(df['year'].min()), int(df['year'].max()))
+    custom_lines = legend_handles(f'{pre_label} (ср. уровень)', 'Рост влияния', 'Спад влияния')
     ax.legend(handles=custom_lines, loc='upper center', bbox_to_anchor=(0.5, -0.08), 
               ncol=3, frameon=True, borderpad=1)
     
@@ -52,5 +29,10 @@ if df is not None:
     add_source(fig, CUSTOM_SRC, use_default=False)
     
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
-    plt.savefig('Humanitarian_Dumbbell.jpg', dpi=300)
-    print("Сохранен Humanitarian_Dumbbell.jpg")
\ No newline at end of file
+    save_figure('Humanitarian_Dumbbell.jpg')
+    print("Сохранен Humanitarian_Dumbbell.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
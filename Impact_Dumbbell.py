@@ -1,48 +1,35 @@
 import matplotlib.pyplot as plt
 import pandas as pd
-from matplotlib.lines import Line2D
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure
+from dumbbell_charts import compare_metric, finish, draw_dumbbell, legend_handles, split_periods, span_label, PRE
 
-df, _, _, _ = load_data()
+COLUMNS = ['gdi_idx']
+OUTPUTS = ['Impact_Dumbbell.jpg']
+PARAMS = ('limit', 'periods')
 
-if df is not None:
-    
-    df_bri = df[(df['year'] >= 2013) & (df['year'] <= 2020)].groupby('recipient')['gdi_idx'].mean()
-    df_new = df[df['year'] >= 2021].groupby('recipient')['gdi_idx'].mean()
-    
-    comp = pd.DataFrame({'Pre-2021': df_bri, 'Post-2021': df_new}).dropna()
-    comp['diff'] = comp['Post-2021'] - comp['Pre-2021']
-    comp = comp.sort_values('diff', ascending=True)
-    
-    subset = pd.concat([comp.head(5), comp.tail(10)])
-    labels = [COUNTRY_RU.get(c, c) for c in subset.index]
+def render(df, limit=10, periods=None):
+    # limit — сколько стран с наибольшим ростом показать (плюс 5 с наибольшим спадом)
+    pre, post = split_periods(periods)
+    comp = finish(compare_metric(df, 'gdi_idx', pre, post))
+    subset = pd.concat([comp.head(5), comp.tail(limit)])
     
     fig, ax = plt.subplots(figsize=(13, 9))
-    
-    ax.hlines(y=range(len(subset)), xmin=subset['Pre-2021'], xmax=subset['Post-2021'], 
-              color='gray', alpha=0.4, linewidth=2)
-    
-    ax.scatter(subset['Pre-2021'], range(len(subset)), color='#95A5A6', marker='o', s=120, zorder=3)
-    for i, val in enumerate(subset['diff']):
-        m_style = 's' if val < 0 else 'o'
-        m_color = '#E74C3C' if val < 0 else '#27AE60'
-        ax.scatter(subset['Post-2021'].iloc[i], i, color=m_color, marker=m_style, s=180, zorder=4)
-    
-    ax.set_yticks(range(len(subset)))
-    ax.set_yticklabels(labels, fontweight='bold', fontsize=11)
+    draw_dumbbell(ax, subset)
     
     # ax.set_title('Реальная экономика (FDI): Эпоха BRI vs. Эпоха Инициатив', fontsize=16, fontweight='bold', pad=20)
     ax.set_xlabel('Индекс прямых инвестиций и свопов (0-1)', fontweight='bold')
     
-    custom_lines = [
-        Line2D([0], [0], marker='o', color='w', markerfacecolor='#95A5A6', markersize=12, label='2013-2020 (BRI)'),
-        Line2D([0], [0], marker='o', color='w', markerfacecolor='#27AE60', markersize=12, label='Рост после 2021'),
-        Line2D([0], [0], marker='s', color='w', markerfacecolor='#E74C3C', markersize=12, label='Спад после 2021')
-    ]
+    pre_label = '2013-2020 (BRI)' if pre == PRE else span_label(pre, int(df['year'].min()), int(df['year'].max()))
+    custom_lines = legend_handles(pre_label, f'Рост после {post[0]}', f'Спад после {post[0]}')
     ax.legend(handles=custom_lines, loc='upper center', bbox_to_anchor=(0.5, -0.08), 
               ncol=3, frameon=True, borderpad=1)
     
     add_source(fig)
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
-    plt.savefig('Impact_Dumbbell.jpg', dpi=300)
-    print("Сохранен Impact_Dumbbell.jpg")
\ No newline at end of file
+    save_figure('Impact_Dumbbell.jpg')
+    print("Сохранен Impact_Dumbbell.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
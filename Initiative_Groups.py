@@ -2,7 +2,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.offsetbox import AnnotationBbox
-from china_config import get_circular_flag, COUNTRY_RU, add_source
+from china_config import get_circular_flag, COUNTRY_RU, add_source, save_figure
+
+COLUMNS = []
+OUTPUTS = ['Initiative_Consensus.jpg']
 
 # Актуальные группы данных
 GROUPS = {
@@ -99,8 +102,12 @@ def plot_circular_groups():
     add_source(fig, SITE_SOURCES, use_default=False)
     
     plt.subplots_adjust(left=0.05, right=0.95, top=0.99, bottom=0.1)
-    plt.savefig("Initiative_Consensus.jpg", dpi=300)
+    save_figure("Initiative_Consensus.jpg")
     plt.close()
 
+# Данные не нужны: группы заданы вручную
+def render(df=None):
+    plot_circular_groups()
+
 if __name__ == "__main__":
-    plot_circular_groups()
\ No newline at end of file
+    render()
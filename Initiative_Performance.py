@@ -1,7 +1,14 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from china_config import load_data, add_source
+from china_config import load_data, add_source, save_figure
+from china_periods import PeriodCube
+from china_trace import stage
+
+COLUMNS = ['dev_03_fdi_usd', 'dev_02_infrastructure_usd', 'sec_01_arms_transfer_orders_ct',
+           'sec_03_military_engagement_ct', 'sec_04_joint_exercise_ct',
+           'civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct']
+OUTPUTS = ['Initiative_Performance.jpg']
 
 # Группировка стран
 GROUPS_MAP = {
@@ -16,26 +23,30 @@ def get_group(name):
         if name in v: return k
     return "UNKNOWN"
 
-df, _, _, _ = load_data()
-
-def calculate_group_performance():
-    if df is None: return
-
+def calculate_group_performance(df):
     # --- ПОДГОТОВКА МЕТРИК ---
-    df['Экономика'] = df[['dev_03_fdi_usd', 'dev_02_infrastructure_usd']].sum(axis=1) / 1e9
-    df['Безопасность'] = (df['sec_01_arms_transfer_orders_ct'] + 
-                          df['sec_03_military_engagement_ct'] + 
-                          df['sec_04_joint_exercise_ct'])
-    df['Гуманитарка'] = df[['civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct']].sum(axis=1)
-
-    df['Group'] = df['recipient'].apply(get_group)
-
-    p1 = df[df['year'].between(2013, 2020)]
-    p2 = df[df['year'].between(2021, 2024)]
+    df = df.assign(**{
+        'Экономика': df[['dev_03_fdi_usd', 'dev_02_infrastructure_usd']].sum(axis=1) / 1e9,
+        'Безопасность': (df['sec_01_arms_transfer_orders_ct'] + 
+                         df['sec_03_military_engagement_ct'] + 
+                         df['sec_04_joint_exercise_ct']),
+        'Гуманитарка': df[['civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct']].sum(axis=1),
+    })
 
     dimensions = ['Экономика', 'Безопасность', 'Гуманитарка']
     group_names = list(GROUPS_MAP.keys())
 
+    with stage('data'):
+        # Среднее по всем строкам стран группы = сумма по группе / число наблюдений
+        cube = PeriodCube(df, dimensions)
+        def group_means(start, end):
+            sums = cube.sum(start, end).groupby(get_group).sum()
+            counts = cube.count(start, end).groupby(get_group).sum()
+            return (sums / counts).reindex(group_names)
+
+        p1 = group_means(2013, 2020)
+        p2 = group_means(2021, 2024)
+
     fig, axes = plt.subplots(2, 2, figsize=(24, 17))
     
     # fig.suptitle("Сравнительный анализ внешнеполитических профилей КНР (2013-2024)\n(Среднегодовые показатели на одну страну в группе)", fontsize=28, fontweight='bold', x=0.5, y=0.97)
@@ -45,8 +56,8 @@ def calculate_group_performance():
     for i, g_name in enumerate(group_names):
         ax = axes[i // 2, i % 2]
         
-        data_p1 = [p1[p1['Group'] == g_name][d].mean() for d in dimensions]
-        data_p2 = [p2[p2['Group'] == g_name][d].mean() for d in dimensions]
+        data_p1 = [p1.loc[g_name, d] for d in dimensions]
+        data_p2 = [p2.loc[g_name, d] for d in dimensions]
 
         data_p1 = [0 if (np.isnan(v) or v < 0) else v for v in data_p1]
         data_p2 = [0 if (np.isnan(v) or v < 0) else v for v in data_p2]
@@ -107,8 +118,13 @@ def calculate_group_performance():
     add_source(fig, CUSTOM_SOURCES, use_default=False)
     
     plt.subplots_adjust(left=0.08, right=0.92, top=0.92, bottom=0.15, hspace=0.45, wspace=0.2)
-    plt.savefig("Initiative_Performance.jpg", dpi=300)
+    save_figure("Initiative_Performance.jpg")
     plt.close()
 
+def render(df):
+    calculate_group_performance(df)
+
 if __name__ == "__main__":
-    calculate_group_performance()
\ No newline at end of file
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
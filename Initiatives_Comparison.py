@@ -2,13 +2,17 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 from matplotlib.patches import Patch
-from china_config import load_data, add_source
+from china_config import load_data, add_source, save_figure
+from china_trace import stage
 
-df, _, _, _ = load_data()
+COLUMNS = ['gdi_idx', 'gsi_idx']
+OUTPUTS = ['Initiatives_Comparison.jpg']
 
-if df is not None:
-    period_pre = df[(df['year'] >= 2013) & (df['year'] <= 2020)]
-    period_post = df[df['year'] >= 2021]
+
+def render(df):
+    with stage('data'):
+        period_pre = df[(df['year'] >= 2013) & (df['year'] <= 2020)]
+        period_post = df[df['year'] >= 2021]
     
     # Только GDI и GSI
     metrics = ['gdi_idx', 'gsi_idx']
@@ -58,5 +62,10 @@ if df is not None:
     
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
     
-    plt.savefig('Initiatives_Comparison.jpg', dpi=300)
-    print("Сохранен Initiatives_Comparison.jpg ")
\ No newline at end of file
+    save_figure('Initiatives_Comparison.jpg')
+    print("Сохранен Initiatives_Comparison.jpg ")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
@@ -1,21 +1,26 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
-from china_config import load_data, add_source
+from china_config import load_data, add_source, save_figure
+from china_trace import stage
+
+COLUMNS = ['gdi_idx', 'gsi_idx']
+OUTPUTS = ['Land_vs_Sea_Comp.jpg']
 
-df, _, _, _ = load_data()
 LAND_NEIGHBORS = ["North Korea", "Russia", "Mongolia", "Kazakhstan", "Kyrgyzstan", "Tajikistan", "Afghanistan", "Pakistan", "India", "Nepal", "Bhutan", "Myanmar", "Laos", "Vietnam"]
 SEA_NEIGHBORS = ["South Korea", "Japan", "Philippines", "Brunei", "Malaysia", "Indonesia"]
 
-if df is not None:
-    df['Border_Type'] = df['recipient'].apply(lambda x: 'Сухопутная граница' if x in LAND_NEIGHBORS else 'Морская граница' if x in SEA_NEIGHBORS else 'Other')
-    df['Period'] = df['year'].apply(lambda x: '2013-2020 (BRI)' if 2013 <= x <= 2020 else '2021+ (Initiatives)' if x >= 2021 else 'Other')
+def render(df):
+    with stage('data'):
+        df = df.assign(
+            Border_Type=df['recipient'].apply(lambda x: 'Сухопутная граница' if x in LAND_NEIGHBORS else 'Морская граница' if x in SEA_NEIGHBORS else 'Other'),
+            Period=df['year'].apply(lambda x: '2013-2020 (BRI)' if 2013 <= x <= 2020 else '2021+ (Initiatives)' if x >= 2021 else 'Other'))
     
-    # Фильтруем
-    clean_df = df[(df['Border_Type'] != 'Other') & (df['Period'] != 'Other')]
+        # Фильтруем
+        clean_df = df[(df['Border_Type'] != 'Other') & (df['Period'] != 'Other')]
     
-    # Группируем по типу границы, периоду и считаем средние валидные индексы
-    geo_stats = clean_df.groupby(['Border_Type', 'Period'])[['gdi_idx', 'gsi_idx']].mean().reset_index()
+        # Группируем по типу границы, периоду и считаем средние валидные индексы
+        geo_stats = clean_df.groupby(['Border_Type', 'Period'])[['gdi_idx', 'gsi_idx']].mean().reset_index()
     
     # Переводим в "длинный" формат для отрисовки
     melted = geo_stats.melt(id_vars=['Border_Type', 'Period'], var_name='Index', value_name='Value')
@@ -53,5 +58,10 @@ if df is not None:
     add_source(fig)
     plt.tight_layout(rect=[0, 0.12, 1, 0.99])
     
-    plt.savefig('Land_vs_Sea_Comp.jpg', dpi=300)
-    print("Готов 1Land_vs_Sea_Comp.jpg")
\ No newline at end of file
+    save_figure('Land_vs_Sea_Comp.jpg')
+    print("Готов 1Land_vs_Sea_Comp.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
@@ -1,12 +1,7 @@
-import pandas as pd
 import numpy as np
-import seaborn as sns
 import matplotlib.pyplot as plt
-from matplotlib.path import Path
-import matplotlib.patches as patches
-import matplotlib.patheffects as pe
-from matplotlib.offsetbox import AnnotationBbox
-from china_config import load_data, add_source, get_circular_flag, COUNTRY_RU
+from china_config import load_data, add_source, save_figure, COUNTRY_RU
+from bump_charts import rank_periods, draw_bump
 
 CUSTOM_PERIODS = [
     (2005, 2012, "До 2013 г."),
@@ -14,69 +9,29 @@ CUSTOM_PERIODS = [
     (2021, 2024, "2021-2024 (GCI)")
 ]
 
-df, _, _, _ = load_data()
 
 # Все метрики в штуках (кол-во проектов, кол-во институтов, кол-во встреч)
 civ_cols = ['civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct']
 col = 'humanitarian_index'
 
-def get_bezier_path(x1, y1, x2, y2):
-    dist = (x2 - x1) * 0.45
-    verts = [(x1, y1), (x1 + dist, y1), (x2 - dist, y2), (x2, y2)]
-    return Path(verts, [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4])
+COLUMNS = civ_cols
+OUTPUTS = ['Rank_Humanitarian.jpg']
+PARAMS = ('limit', 'periods')
 
-if df is not None:
-    df[col] = df[civ_cols].sum(axis=1)
+def render(df, limit=5, periods=CUSTOM_PERIODS):
+    df = df.assign(**{col: df[civ_cols].sum(axis=1)})
     
-    limit, unit = 5, "событий"
-    p_labs = [p[2] for p in CUSTOM_PERIODS]
-    period_order = {lab: i for i, lab in enumerate(p_labs)}
-    
-    res = []
-    for s, e, l in CUSTOM_PERIODS:
-        per_sum = df[(df['year']>=s) & (df['year']<=e)].groupby('recipient')[col].sum().reset_index()
-        per_sum['period'] = l
-        per_sum['p_idx'] = period_order[l]
-        res.append(per_sum)
-    ldf = pd.concat(res)
-    ldf = ldf[ldf[col] > 0].copy()
-    ldf['rank'] = ldf.groupby('period')[col].rank(method='first', ascending=False)
+    unit = "событий"
+    p_labs = [p[2] for p in periods]
+    ldf, cube = rank_periods(df, col, periods)
 
-    global_top = df.groupby('recipient')[col].sum().sort_values(ascending=False).head(5)
-    recent_top = ldf[ldf['period'] == CUSTOM_PERIODS[-1][2]].sort_values('rank').head(5)
+    global_top = cube.sum()[col].sort_values(ascending=False).head(5)
+    recent_top = ldf[ldf['period'] == periods[-1][2]].sort_values('rank').head(5)
 
     fig, ax = plt.subplots(figsize=(18, 10))
-    visible_countries = ldf[ldf['rank'] <= limit]['recipient'].unique()
-    palette = sns.color_palette("husl", len(visible_countries))
-    colors = dict(zip(visible_countries, palette))
-
-    for country in visible_countries:
-        c_data = ldf[ldf['recipient'] == country].sort_values('p_idx')
-        valid = c_data[c_data['rank'] <= limit + 1.5].copy()
-        if len(valid) > 1:
-            x_v = valid['p_idx'].values
-            y_v = valid['rank'].values
-            for j in range(len(x_v) - 1):
-                if x_v[j+1] - x_v[j] == 1:
-                    path = get_bezier_path(x_v[j], y_v[j], x_v[j+1], y_v[j+1])
-                    ax.add_patch(patches.PathPatch(path, facecolor='none', edgecolor=colors[country], lw=7, zorder=3,
-                                path_effects=[pe.Stroke(linewidth=12, foreground='white'), pe.Normal()]))
-
-    for country in visible_countries:
-        c_data = ldf[ldf['recipient'] == country].sort_values('p_idx')
-        top_entries = c_data[c_data['rank'] <= limit]
-        if not top_entries.empty:
-            first = top_entries.iloc[0]
-            ax.text(first['p_idx'] - 0.14, first['rank'], COUNTRY_RU.get(country, country), 
-                    ha='right', va='center', fontsize=10.5, fontweight='bold', color=colors[country],
-                    path_effects=[pe.withStroke(linewidth=3, foreground="white")], zorder=6)
+    draw_bump(ax, ldf, limit, limit + 1.5, flag_zoom=0.18)
 
-        for _, row in c_data.iterrows():
-            if row['rank'] <= limit:
-                flag = get_circular_flag(row['recipient'], zoom=0.18)
-                if flag: ax.add_artist(AnnotationBbox(flag, (row['p_idx'], row['rank']), frameon=False, zorder=5))
-
-    ax.set_ylim(limit + 0.5, 0.5); ax.set_xlim(-0.7, 2.25)
+    ax.set_ylim(limit + 0.5, 0.5); ax.set_xlim(-0.7, len(p_labs) - 0.75)
     ax.set_xticks(np.arange(len(p_labs))); ax.set_xticklabels(p_labs, fontweight='bold', fontsize=14)
     ax.set_yticks(range(1, limit + 1)); ax.set_yticklabels([f"#{i}" for i in range(1, limit + 1)], fontweight='bold', color='gray')
     for s in ax.spines.values(): s.set_visible(False)
@@ -84,7 +39,7 @@ if df is not None:
 
     info = ["ОБЩИЙ ТОП ЛИДЕРОВ (2005-2024):"]
     for i, (c, v) in enumerate(global_top.items()): info.append(f"{i+1}. {COUNTRY_RU.get(c,c)}: {v:.0f} {unit}")
-    info.append("\n" + "─"*20 + f"\nТОП-5 ЭПОХИ ({CUSTOM_PERIODS[-1][2]}):")
+    info.append("\n" + "─"*20 + f"\nТОП-5 ЭПОХИ ({periods[-1][2]}):")
     for i, (_, row) in enumerate(recent_top.iterrows()):
         info.append(f"{i+1}. {COUNTRY_RU.get(row['recipient'], row['recipient'])}: {row[col]:.0f} {unit}")
     
@@ -97,4 +52,9 @@ if df is not None:
     # fig.suptitle('Эволюция гуманитарного сотрудничества (GCI)', fontsize=22, fontweight='bold', x=0.5, y=0.95, ha='center')
     add_source(fig, "AidData, NBR")
     plt.subplots_adjust(left=0.08, right=0.76, top=0.98, bottom=0.12)
-    plt.savefig('Rank_Humanitarian.jpg', dpi=300)
\ No newline at end of file
+    save_figure('Rank_Humanitarian.jpg')
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
@@ -2,31 +2,31 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import seaborn as sns 
-from scipy.stats import zscore
-from china_config import load_data, add_source, RU_LABELS
+from china_config import load_data, add_source, save_figure, RU_LABELS
+from china_anomaly import anomaly_scores
+from china_trace import stage
 
-df, _, _, _ = load_data()
+COLUMNS = ['dev_03_fdi_usd', 'sec_01_arms_transfer_tiv', 'sec_04_joint_exercise_ct', 'sec_03_military_engagement_ct']
+OUTPUTS = ['Russia_Anomaly_Comp.jpg']
 
-if df is not None:
+
+def render(df):
     # Используем только те колонки, которые валидны до 2024 года
     cols = ['dev_03_fdi_usd', 'sec_01_arms_transfer_tiv', 
             'sec_04_joint_exercise_ct', 'sec_03_military_engagement_ct']
     
-    results = []
     # Сравниваем два ключевых периода для вашего исследования
-    periods = [('2013-2020 (BRI)', df[df['year'].between(2013, 2020)]), 
-               ('2021-2024 (Initiatives)', df[df['year'] >= 2021])]
+    periods = [(2013, 2020, '2013-2020 (BRI)'),
+               (2021, None, '2021-2024 (Initiatives)')]
 
-    for p_name, p_df in periods:
-        # Считаем среднее для каждой страны в рамках периода
-        means = p_df.groupby('recipient')[cols].mean()
-        
-        # Считаем Z-score: насколько страна отклоняется от "среднего соседа" КНР в этот период
-        # Z=0 — как все; Z > 1.5 — аномально высокая активность; Z < 0 — ниже среднего
-        z_data = means.apply(zscore)
-        
-        if 'Russia' in z_data.index:
-            r_z = z_data.loc['Russia'].to_frame(name='Z-Score')
+    # Z-score по средним за период: насколько страна отклоняется от "среднего соседа" КНР
+    # Z=0 — как все; Z > 1.5 — аномально высокая активность; Z < 0 — ниже среднего
+    with stage('data'):
+        scores = anomaly_scores(df, cols, periods)
+    results = []
+    for _, _, p_name in periods:
+        if 'Russia' in scores.loc[p_name].index.get_level_values('recipient'):
+            r_z = scores.loc[(p_name, 'Russia'), ['z']].rename(columns={'z': 'Z-Score'})
             r_z['Period'] = p_name
             r_z['Indicator'] = r_z.index.map(lambda x: RU_LABELS.get(x, x))
             results.append(r_z)
@@ -62,5 +62,10 @@ if df is not None:
     # Увеличиваем нижний отступ, чтобы легенда и источник не обрезались
     plt.tight_layout(rect=[0, 0.05, 1, 0.99])
     
-    plt.savefig('Russia_Anomaly_Comp.jpg', dpi=300)
-    print("Сохранен Russia_Anomaly_Comp.jpg")
\ No newline at end of file
+    save_figure('Russia_Anomaly_Comp.jpg')
+    print("Сохранен Russia_Anomaly_Comp.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
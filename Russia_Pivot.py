@@ -1,13 +1,15 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 from matplotlib.patches import Patch
-from china_config import load_data, add_source
+from china_config import load_data, add_source, save_figure
+from china_periods import PeriodCube
+from china_trace import stage
 
-df, _, _, _ = load_data()
+COLUMNS = ['dev_03_fdi_usd', 'sec_03_military_engagement_ct', 'sec_04_joint_exercise_ct']
+OUTPUTS = ['Russia_Pivot.jpg']
 
-if df is not None:
-    rus = df[df['recipient'] == 'Russia'].copy()
-    
+
+def render(df):
     # ИСПОЛЬЗУЕМ ТОЛЬКО "ДОЛГИЕ" МЕТРИКИ (до 2024 г.)
     cols = {
         'dev_03_fdi_usd': 'Прямые инвестиции (FDI)',
@@ -15,8 +17,10 @@ if df is not None:
         'sec_04_joint_exercise_ct': 'Военные учения'
     }
     
-    pre_2021 = rus[(rus['year'] >= 2013) & (rus['year'] <= 2020)][list(cols.keys())].mean()
-    post_2021 = rus[rus['year'] >= 2021][list(cols.keys())].mean()
+    with stage('data'):
+        cube = PeriodCube(df, list(cols.keys()))
+        pre_2021 = cube.mean(2013, 2020).loc['Russia']
+        post_2021 = cube.mean(2021).loc['Russia']
     
     fig, axes = plt.subplots(1, 3, figsize=(16, 7))
     palette = ['#95A5A6', '#C0392B'] 
@@ -79,5 +83,10 @@ if df is not None:
     # Увеличиваем нижний отступ (bottom=0.15), чтобы легенда не наезжала на Source
     plt.tight_layout(rect=[0, 0.15, 1, 0.99])
     
-    plt.savefig('Russia_Pivot.jpg', dpi=300)
-    print("Сохранен Russia_Pivot.jpg")
\ No newline at end of file
+    save_figure('Russia_Pivot.jpg')
+    print("Сохранен Russia_Pivot.jpg")
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS, recipients=['Russia'])
+    if df is not None:
+        render(df)
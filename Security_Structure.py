@@ -3,21 +3,24 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 # Импортируем загрузчик, функцию источника и словарь переводов
-from china_config import load_data, add_source, COUNTRY_RU
+from china_config import load_data, add_source, save_figure, COUNTRY_RU
+from china_trace import stage
+
+COLUMNS = ['sec_01_arms_transfer_tiv', 'sec_03_military_engagement_ct', 'sec_04_joint_exercise_ct']
+OUTPUTS = ['Security_Structure.jpg']
 
-df, col_arms, _, _ = load_data()
 
 # Дополнительные колонки для "мягкой" безопасности
 col_mil_visits = 'sec_03_military_engagement_ct'
 col_exercises = 'sec_04_joint_exercise_ct'
 
-if df is not None:
+def render(df, col_arms='sec_01_arms_transfer_tiv'):
     # Если колонок нет в файле, создаем их и заполняем нулями
-    for c in [col_mil_visits, col_exercises]:
-        if c not in df.columns: df[c] = 0
+    df = df.assign(**{c: 0 for c in [col_mil_visits, col_exercises] if c not in df.columns})
 
     # Группируем данные по странам
-    sec_data = df.groupby('recipient')[[col_arms, col_mil_visits, col_exercises]].sum().reset_index()
+    with stage('data'):
+        sec_data = df.groupby('recipient')[[col_arms, col_mil_visits, col_exercises]].sum().reset_index()
     
     # Считаем сумму дипломатических событий
     sec_data['soft_security'] = sec_data[col_mil_visits] + sec_data[col_exercises]
@@ -76,6 +79,11 @@ if df is not None:
     plt.tight_layout(rect=[0, 0.05, 1, 0.95])
     
     filename = 'Security_Structure.jpg'
-    plt.savefig(filename, dpi=300)
+    save_figure(filename)
     plt.close()
-    print(f"Готово! Файл сохранен как {filename}")
\ No newline at end of file
+    print(f"Готово! Файл сохранен как {filename}")
+
+if __name__ == "__main__":
+    df, col_arms, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df, col_arms)
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# === БЕНЧМАРКИ ===
+# Замеры по этапам: загрузка (разбор CSV, запись и чтение кэша), агрегации по
+# периодам (groupby и PeriodCube), кластеризация KMeans и рендер.
+# Прогон идет на china_data.csv (рендер каждого графика) и на синтетических
+# панелях, увеличенных в 10/100/1000 раз. Результаты пишутся в JSON, два прогона
+# сравниваются через --compare.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = 'benchmarks'
+REPEATS = 3
+SEED = 42
+
+# Масштаб -> множители (страны, годы, метрики). Произведение — во сколько раз
+# больше ячеек, чем в исходной панели. Годы продолжаются за 2024 — так же
+# растет число периодов при переходе на помесячные данные.
+SCALES = {
+    '10x': (2, 5, 1),
+    '100x': (5, 5, 4),
+    '1000x': (10, 10, 10),
+}
+
+def _measure(fn, repeats):
+    runs, result = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    return {'best': min(runs), 'median': statistics.median(runs), 'runs': len(runs)}, result
+
+@contextmanager
+def _chdir(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+def _link_flags(tmp):
+    target = os.path.join(tmp, 'flags')
+    if os.path.exists(target):
+        return
+    source = next((d for d in (os.path.join(os.getcwd(), 'flags'), os.path.join(ROOT, 'flags'))
+                   if os.path.isdir(d)), None)
+    if source is None:
+        print("  flags/ не найдена — графики меряются без флагов")
+        return
+    try:
+        os.symlink(source, target, target_is_directory=True)
+    except OSError:
+        shutil.copytree(source, target)
+
+def _report(group, stage, timing):
+    print(f"  {group:<10} {stage:<22} {timing['best']:9.4f} с (медиана {timing['median']:.4f})")
+
+def _metric_columns(df):
+    return [c for c in df.select_dtypes('number').columns if c != 'year']
+
+def synthetic_panel(base, factors, seed=SEED):
+    # Панель в схеме load_data: страны, годы и метрики размножены, значения —
+    # перемешанные значения исходной метрики (тот же масштаб, доля нулей и NaN)
+    countries_k, years_k, metrics_k = factors
+    rng = np.random.default_rng(seed)
+    base_recipients = sorted(base['recipient'].unique())
+    recipients = [r if k == 0 else f"{r} {k}" for k in range(countries_k) for r in base_recipients]
+    first = int(base['year'].min())
+    n_years = (int(base['year'].max()) - first + 1) * years_k
+    years = np.arange(first, first + n_years)
+
+    n_rows = len(recipients) * n_years
+    data = {
+        'year': np.tile(years, len(recipients)),
+        'recipient': np.repeat(recipients, n_years),
+    }
+    for c in _metric_columns(base):
+        pool = base[c].to_numpy(dtype=np.float64)
+        for k in range(metrics_k):
+            name = c if k == 0 else f"{c}__{k}"
+            data[name] = rng.choice(pool, size=n_rows)
+    return pd.DataFrame(data)
+
+def _scaled_periods(df):
+    # Три равных периода на весь диапазон лет — аналог CUSTOM_PERIODS
+    first, last = int(df['year'].min()), int(df['year'].max())
+    edges = np.linspace(first, last + 1, 4).astype(int)
+    return [(int(s), int(e) - 1, f"P{i + 1}") for i, (s, e) in enumerate(zip(edges[:-1], edges[1:]))]
+
+def bench_analysis(df, repeats, group, tmp):
+    from china_config import _write_cache, _read_cache
+    from china_periods import PeriodCube
+    from china_panel import Panel
+    from sklearn.cluster import KMeans
+
+    results = {}
+    def run(stage, fn, n=repeats):
+        timing, value = _measure(fn, n)
+        results[stage] = timing
+        _report(group, stage, timing)
+        return value
+
+    metrics = _metric_columns(df)
+    periods = _scaled_periods(df)
+
+    csv_path = os.path.join(tmp, f'{group}.csv')
+    df.to_csv(csv_path, index=False, na_rep='NA', encoding='utf-8-sig')
+    run('csv_parse', lambda: pd.read_csv(csv_path, encoding='utf-8-sig', na_values='NA'))
+    cache_path = os.path.join(tmp, f'{group}.cache')
+    run('cache_write', lambda: _write_cache(df, cache_path))
+    run('cache_read', lambda: _read_cache(cache_path))
+    run('cache_read_mmap', lambda: _read_cache(cache_path, mmap=True))
+
+    run('groupby_periods', lambda: pd.concat(
+        {label: df[df['year'].between(s, e)].groupby('recipient')[metrics].sum() for s, e, label in periods},
+        names=['period']))
+    cube = run('cube_build', lambda: PeriodCube(df, metrics))
+    run('cube_periods', lambda: cube.periods(periods))
+    run('cube_sliding', lambda: cube.sliding(5, 'mean'))
+    run('panel_build', lambda: Panel(df))
+
+    # Как в Clusters_Positions/Dynamic_Clusters: средние за последние 4 года, k=3
+    recent = df[df['year'] > int(df['year'].max()) - 4]
+    stats = recent.groupby('recipient')[['gdi_idx', 'gsi_idx']].mean()
+    run('kmeans', lambda: KMeans(n_clusters=3, random_state=42, n_init=10).fit(stats))
+
+    run('render_dumbbell', lambda: _render_dumbbell(df, os.path.join(tmp, f'{group}_dumbbell.jpg')))
+    return results
+
+def _render_dumbbell(df, filename):
+    import matplotlib.pyplot as plt
+    from china_config import save_figure
+    from dumbbell_charts import compare_metric, finish, draw_dumbbell
+    last = int(df['year'].max())
+    comp = finish(compare_metric(df, 'gdi_idx', (last - 11, last - 4), (last - 3, None)))
+    fig, ax = plt.subplots(figsize=(12, max(6, 0.25 * len(comp))))
+    draw_dumbbell(ax, comp)
+    save_figure(filename, fig)
+    plt.close(fig)
+
+def bench_real(path, repeats, figures, tmp):
+    from china_config import load_data
+    from render_all import render_figure
+
+    results = {'load': {}, 'figures': {}}
+    def run(stage, fn):
+        timing, value = _measure(fn, repeats)
+        results['load'][stage] = timing
+        _report('real', stage, timing)
+        return value
+
+    run('load_csv', lambda: load_data(path, use_cache=False))
+    load_data(path)
+    df = run('load_cache', lambda: load_data(path))[0]
+    run('load_cache_mmap', lambda: load_data(path, mmap=True))
+
+    # Графики пишутся во временную папку, чтобы не затирать рабочие картинки.
+    # Флаги ищутся в flags/ текущей папки — без них графики с флагами меряются неполными
+    _link_flags(tmp)
+    with _chdir(tmp):
+        for name in figures:
+            timing, _ = _measure(lambda: render_figure(name, df), repeats)
+            results['figures'][name] = timing
+            _report('figure', name, timing)
+    return results, df
+
+def _meta():
+    import matplotlib
+    from china_config import RENDER_PROFILE
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'render_profile': RENDER_PROFILE,
+    }
+
+def _flatten(results):
+    # {'real/load/load_csv': best, 'synthetic/10x/cube_build': best, ...}
+    flat = {}
+    def walk(node, prefix):
+        if 'best' in node:
+            flat[prefix] = node['best']
+            return
+        for k, v in node.items():
+            if isinstance(v, dict):
+                walk(v, f"{prefix}/{k}" if prefix else k)
+    walk({k: results[k] for k in ('real', 'synthetic') if k in results}, '')
+    return flat
+
+def compare(base, current):
+    old, new = _flatten(base), _flatten(current)
+    print(f"\nСравнение с {base['meta'].get('timestamp')} ({base['meta'].get('commit')}):")
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        mark = '  ' if 0.9 <= ratio <= 1.1 else ('++' if ratio < 0.9 else '--')
+        print(f"{mark} {key:<45} {old[key]:9.4f} -> {new[key]:9.4f} с  x{ratio:.2f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки загрузки, агрегаций, кластеризации и рендера")
+    parser.add_argument('--data', default=None, help="CSV с данными (по умолчанию china_data.csv)")
+    parser.add_argument('--scales', nargs='*', default=list(SCALES), choices=list(SCALES),
+                        help="синтетические масштабы (пустой список — без синтетики)")
+    parser.add_argument('--figures', nargs='*', default=None, metavar='FIG',
+                        help="графики для замера рендера (по умолчанию все, пустой список — без рендера)")
+    parser.add_argument('--no-real', action='store_true', help="не замерять china_data.csv")
+    parser.add_argument('-n', '--repeats', type=int, default=REPEATS, help="повторов на этап, берется лучший")
+    parser.add_argument('--profile', choices=['draft', 'print'], help="профиль рендера")
+    parser.add_argument('--out', help=f"куда сохранить JSON (по умолчанию {RESULTS_DIR}/bench_<время>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="сравнить с сохраненным прогоном")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from china_config import load_data, set_render_profile, DATA_FILE
+    from render_all import select_figures
+    set_render_profile(args.profile or os.environ.get('CHINA_RENDER_PROFILE', 'print'))
+    path = os.path.abspath(args.data or os.path.join(ROOT, DATA_FILE))
+    figures = select_figures(args.figures) if args.figures else ([] if args.figures == [] else select_figures())
+
+    results = {'meta': _meta(), 'synthetic': {}}
+    with tempfile.TemporaryDirectory(prefix='china_bench_') as tmp:
+        df = None
+        if not args.no_real:
+            print(f"Реальные данные: {path}")
+            results['real'], df = bench_real(path, args.repeats, figures, tmp)
+        if df is None:
+            df = load_data(path)[0]
+            if df is None:
+                return 1
+        results['meta']['base_shape'] = list(df.shape)
+
+        for scale in args.scales:
+            panel = synthetic_panel(df, SCALES[scale])
+            n_metrics = len(_metric_columns(panel))
+            print(f"Синтетика {scale}: {panel['recipient'].nunique()} стран × "
+                  f"{panel['year'].nunique()} лет × {n_metrics} метрик ({len(panel)} строк)")
+            results['synthetic'][scale] = {
+                'factors': SCALES[scale],
+                'shape': list(panel.shape),
+                'stages': bench_analysis(panel, args.repeats, scale, tmp),
+            }
+            del panel
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
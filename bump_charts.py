@@ -3,10 +3,19 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib.path import Path
-import matplotlib.patches as patches
+from matplotlib.artist import Artist
+from matplotlib.patches import PathPatch
 import matplotlib.patheffects as pe
-from matplotlib.offsetbox import AnnotationBbox
-from china_config import load_data, add_source, get_circular_flag, COUNTRY_RU
+from PIL import Image
+from china_config import load_data, add_source, save_figure, get_flag_sprite, COUNTRY_RU, FLAG_SIZE
+from china_periods import PeriodCube
+from china_panel import Panel
+from china_trace import traced
+
+COLUMNS = ['dev_03_fdi_usd', 'dev_02_infrastructure_usd', 'sec_01_arms_transfer_tiv']
+OUTPUTS = ['Rank_Invest.jpg', 'Rank_Arms.jpg']
+# Параметры render, которые можно задать из запроса к china_server
+PARAMS = ('limit', 'periods')
 
 CUSTOM_PERIODS = [
     (2005, 2012, "До 2013 г."),
@@ -14,74 +23,170 @@ CUSTOM_PERIODS = [
     (2021, 2024, "2021-2024 (GDI/GSI)")
 ]
 
-df, _, _, _ = load_data()
-
 def get_bezier_path(x1, y1, x2, y2):
     dist = (x2 - x1) * 0.45 
     verts = [(x1, y1), (x1 + dist, y1), (x2 - dist, y2), (x2, y2)]
     return Path(verts, [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4])
 
-def create_bump(metric_cols, title, unit, filename, limit, extra_src):
-    if df is None: return
-    
-    temp_df = df.copy()
-    # Простое суммирование (для экономики USD+USD, для военного - чистый TIV)
-    temp_df['composite_idx'] = temp_df[metric_cols].sum(axis=1)
+# Все флаги графика — один артист: позиции переводятся в пиксели одним вызовом,
+# а масштабированный спрайт каждой страны готовится один раз на размер
+class FlagLayer(Artist):
+    def __init__(self, sprites, xy, zoom, zorder=5):
+        super().__init__()
+        self._sprites = list(sprites)
+        self._xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self._zoom = zoom
+        self._scaled = {}
+        self.set_zorder(zorder)
 
-    p_labs = [p[2] for p in CUSTOM_PERIODS]
-    period_order = {lab: i for i, lab in enumerate(p_labs)}
-    x_indices = np.arange(len(p_labs))
+    def set_offsets(self, xy):
+        self._xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.stale = True
+
+    def set_sprites(self, sprites, xy):
+        # Новый набор флагов; отмасштабированные спрайты остаются в кэше слоя
+        self._sprites = list(sprites)
+        self.set_offsets(xy)
+
+    def _scaled_sprite(self, i, px):
+        # Исходный спрайт хранится рядом с результатом: пока он в кэше, его id не может
+        # достаться другому массиву (после вытеснения из LRU или сброса атласа)
+        sprite = self._sprites[i]
+        key = (id(sprite), px)
+        hit = self._scaled.get(key)
+        if hit is None or hit[0] is not sprite:
+            img = Image.fromarray(np.asarray(sprite)).resize((px, px), Image.LANCZOS)
+            # draw_image ждет строки снизу вверх
+            hit = self._scaled[key] = (sprite, np.ascontiguousarray(np.asarray(img)[::-1]))
+        return hit[1]
+
+    def draw(self, renderer):
+        if not self.get_visible() or not len(self._xy):
+            return
+        px = max(1, int(round(FLAG_SIZE[0] * self._zoom * renderer.points_to_pixels(1.0))))
+        centers = self.axes.transData.transform(self._xy)
+        gc = renderer.new_gc()
+        for i, (cx, cy) in enumerate(centers):
+            renderer.draw_image(gc, round(cx - px / 2), round(cy - px / 2), self._scaled_sprite(i, px))
+        gc.restore()
+        self.stale = False
 
+# Все кривые графика — один артист, но каждая рисуется отдельно одним и тем же
+# PathPatch: белая подложка и цветная линия идут парой, и подложка следующей кривой
+# отделяет ее от предыдущих на пересечениях (эффекты коллекции накладываются на
+# все пути сразу — сначала все подложки, потом все линии)
+class CurveLayer(Artist):
+    def __init__(self, paths, colors, linewidth=7, capstyle=None, effects=None, zorder=3):
+        super().__init__()
+        self._paths, self._colors = list(paths), list(colors)
+        self._patch = PathPatch(Path([(0, 0)]), facecolor='none', linewidth=linewidth, capstyle=capstyle,
+                                path_effects=effects or [])
+        self.set_zorder(zorder)
+
+    def set_curves(self, paths, colors):
+        self._paths, self._colors = list(paths), list(colors)
+        self.stale = True
+
+    def draw(self, renderer):
+        if not self.get_visible() or not self._paths:
+            return
+        patch = self._patch
+        patch.set_figure(self.figure)
+        patch.set_transform(self.axes.transData)
+        patch.set_clip_path(self.axes.patch if self.get_clip_on() else None)
+        for path, color in zip(self._paths, self._colors):
+            patch.set_path(path)
+            patch.set_edgecolor(color)
+            patch.draw(renderer)
+        self.stale = False
+
+@traced('data')
+def rank_periods(df, value_col, periods, cube=None):
+    # Сумма value_col по каждому периоду и место страны в нем (только ненулевые).
+    # Готовый cube (с колонкой value_col) позволяет не собирать его заново
+    if cube is None:
+        cube = PeriodCube(df, [value_col])
     res = []
-    for s, e, l in CUSTOM_PERIODS:
-        subset = temp_df[(temp_df['year']>=s) & (temp_df['year']<=e)]
-        per_sum = subset.groupby('recipient')['composite_idx'].sum().reset_index()
+    for i, (s, e, l) in enumerate(periods):
+        per_sum = cube.sum(s, e).reset_index()
         per_sum['period'] = l
-        per_sum['p_idx'] = period_order[l]
+        per_sum['p_idx'] = i
         res.append(per_sum)
     ldf = pd.concat(res)
-    
-    ldf = ldf[ldf['composite_idx'] > 0].copy()
-    ldf['rank'] = ldf.groupby('period')['composite_idx'].rank(method='first', ascending=False)
-    
-    # Лидеры для легенды
-    global_top = temp_df.groupby('recipient')['composite_idx'].sum().sort_values(ascending=False).head(5)
-    recent_period = CUSTOM_PERIODS[-1][2]
-    recent_top = ldf[ldf['period'] == recent_period].sort_values('rank').head(5)
 
-    fig, ax = plt.subplots(figsize=(20, 11))
+    ldf = ldf[ldf[value_col] > 0].copy()
+    ldf['rank'] = ldf.groupby('period')[value_col].rank(method='first', ascending=False)
+    return ldf, cube
+
+def bump_layout(ldf, limit, link_limit):
+    # Все, что рисует draw_bump, но без артистов: цвета стран, кривые, подписи
+    # (x, y, текст, цвет) и флаги. Интерактивный режим обновляет по нему готовые артисты
     visible_countries = ldf[ldf['rank'] <= limit]['recipient'].unique()
     palette = sns.color_palette("husl", len(visible_countries))
     colors = dict(zip(visible_countries, palette))
+    # Строки ldf по странам, отсортированные по периоду
+    panel = Panel(ldf, year_col='p_idx')
 
+    paths, edge_colors, labels, sprites, flag_xy = [], [], [], [], []
     for country in visible_countries:
-        c_data = ldf[ldf['recipient'] == country].sort_values('p_idx')
-        valid = c_data[c_data['rank'] <= limit + 2].copy()
-        if len(valid) > 1:
-            x_v = valid['p_idx'].values
-            y_v = valid['rank'].values
-            for j in range(len(x_v) - 1):
-                if x_v[j+1] - x_v[j] == 1:
-                    path = get_bezier_path(x_v[j], y_v[j], x_v[j+1], y_v[j+1])
-                    ax.add_patch(patches.PathPatch(path, facecolor='none', edgecolor=colors[country], 
-                                lw=7, zorder=3, capstyle='round',
-                                path_effects=[pe.Stroke(linewidth=12, foreground='white'), pe.Normal()]))
+        c_data = panel.country(country)
+        x_v = c_data['p_idx'].to_numpy()
+        y_v = c_data['rank'].to_numpy()
 
-    for country in visible_countries:
-        c_data = ldf[ldf['recipient'] == country].sort_values('p_idx')
-        top_entries = c_data[c_data['rank'] <= limit]
-        if not top_entries.empty:
-            first = top_entries.iloc[0]
-            ax.text(first['p_idx'] - 0.14, first['rank'], COUNTRY_RU.get(country, country), 
-                    ha='right', va='center', fontsize=10.5, fontweight='bold', color=colors[country],
-                    path_effects=[pe.withStroke(linewidth=3, foreground="white")], zorder=6)
-
-        for _, row in c_data.iterrows():
-            if row['rank'] <= limit:
-                flag = get_circular_flag(row['recipient'], zoom=0.18)
-                if flag: ax.add_artist(AnnotationBbox(flag, (row['p_idx'], row['rank']), frameon=False, zorder=5))
-
-    ax.set_ylim(limit + 0.5, 0.5); ax.set_xlim(-0.7, 2.25)
+        # Соединяем только соседние периоды, где страна не ниже link_limit
+        linked = y_v <= link_limit
+        x_l, y_l = x_v[linked], y_v[linked]
+        for j in np.flatnonzero(np.diff(x_l) == 1):
+            paths.append(get_bezier_path(x_l[j], y_l[j], x_l[j+1], y_l[j+1]))
+            edge_colors.append(colors[country])
+
+        top = y_v <= limit
+        if top.any():
+            first = np.argmax(top)
+            labels.append((x_v[first] - 0.14, y_v[first], COUNTRY_RU.get(country, country), colors[country]))
+
+            sprite = get_flag_sprite(country)
+            if sprite is not None:
+                sprites.extend([sprite] * int(top.sum()))
+                flag_xy.extend(zip(x_v[top], y_v[top]))
+    return colors, paths, edge_colors, labels, sprites, flag_xy
+
+# Оформление кривых и подписей — общее для draw_bump и интерактивного режима
+CURVE_EFFECTS = [pe.Stroke(linewidth=12, foreground='white'), pe.Normal()]
+LABEL_STYLE = dict(ha='right', va='center', fontsize=10.5, fontweight='bold', zorder=6,
+                   path_effects=[pe.withStroke(linewidth=3, foreground="white")])
+
+@traced('draw_bump')
+def draw_bump(ax, ldf, limit, link_limit, flag_zoom=0.18, capstyle=None):
+    colors, paths, edge_colors, labels, sprites, flag_xy = bump_layout(ldf, limit, link_limit)
+    for x, y, text, color in labels:
+        ax.text(x, y, text, color=color, **LABEL_STYLE)
+
+    if paths:
+        ax.add_artist(CurveLayer(paths, edge_colors, capstyle=capstyle, effects=CURVE_EFFECTS, zorder=3))
+    if sprites:
+        ax.add_artist(FlagLayer(sprites, flag_xy, flag_zoom, zorder=5))
+    return colors
+
+def create_bump(df, metric_cols, title, unit, filename, limit, extra_src,
+                periods=CUSTOM_PERIODS, figsize=(20, 11), flag_zoom=0.18):
+    temp_df = df.copy()
+    # Простое суммирование (для экономики USD+USD, для военного - чистый TIV)
+    temp_df['composite_idx'] = temp_df[metric_cols].sum(axis=1)
+
+    p_labs = [p[2] for p in periods]
+    x_indices = np.arange(len(p_labs))
+    ldf, cube = rank_periods(temp_df, 'composite_idx', periods)
+    
+    # Лидеры для легенды
+    global_top = cube.sum()['composite_idx'].sort_values(ascending=False).head(5)
+    recent_period = periods[-1][2]
+    recent_top = ldf[ldf['period'] == recent_period].sort_values('rank').head(5)
+
+    fig, ax = plt.subplots(figsize=figsize)
+    draw_bump(ax, ldf, limit, limit + 2, flag_zoom, capstyle='round')
+
+    ax.set_ylim(limit + 0.5, 0.5); ax.set_xlim(-0.7, len(p_labs) - 0.75)
     ax.set_xticks(x_indices); ax.set_xticklabels(p_labs, fontweight='bold', fontsize=14)
     ax.set_yticks(range(1, limit + 1))
     ax.set_yticklabels([f"#{i}" for i in range(1, limit + 1)], fontweight='bold', color='gray')
@@ -111,14 +216,22 @@ def create_bump(metric_cols, title, unit, filename, limit, extra_src):
     # fig.suptitle(title, fontsize=22, fontweight='bold', x=0.5, y=0.95, ha='center')
     add_source(fig, extra_src)
     plt.subplots_adjust(left=0.08, right=0.76, top=0.98, bottom=0.12)
-    plt.savefig(filename, dpi=300)
+    save_figure(filename)
     plt.close()
 
-if __name__ == "__main__":
+def render(df, limit=None, periods=CUSTOM_PERIODS):
+    # limit — глубина рейтинга для обоих графиков (по умолчанию 10 и 5)
     # Экономика: FDI + Инфраструктура (USD)
     econ_metrics = ['dev_03_fdi_usd', 'dev_02_infrastructure_usd']
-    create_bump(econ_metrics, 'Эволюция экономического влияния (FDI + Инфраструктура)', 'млрд $', 'Rank_Invest.jpg', 10, "IMF, AidData")
+    create_bump(df, econ_metrics, 'Эволюция экономического влияния (FDI + Инфраструктура)', 'млрд $', 'Rank_Invest.jpg',
+                limit or 10, "IMF, AidData", periods)
     
     # Безопасность: Только TIV (жесткая сила)
     sec_metrics = ['sec_01_arms_transfer_tiv']
-    create_bump(sec_metrics, 'Эволюция военного сотрудничества (GSI)', 'TIV', 'Rank_Arms.jpg', 5, "SIPRI")
\ No newline at end of file
+    create_bump(df, sec_metrics, 'Эволюция военного сотрудничества (GSI)', 'TIV', 'Rank_Arms.jpg',
+                limit or 5, "SIPRI", periods)
+
+if __name__ == "__main__":
+    df, _, _, _ = load_data(columns=COLUMNS)
+    if df is not None:
+        render(df)
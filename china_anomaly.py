@@ -0,0 +1,176 @@
+import argparse
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from china_periods import PeriodCube
+from china_trace import traced
+
+# === АНОМАЛИИ ===
+# Z-оценки сразу для всех стран × метрик × периодов: средние за период берутся из
+# PeriodCube, центр и разброс считаются по соседям КНР, присутствовавшим в периоде.
+# Обычный вариант — среднее и стандартное отклонение (как scipy.stats.zscore),
+# робастный — медиана и MAD. Доверительные интервалы z — бутстрэп по странам-соседям:
+# все выборки строятся одним массивом индексов, статистики считаются по оси выборок,
+# а столбцы (период, метрика) идут пачками, чтобы память не росла с числом выборок.
+
+METRIC_PREFIXES = ('sec_', 'dev_', 'civ_')
+PERIODS = [(2013, 2020, '2013-2020 (BRI)'), (2021, None, '2021-2024 (Initiatives)')]
+THRESHOLD = 1.5
+N_BOOT = 1000
+CI = 0.95
+SEED = 42
+# MAD -> сигма для нормального распределения; если MAD = 0 (много нулей),
+# вместо него берется среднее абсолютное отклонение от медианы
+MAD_SCALE = 1.4826
+MEANAD_SCALE = 1.2533
+# Предел числа элементов в одной пачке бутстрэпа (выборки × страны × столбцы)
+BOOT_BATCH = 2**24
+
+def metric_columns(df):
+    # Числовые метрики sec_/dev_/civ_ (флаги вида Y/N пропускаются)
+    return [c for c in df.select_dtypes('number').columns if c.startswith(METRIC_PREFIXES)]
+
+def _nanquantile(a, qs, axis):
+    # То же, что np.nanquantile (линейная интерполяция), но через одну сортировку:
+    # NaN уходят в конец, квантиль берется среди первых n значений каждого столбца
+    a = np.sort(a, axis=axis)
+    n = np.expand_dims((~np.isnan(a)).sum(axis=axis), axis)
+    out = []
+    for q in qs:
+        pos = q * np.maximum(n - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+        v_lo = np.take_along_axis(a, lo, axis)
+        v_hi = np.take_along_axis(a, hi, axis)
+        v = v_lo + (v_hi - v_lo) * (pos - lo)
+        out.append(np.where(n > 0, v, np.nan).squeeze(axis))
+    return out
+
+def _center_scale(X, robust):
+    # X: (..., страны, столбцы) с NaN на месте отсутствующих; статистики по оси стран.
+    # Метрика без данных за период дает NaN без предупреждений
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if not robust:
+            n = (~np.isnan(X)).sum(axis=-2)
+            center = np.nansum(X, axis=-2) / n
+            scale = np.sqrt(np.nansum((X - np.expand_dims(center, -2)) ** 2, axis=-2) / n)
+        else:
+            center, = _nanquantile(X, [0.5], axis=-2)
+            dev = np.abs(X - np.expand_dims(center, -2))
+            mad = _nanquantile(dev, [0.5], axis=-2)[0] * MAD_SCALE
+            meanad = np.nanmean(dev, axis=-2) * MEANAD_SCALE
+            scale = np.where(mad > 0, mad, meanad)
+    return center, np.where(scale > 0, scale, np.nan)
+
+def _bootstrap(X, robust, n_boot, ci, seed):
+    # X: (страны, столбцы). Индексы выборок общие для всех столбцов
+    n_rows, n_cols = X.shape
+    idx = np.random.default_rng(seed).integers(0, n_rows, size=(n_boot, n_rows))
+    q = [(1 - ci) / 2, (1 + ci) / 2]
+    low, high = np.full(X.shape, np.nan), np.full(X.shape, np.nan)
+    chunk = max(1, BOOT_BATCH // max(n_boot * n_rows, 1))
+    for c0 in range(0, n_cols, chunk):
+        part = X[:, c0:c0 + chunk]
+        center, scale = _center_scale(part[idx], robust)            # (выборки, столбцы)
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            z = (part[None] - center[:, None]) / scale[:, None]     # (выборки, страны, столбцы)
+            low[:, c0:c0 + chunk], high[:, c0:c0 + chunk] = _nanquantile(z, q, axis=0)
+    return low, high
+
+@traced('anomaly')
+def anomaly_scores(df, metrics=None, periods=PERIODS, robust=False, n_boot=0, ci=CI,
+                   threshold=THRESHOLD, seed=SEED, cube=None):
+    # Длинная таблица с индексом (период, страна, метрика): value, center, scale, z,
+    # anomalous (|z| >= threshold), при n_boot > 0 еще ci_low, ci_high и confident
+    # (весь интервал за порогом с той же стороны)
+    if cube is None:
+        cube = PeriodCube(df, metric_columns(df) if metrics is None else metrics)
+    metrics = cube.metrics
+    values, present = cube.stack(periods, 'mean')                   # (периоды, страны, метрики)
+    values = np.where(present[..., None], values, np.nan)
+    n_periods, n_recipients, n_metrics = values.shape
+
+    # Периоды и метрики — в общие столбцы: (страны, период × метрика)
+    X = values.transpose(1, 0, 2).reshape(n_recipients, -1)
+    center, scale = _center_scale(X, robust)
+    with np.errstate(invalid='ignore'):
+        z = (X - center) / scale
+
+    def flat(a):
+        # (страны, период × метрика) -> порядок (период, страна, метрика)
+        return a.reshape(n_recipients, n_periods, n_metrics).transpose(1, 0, 2).ravel()
+
+    cols = {
+        'value': flat(X),
+        'center': flat(np.broadcast_to(center, X.shape)),
+        'scale': flat(np.broadcast_to(scale, X.shape)),
+        'z': flat(z),
+    }
+    cols['anomalous'] = np.abs(cols['z']) >= threshold
+    if n_boot > 0:
+        low, high = _bootstrap(X, robust, n_boot, ci, seed)
+        cols['ci_low'], cols['ci_high'] = flat(low), flat(high)
+        cols['confident'] = (cols['ci_low'] >= threshold) | (cols['ci_high'] <= -threshold)
+
+    index = pd.MultiIndex.from_product([[label for _, _, label in periods], cube.recipients, metrics],
+                                       names=['period', cube.recipients.name, 'metric'])
+    out = pd.DataFrame(cols, index=index)
+    # Страны, которых не было в периоде, в таблицу не попадают
+    return out[np.repeat(present.ravel(), n_metrics)]
+
+def anomalies(scores, recipients=None, confident=False):
+    # Только аномальные строки, по убыванию |z|
+    mask = scores['confident'] if confident else scores['anomalous']
+    out = scores[mask]
+    if recipients is not None:
+        out = out[out.index.get_level_values('recipient').isin(recipients)]
+    return out.iloc[np.argsort(-out['z'].abs().to_numpy(), kind='stable')]
+
+def _parse_period(text):
+    # '2013-2020', '2021-' или '-2012'; подпись — сам текст
+    start, _, end = text.partition('-')
+    return (int(start) if start else None, int(end) if end else None, text)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Аномалии по всем странам, метрикам и периодам")
+    parser.add_argument('--metrics', nargs='+', help=f"метрики (по умолчанию все {'/'.join(METRIC_PREFIXES)})")
+    parser.add_argument('--periods', nargs='+', help="периоды: 2013-2020, 2021- и т.п. (по умолчанию как в Russia_Anomaly)")
+    parser.add_argument('--countries', nargs='+', help="показать только эти страны")
+    parser.add_argument('--robust', action='store_true', help="медиана и MAD вместо среднего и сигмы")
+    parser.add_argument('--boot', type=int, default=N_BOOT, help="число бутстрэп-выборок (0 — без интервалов)")
+    parser.add_argument('--ci', type=float, default=CI, help="уровень доверительного интервала")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="порог |z|")
+    parser.add_argument('--confident', action='store_true', help="только аномалии, у которых весь интервал за порогом")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', help="сохранить полную таблицу в CSV")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from china_config import load_data
+    from china_constants import COUNTRY_RU, RU_LABELS
+    df, _, _, _ = load_data(columns=args.metrics)
+    if df is None:
+        return 1
+    periods = [_parse_period(p) for p in args.periods] if args.periods else PERIODS
+    scores = anomaly_scores(df, args.metrics, periods, args.robust, args.boot, args.ci,
+                            args.threshold, args.seed)
+    if args.out:
+        scores.to_csv(args.out)
+        print(f"Сохранено: {args.out}")
+
+    found = anomalies(scores, args.countries, args.confident and args.boot > 0).reset_index()
+    found['recipient'] = found['recipient'].map(lambda r: COUNTRY_RU.get(r, r))
+    found['metric'] = found['metric'].map(lambda m: RU_LABELS.get(m, m))
+    print(f"Аномалий (|z| >= {args.threshold}): {len(found)} из {len(scores)}")
+    shown = ['period', 'recipient', 'metric', 'z'] + (['ci_low', 'ci_high'] if args.boot > 0 else [])
+    print(found[shown].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
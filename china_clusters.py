@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from china_constants import CACHE_DIR
+from china_periods import PeriodCube
+from china_trace import traced
+
+# === КЛАСТЕРИЗАЦИЯ ===
+# Общий KMeans для Clusters_Positions и Dynamic_Clusters: страны описываются
+# средними признаков за период, обученные модели кэшируются по ключу
+# (признаки, период, k, seed, n_init, сами данные) — в памяти процесса и на диске
+# в .china_cache/clusters/, так что оба графика используют одну подгонку.
+# Перебор k, наборов признаков и периодов считается параллельно (sweep).
+# rolling_clusters — кластеры по скользящим окнам с теплым стартом от центров
+# предыдущего окна: номера кластеров сохраняют смысл от окна к окну.
+
+FEATURES = ['gdi_idx', 'gsi_idx']
+PERIOD = (2021, None)
+K = 3
+SEED = 42
+N_INIT = 10
+WINDOW = 4
+# Выше этого числа стран silhouette считается по случайной выборке (он O(n^2))
+SILHOUETTE_SAMPLE = 2000
+ROLLING_SPAN = (2005, 2024)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CLUSTER_CACHE = os.path.join(ROOT, CACHE_DIR, 'clusters')
+
+_FITS = {}
+
+class ClusterFit:
+    def __init__(self, stats, model, features, period, k, seed):
+        self.stats = stats            # страна -> средние признаков за период
+        self.model = model
+        self.features = list(features)
+        self.period = period
+        self.k = k
+        self.seed = seed
+        self.labels = pd.Series(model.labels_, index=stats.index, name='cluster')
+        self.inertia = float(model.inertia_)
+        self.silhouette = _silhouette(stats.to_numpy(), model.labels_)
+
+    def centers(self):
+        return pd.DataFrame(self.model.cluster_centers_, columns=self.features)
+
+def _silhouette(X, labels, seed=SEED):
+    # Определен только для 2 <= число кластеров <= n - 1
+    n_labels = len(np.unique(labels))
+    if n_labels < 2 or n_labels > len(X) - 1:
+        return float('nan')
+    sample = SILHOUETTE_SAMPLE if len(X) > SILHOUETTE_SAMPLE else None
+    return float(silhouette_score(X, labels, sample_size=sample, random_state=seed))
+
+def request_period(periods=None):
+    # Периоды из запроса [(start, end, подпись)] -> период подгонки (start, end)
+    if periods is None:
+        return PERIOD
+    if len(periods) != 1:
+        raise ValueError(f"Для кластеров нужен один период, задано: {len(periods)}")
+    return tuple(periods[0][:2])
+
+def period_features(df, features=FEATURES, period=PERIOD):
+    # Средние признаков по странам за [start, end] включительно (None — без границы)
+    start, end = period
+    mask = pd.Series(True, index=df.index)
+    if start is not None: mask &= df['year'] >= start
+    if end is not None: mask &= df['year'] <= end
+    return df[mask].groupby('recipient')[list(features)].mean()
+
+def _fit_key(stats, period, k, seed, n_init):
+    h = hashlib.sha256(json.dumps([list(stats.columns), list(period), k, seed, n_init,
+                                   [str(r) for r in stats.index]]).encode())
+    h.update(np.ascontiguousarray(stats.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()[:24]
+
+def _load_model(key):
+    try:
+        with open(os.path.join(CLUSTER_CACHE, key + '.pkl'), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+def _save_model(key, model):
+    try:
+        os.makedirs(CLUSTER_CACHE, exist_ok=True)
+        tmp = os.path.join(CLUSTER_CACHE, f'{key}.pkl.tmp{os.getpid()}')
+        with open(tmp, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(tmp, os.path.join(CLUSTER_CACHE, key + '.pkl'))
+    except OSError as e:
+        print(f"Не удалось записать кэш кластеров: {e}")
+
+@traced('kmeans')
+def fit_stats(stats, period=PERIOD, k=K, seed=SEED, n_init=N_INIT, use_cache=True):
+    stats = stats.dropna()
+    key = _fit_key(stats, period, k, seed, n_init)
+    if use_cache and key in _FITS:
+        return _FITS[key]
+    model = _load_model(key) if use_cache else None
+    if model is None:
+        # Обучаем на DataFrame, как раньше в скриптах (с именами признаков)
+        model = KMeans(n_clusters=k, random_state=seed, n_init=n_init).fit(stats)
+        if use_cache:
+            _save_model(key, model)
+    fit = ClusterFit(stats, model, stats.columns, tuple(period), k, seed)
+    if use_cache:
+        _FITS[key] = fit
+    return fit
+
+def fit_clusters(df, features=FEATURES, period=PERIOD, k=K, seed=SEED, n_init=N_INIT, use_cache=True):
+    return fit_stats(period_features(df, features, period), period, k, seed, n_init, use_cache)
+
+# === СКОЛЬЗЯЩИЕ ОКНА ===
+class ClusterTrajectory:
+    def __init__(self, windows, membership, centers, inertia, silhouette, features, k, window, step):
+        self.windows = windows          # начальные годы окон
+        self.membership = membership    # страна × окно -> номер кластера (NaN — нет данных)
+        self.centers = centers          # (окно, кластер) × признаки
+        self.inertia = inertia          # окно -> inertia
+        self.silhouette = silhouette    # окно -> silhouette
+        self.features = list(features)
+        self.k = k
+        self.window = window
+        self.step = step
+
+    def labels(self):
+        return [_period_label((s, s + self.window - 1)) for s in self.windows]
+
+    def transitions(self):
+        # Смены кластера между соседними окнами: страна, окно, из какого, в какой
+        m = self.membership
+        rows = []
+        for prev, cur in zip(m.columns[:-1], m.columns[1:]):
+            a, b = m[prev], m[cur]
+            changed = a.notna() & b.notna() & (a != b)
+            rows.extend((r, cur, int(a[r]), int(b[r])) for r in m.index[changed])
+        return pd.DataFrame(rows, columns=['recipient', 'window', 'from_cluster', 'to_cluster'])
+
+def window_features(df, features=FEATURES, window=WINDOW, step=1, span=ROLLING_SPAN):
+    # Средние признаков по всем окнам [y, y + window - 1] за один проход (PeriodCube)
+    means = PeriodCube(df, list(features)).sliding(window, 'mean', step)
+    starts = means.index.get_level_values('start')
+    keep = (starts >= span[0]) & (starts + window - 1 <= span[1])
+    return means[keep]
+
+@traced('kmeans_rolling')
+def rolling_clusters(df, features=FEATURES, k=K, window=WINDOW, step=1, span=ROLLING_SPAN,
+                     seed=SEED, n_init=N_INIT, scores=True, use_cache=True):
+    # scores=False — без silhouette по окнам (на тысячах стран он дороже самих подгонок)
+    means = window_features(df, features, window, step, span)
+    key = 'rolling_' + _fit_key(means.reset_index('start'), (window, step, scores) + tuple(span), k, seed, n_init)
+    if use_cache and key in _FITS:
+        return _FITS[key]
+    cached = _load_model(key) if use_cache else None
+    if cached is not None:
+        _FITS[key] = cached
+        return cached
+
+    windows = sorted(means.index.get_level_values('start').unique())
+    membership, centers, inertia, silhouette = {}, {}, {}, {}
+    prev = None
+    for start in windows:
+        X = means.xs(start, level='start').dropna()
+        if len(X) < k:
+            continue
+        if prev is None:
+            # Первое окно — полный KMeans с n_init запусками
+            model = KMeans(n_clusters=k, random_state=seed, n_init=n_init).fit(X)
+        else:
+            # Дальше — один запуск от центров предыдущего окна
+            model = KMeans(n_clusters=k, init=prev, n_init=1, random_state=seed).fit(X)
+        prev = model.cluster_centers_
+        membership[start] = pd.Series(model.labels_, index=X.index)
+        centers[start] = pd.DataFrame(model.cluster_centers_, columns=list(features))
+        inertia[start] = float(model.inertia_)
+        silhouette[start] = _silhouette(X.to_numpy(), model.labels_, seed) if scores else float('nan')
+
+    fitted = list(membership)
+    trajectory = ClusterTrajectory(
+        fitted,
+        pd.DataFrame(membership).reindex(columns=fitted),
+        pd.concat(centers, names=['start', 'cluster']) if centers else pd.DataFrame(columns=list(features)),
+        pd.Series(inertia, name='inertia'),
+        pd.Series(silhouette, name='silhouette'),
+        features, k, window, step)
+    if use_cache:
+        _save_model(key, trajectory)
+        _FITS[key] = trajectory
+    return trajectory
+
+# === ПЕРЕБОР ПАРАМЕТРОВ ===
+def _sweep_job(args):
+    stats, period, k, seed, n_init = args
+    if k > len(stats.dropna()):
+        return float('nan'), float('nan')
+    fit = fit_stats(stats, period, k, seed, n_init)
+    return fit.inertia, fit.silhouette
+
+def sweep(df, ks=range(2, 8), feature_sets=(FEATURES,), periods=(PERIOD,), seed=SEED, n_init=N_INIT, jobs=1):
+    # Таблица: признаки, период, k -> inertia и silhouette
+    combos, tasks = [], []
+    for features in feature_sets:
+        for period in periods:
+            stats = period_features(df, features, period)
+            for k in ks:
+                combos.append(('+'.join(features), _period_label(period), k, len(stats.dropna())))
+                tasks.append((stats, tuple(period), int(k), seed, n_init))
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            scores = list(pool.map(_sweep_job, tasks))
+    else:
+        scores = [_sweep_job(t) for t in tasks]
+
+    rows = [(*c, inertia, sil) for c, (inertia, sil) in zip(combos, scores)]
+    return pd.DataFrame(rows, columns=['features', 'period', 'k', 'n', 'inertia', 'silhouette'])
+
+def _period_label(period):
+    start, end = period
+    return f"{start if start is not None else ''}-{end if end is not None else ''}"
+
+def _parse_period(text):
+    # '2013-2020', '2021-' или '-2012'
+    start, _, end = text.partition('-')
+    return (int(start) if start else None, int(end) if end else None)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор параметров KMeans: k, признаки, периоды")
+    parser.add_argument('--k', nargs='+', type=int, default=list(range(2, 8)), help="значения k")
+    parser.add_argument('--features', nargs='+', default=[','.join(FEATURES)],
+                        help="наборы признаков через запятую, например gdi_idx,gsi_idx gdi_idx,gsi_idx,gci_idx")
+    parser.add_argument('--periods', nargs='+', default=[_period_label(PERIOD)],
+                        help="периоды: 2013-2020, 2021- и т.п.")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="число процессов (0 — по числу ядер)")
+    parser.add_argument('--rolling', action='store_true',
+                        help=f"кластеры по скользящим окнам {ROLLING_SPAN[0]}-{ROLLING_SPAN[1]} (теплый старт)")
+    parser.add_argument('--window', type=int, default=WINDOW, help="ширина окна в годах (для --rolling)")
+    parser.add_argument('--step', type=int, default=1, help="шаг окна в годах (для --rolling)")
+    parser.add_argument('--out', help="сохранить таблицу в CSV")
+    return parser.parse_args(argv)
+
+def _print_rolling(df, args, feature_sets):
+    from china_constants import COUNTRY_RU
+    tables = []
+    for features in feature_sets:
+        for k in args.k:
+            traj = rolling_clusters(df, features, k, args.window, args.step, seed=args.seed)
+            print(f"\n[{'+'.join(features)}, k={k}, окно {args.window} г.]")
+            scores = pd.DataFrame({'inertia': traj.inertia, 'silhouette': traj.silhouette})
+            scores.index = traj.labels()
+            print(scores.to_string(float_format=lambda v: f"{v:.4f}"))
+            members = traj.membership.copy()
+            members.columns = traj.labels()
+            members.index = [COUNTRY_RU.get(r, r) for r in members.index]
+            print(members.astype('Int64').to_string())
+            moves = traj.transitions()
+            print(f"Смен кластера: {len(moves)}")
+            table = traj.membership.stack().rename('cluster').reset_index()
+            table.columns = ['recipient', 'start', 'cluster']
+            table.insert(0, 'k', k)
+            table.insert(0, 'features', '+'.join(features))
+            tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from china_config import load_data
+    feature_sets = [f.split(',') for f in args.features]
+    columns = sorted({c for fs in feature_sets for c in fs})
+    df, _, _, _ = load_data(columns=columns)
+    if df is None:
+        return 1
+    if args.rolling:
+        table = _print_rolling(df, args, feature_sets)
+        if args.out:
+            table.to_csv(args.out, index=False)
+            print(f"Сохранено: {args.out}")
+        return 0
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    table = sweep(df, args.k, feature_sets, [_parse_period(p) for p in args.periods], args.seed, jobs=jobs)
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"Сохранено: {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
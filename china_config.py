@@ -1,27 +1,52 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.axes as maxes
-import matplotlib.figure as mfig
-from matplotlib.offsetbox import OffsetImage, AnnotationBbox
-from PIL import Image, ImageOps, ImageDraw
 import os
-from sklearn.preprocessing import MinMaxScaler
-import seaborn as sns
+import sys
+import json
+import shutil
+import hashlib
+import importlib.abc
+import importlib.util
+from functools import lru_cache
+from contextlib import contextmanager
+from io import BytesIO
+import numpy as np
+from china_constants import *
+from china_trace import traced, trace_method
+# pandas, matplotlib, PIL и china_indices импортируются внутри функций, которым они
+# нужны: china_config загружают и модули без графиков (china_correlation, china_ingest,
+# china_server), им хватает load_data. sklearn и seaborn не нужны вовсе — индексы
+# считает china_indices, палитра seaborn задана в china_constants.PALETTE.
+
+# === НАСТРОЙКА MATPLOTLIB ===
+# Стиль ставится, как только загружен matplotlib (до него или после china_config — все
+# равно), а шрифты перехватываются при создании первой фигуры (хук figure.hooks).
 
+_FIGURE_HOOK = f'{__name__}:_setup_figure'
 
-# 1. Глобальные настройки для элементов, где размер не задан явно
-plt.rcParams.update({
-    'font.size': 14,
-    'axes.labelsize': 16,
-    'xtick.labelsize': 14,
-    'ytick.labelsize': 14,
-    'legend.fontsize': 14,
-    'axes.titlesize': 18
-})
+def _setup_style(matplotlib):
+    from matplotlib import style
+    from matplotlib.colors import to_rgb
+    from cycler import cycler
+    # Профиль рендера задан снаружи (CHINA_RENDER_PROFILE) — рисуем без экрана
+    if os.environ.get(PROFILE_ENV):
+        matplotlib.use('Agg')
+    # 1. Глобальные настройки для элементов, где размер не задан явно
+    matplotlib.rcParams.update({
+        'font.size': 14,
+        'axes.labelsize': 16,
+        'xtick.labelsize': 14,
+        'ytick.labelsize': 14,
+        'legend.fontsize': 14,
+        'axes.titlesize': 18
+    })
+    matplotlib.rcParams['font.family'] = 'Arial'
+    style.use('seaborn-v0_8-whitegrid')
+    # То же, что sns.set_palette("muted")
+    matplotlib.rcParams['axes.prop_cycle'] = cycler('color', [to_rgb(c) for c in PALETTE])
+    if _FIGURE_HOOK not in matplotlib.rcParams['figure.hooks']:
+        matplotlib.rcParams['figure.hooks'] = matplotlib.rcParams['figure.hooks'] + [_FIGURE_HOOK]
 
 # 2. Перехватываем методы Matplotlib, чтобы автоматически увеличить 
-SCALE_FACTOR = 1.4 
+#    шрифты в SCALE_FACTOR раз (константа в china_constants)
 
 def patch_matplotlib_method(cls, method_name):
     orig_method = getattr(cls, method_name)
@@ -33,58 +58,45 @@ def patch_matplotlib_method(cls, method_name):
         return orig_method(self, *args, **kwargs)
     setattr(cls, method_name, hooked_method)
 
-for method in['text', 'set_title', 'set_xlabel', 'set_ylabel', 'set_xticklabels', 'set_yticklabels', 'legend']:
-    if hasattr(maxes.Axes, method):
-        patch_matplotlib_method(maxes.Axes, method)
-
-patch_matplotlib_method(mfig.Figure, 'text')
-if hasattr(mfig.Figure, 'legend'):
-    patch_matplotlib_method(mfig.Figure, 'legend')
-
-# === КОНСТАНТЫ ===
-plt.rcParams['font.family'] = 'Arial'
-SOURCE_TEXT = "Source: Mapping China’s Borderlands Dataset (2025)"
-
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("muted")
-
-BORDER_COUNTRIES =[
-    "Afghanistan", "Bhutan", "India", "Kazakhstan", "Kyrgyzstan",
-    "Laos", "Mongolia", "Myanmar", "Nepal", "North Korea",
-    "Pakistan", "Russia", "Tajikistan", "Vietnam",
-    "Japan", "South Korea", "Philippines", "Malaysia", "Brunei", "Indonesia"
-]
-
-# === ПЕРЕМЕННЫЕ ===
-# Экономика
-GDI_COLS =['dev_03_fdi_usd', 'dev_01_currency_swap_p_usd']
-
-# Безопасность
-GSI_COLS =['sec_01_arms_transfer_tiv', 'sec_04_joint_exercise_ct', 'sec_03_military_engagement_ct']
-
-# Гуманитарка
-GCI_COLS = ['civ_05_judicial_engagement_ct'] 
-
-RU_LABELS = {
-    'gdi_idx': 'Экономика (FDI/Swaps)',
-    'gsi_idx': 'Безопасность (Оружие/Учения)',
-    'dev_03_fdi_usd': 'Прямые инвестиции (FDI)',
-    'dev_01_currency_swap_p_usd': 'Валютные свопы',
-    'sec_01_arms_transfer_tiv': 'Торговля оружием',
-    'sec_04_joint_exercise_ct': 'Военные учения',
-    'sec_03_military_engagement_ct': 'Военная дипломатия',
-    'civ_05_judicial_engagement_ct': 'Судебная дипломатия'
-}
-
-COUNTRY_RU = {
-    "Afghanistan": "Афганистан", "Bhutan": "Бутан", "India": "Индия",
-    "Kazakhstan": "Казахстан", "Kyrgyzstan": "Киргизия", "Laos": "Лаос",
-    "Mongolia": "Монголия", "Myanmar": "Мьянма", "Nepal": "Непал",
-    "North Korea": "КНДР", "Pakistan": "Пакистан", "Russia": "Россия",
-    "Tajikistan": "Таджикистан", "Vietnam": "Вьетнам", "Japan": "Япония",
-    "South Korea": "Южная Корея", "Philippines": "Филиппины",
-    "Malaysia": "Малайзия", "Brunei": "Бруней", "Indonesia": "Индонезия"
-}
+_figures_patched = False
+
+def _setup_figure(fig=None):
+    # Хук pyplot.figure: методы перехватываются один раз, на первой фигуре
+    global _figures_patched
+    if _figures_patched:
+        return
+    _figures_patched = True
+    import matplotlib.axes as maxes
+    import matplotlib.figure as mfig
+    for method in['text', 'set_title', 'set_xlabel', 'set_ylabel', 'set_xticklabels', 'set_yticklabels', 'legend']:
+        if hasattr(maxes.Axes, method):
+            patch_matplotlib_method(maxes.Axes, method)
+
+    patch_matplotlib_method(mfig.Figure, 'text')
+    if hasattr(mfig.Figure, 'legend'):
+        patch_matplotlib_method(mfig.Figure, 'legend')
+
+    # 3. tight_layout во всех скриптах — отдельный этап трассировки (china_trace)
+    trace_method(mfig.Figure, 'tight_layout')
+
+class _MatplotlibImportHook(importlib.abc.MetaPathFinder):
+    # Ставит стиль сразу после импорта matplotlib, если china_config загружен раньше него
+    def find_spec(self, name, path=None, target=None):
+        if name != 'matplotlib':
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+        def exec_and_setup(module):
+            exec_module(module)
+            _setup_style(module)
+        spec.loader.exec_module = exec_and_setup
+        return spec
+
+if 'matplotlib' in sys.modules:
+    _setup_style(sys.modules['matplotlib'])
+else:
+    sys.meta_path.insert(0, _MatplotlibImportHook())
 
 def add_source(fig, extra_sources=None, use_default=True):
     if use_default:
@@ -95,44 +107,361 @@ def add_source(fig, extra_sources=None, use_default=True):
         text = extra_sources if extra_sources else ""
         
     if text:
+        import matplotlib.pyplot as plt
         # Увеличил размер шрифта источника здесь до 13
         plt.figtext(0.5, 0.015, text, ha="center", fontsize=13, style='italic', color='#444444', wrap=True)
 
-def get_circular_flag(country_name, zoom=0.13):
+# === ПРОФИЛЬ РЕНДЕРА ===
+# Разрешение, формат и качество JPEG для всех графиков берутся из RENDER_PROFILES.
+RENDER_PROFILE = os.environ.get(PROFILE_ENV, 'print')
+if RENDER_PROFILE not in RENDER_PROFILES:
+    raise ValueError(f"Неизвестный профиль рендера: {RENDER_PROFILE}. Доступны: {', '.join(RENDER_PROFILES)}")
+
+def set_render_profile(name):
+    # Через окружение профиль наследуют и процессы-воркеры render_all
+    global RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Неизвестный профиль рендера: {name}. Доступны: {', '.join(RENDER_PROFILES)}")
+    RENDER_PROFILE = name
+    os.environ[PROFILE_ENV] = name
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+def output_path(filename):
+    # Имя файла с расширением формата текущего профиля
+    root, _ = os.path.splitext(filename)
+    return f"{root}.{RENDER_PROFILES[RENDER_PROFILE]['format']}"
+
+# Внутри capture_figures картинки не пишутся на диск, а собираются байтами
+# {имя без расширения: bytes} — так их забирает сервер графиков (china_server)
+_capture = None
+
+@contextmanager
+def capture_figures(fmt=None):
+    global _capture
+    prev, _capture = _capture, {'format': fmt, 'images': {}}
+    try:
+        yield _capture['images']
+    finally:
+        _capture = prev
+
+@traced('savefig')
+def save_figure(filename, fig=None, **kwargs):
+    profile = RENDER_PROFILES[RENDER_PROFILE]
+    path = output_path(filename)
+    fmt = (_capture and _capture['format']) or profile['format']
+    opts = {'dpi': profile['dpi']}
+    if profile['quality'] is not None and fmt in ('jpg', 'jpeg'):
+        opts['pil_kwargs'] = {'quality': profile['quality']}
+    opts.update(kwargs)
+    target = path
+    if _capture is not None:
+        target = BytesIO()
+        opts['format'] = fmt
+    if fig is None:
+        import matplotlib.pyplot as plt
+        plt.savefig(target, **opts)
+    else:
+        fig.savefig(target, **opts)
+    if _capture is not None:
+        _capture['images'][os.path.splitext(os.path.basename(filename))[0]] = target.getvalue()
+    return path
+
+# === ФЛАГИ ===
+# Круглые спрайты флагов считаются один раз на процесс (LRU) и могут браться
+# из готового атласа flags/.atlas.npy, который читается через mmap.
+def _find_flag(country_name, base_dir):
+    filename = f"{country_name.lower().strip()}.jpg"
+    path = os.path.join(base_dir, 'flags', filename)
+    if not os.path.exists(path):
+        path = os.path.join(base_dir, filename)
+        if not os.path.exists(path):
+            return None
+    return path
+
+def _make_flag_sprite(path):
+    from PIL import Image, ImageOps, ImageDraw
+    img = Image.open(path).convert("RGBA")
+    size = FLAG_SIZE
+    img = ImageOps.fit(img, size, centering=(0.5, 0.5))
+    mask = Image.new('L', size, 0); ImageDraw.Draw(mask).ellipse((0, 0) + size, fill=255)
+    output = Image.new('RGBA', size, (0, 0, 0, 0)); output.paste(img, (0, 0), mask)
+    ImageDraw.Draw(output).ellipse((0, 0) + size, outline=(80, 80, 80, 255), width=14)
+    return np.asarray(output)
+
+def _flag_sources(flags_dir):
+    sources = {}
+    for name in sorted(os.listdir(flags_dir)):
+        # get_circular_flag ищет файл по имени в нижнем регистре — остальные недостижимы
+        if name.endswith('.jpg') and name == name.lower():
+            st = os.stat(os.path.join(flags_dir, name))
+            sources[name[:-4]] = [st.st_size, st.st_mtime_ns]
+    return sources
+
+# Собирает все флаги из flags/ в один массив (N, 300, 300, 4) рядом с картинками
+def build_flag_atlas(base_dir=None):
+    flags_dir = os.path.join(base_dir or os.getcwd(), 'flags')
+    sources = _flag_sources(flags_dir)
+    names = list(sources)
+    atlas = np.zeros((len(names),) + FLAG_SIZE + (4,), dtype=np.uint8)
+    for i, name in enumerate(names):
+        atlas[i] = _make_flag_sprite(os.path.join(flags_dir, f"{name}.jpg"))
+    np.save(os.path.join(flags_dir, FLAG_ATLAS + '.npy'), atlas)
+    with open(os.path.join(flags_dir, FLAG_ATLAS + '.json'), 'w', encoding='utf-8') as f:
+        json.dump({'names': names, 'sources': sources, 'size': list(FLAG_SIZE)}, f, ensure_ascii=False)
+    _load_flag_atlas.cache_clear()
+    _flag_sprite.cache_clear()
+    return len(names)
+
+@lru_cache(maxsize=None)
+def _load_flag_atlas(base_dir):
+    flags_dir = os.path.join(base_dir, 'flags')
+    try:
+        with open(os.path.join(flags_dir, FLAG_ATLAS + '.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        # Устаревший атлас (флаги поменялись) просто игнорируем
+        if meta['sources'] != _flag_sources(flags_dir) or tuple(meta['size']) != FLAG_SIZE:
+            return None
+        atlas = np.load(os.path.join(flags_dir, FLAG_ATLAS + '.npy'), mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    return atlas, {name: i for i, name in enumerate(meta['names'])}
+
+@lru_cache(maxsize=FLAG_CACHE_SIZE)
+@traced('flag_load')
+def _flag_sprite(country_key, base_dir):
+    atlas = _load_flag_atlas(base_dir)
+    if atlas is not None and country_key in atlas[1]:
+        return atlas[0][atlas[1][country_key]]
+    path = _find_flag(country_key, base_dir)
+    return _make_flag_sprite(path) if path else None
+
+# Готовый круглый флаг как массив RGBA (300×300) или None
+def get_flag_sprite(country_name):
     try:
-        filename = f"{country_name.lower().strip()}.jpg"
-        path = os.path.join(os.getcwd(), 'flags', filename) 
-        if not os.path.exists(path): 
-            path = os.path.join(os.getcwd(), filename)
-            if not os.path.exists(path):
-                return None
-        img = Image.open(path).convert("RGBA")
-        size = (300, 300)
-        img = ImageOps.fit(img, size, centering=(0.5, 0.5))
-        mask = Image.new('L', size, 0); ImageDraw.Draw(mask).ellipse((0, 0) + size, fill=255)
-        output = Image.new('RGBA', size, (0, 0, 0, 0)); output.paste(img, (0, 0), mask)
-        ImageDraw.Draw(output).ellipse((0, 0) + size, outline=(80, 80, 80, 255), width=14)
-        return OffsetImage(output, zoom=zoom)
+        return _flag_sprite(country_name.lower().strip(), os.getcwd())
     except: return None
 
-def load_data():
+def get_circular_flag(country_name, zoom=0.13):
+    sprite = get_flag_sprite(country_name)
+    if sprite is None: return None
+    from matplotlib.offsetbox import OffsetImage
+    return OffsetImage(sprite, zoom=zoom)
+
+# === КЭШ ДАННЫХ ===
+# Типизированный колоночный кэш (по одному .npy на колонку) рядом с CSV.
+# Ключ кэша — хэш содержимого CSV и списков колонок, устаревший кэш пересобирается сам.
+@traced('cache_key')
+def _cache_key(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    h.update(json.dumps([CACHE_VERSION, BORDER_COUNTRIES, INDEX_COLS, INDEX_WEIGHTS]).encode())
+    return h.hexdigest()[:20]
+
+def _cache_root(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+
+def _cache_path(path):
+    # У каждого исходного файла (china_data.csv, china_data.xlsx) свой каталог <имя>-<ключ>
+    return os.path.join(_cache_root(path), f"{os.path.basename(path)}-{_cache_key(path)}")
+
+@traced('cache_write')
+def _write_cache(df, cache_path):
+    import pandas as pd
+    root = os.path.dirname(cache_path)
+    os.makedirs(root, exist_ok=True)
+    tmp = cache_path + f'.tmp{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    meta = {'columns': [], 'text': [], 'dtypes': {}}
+    np.save(os.path.join(tmp, '__index__.npy'), df.index.to_numpy())
+    for i, c in enumerate(df.columns):
+        s = df[c]
+        fname = f'{i:03d}.npy'
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            np.save(os.path.join(tmp, fname), s.to_numpy())
+        else:
+            # Строки храним как юникод фиксированной ширины + маска пропусков
+            meta['text'].append(c)
+            np.save(os.path.join(tmp, fname), s.fillna('').astype(str).to_numpy(dtype=str))
+            np.save(os.path.join(tmp, f'{i:03d}.null.npy'), s.isna().to_numpy())
+        meta['columns'].append(c)
+        meta['dtypes'][c] = str(s.dtype)
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Атомарно подменяем каталог и убираем старые версии кэша того же файла
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp, cache_path)
+    current = os.path.basename(cache_path)
+    prefix = current.rsplit('-', 1)[0] + '-'
+    for name in os.listdir(root):
+        if name != current and name.startswith(prefix):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+@traced('cache_read')
+def _read_cache(cache_path, mmap=False, columns=None, recipients=None, years=None):
+    import pandas as pd
+    mmap_mode = 'r' if mmap else None
+    with open(os.path.join(cache_path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    positions = {c: i for i, c in enumerate(meta['columns'])}
+
+    def read(c):
+        i = positions[c]
+        arr = np.load(os.path.join(cache_path, f'{i:03d}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        if c in meta['text']:
+            s = pd.Series(arr, dtype=meta['dtypes'][c])
+            s[np.load(os.path.join(cache_path, f'{i:03d}.null.npy'))] = np.nan
+            arr = s.to_numpy()
+        return arr
+
+    # Фильтр строк считаем по двум колонкам, остальные читаем уже только по маске
+    mask = None
+    if recipients is not None:
+        mask = np.isin(read('recipient'), list(recipients))
+    if years is not None:
+        y = read('year')
+        y_mask = (y >= (years[0] if years[0] is not None else y.min())) & \
+                 (y <= (years[1] if years[1] is not None else y.max()))
+        mask = y_mask if mask is None else mask & y_mask
+
+    wanted = _projection(meta['columns'], columns)
+    data = {c: read(c) if mask is None else read(c)[mask] for c in wanted}
+    index = np.load(os.path.join(cache_path, '__index__.npy'), allow_pickle=False)
+    df = pd.DataFrame(data, index=index if mask is None else index[mask], copy=not mmap)
+    for c in meta['text']:
+        if c in df.columns:
+            df[c] = df[c].astype(meta['dtypes'][c])
+    return df
+
+def _projection(available, columns):
+    # year и recipient нужны всегда; неизвестные колонки пропускаем (скрипты досоздают их сами)
+    if columns is None:
+        return list(available)
+    wanted = {'year', 'recipient'} | set(columns)
+    return [c for c in available if c in wanted]
+
+def _filter_rows(df, recipients=None, years=None):
+    if recipients is not None:
+        df = df[df['recipient'].isin(list(recipients))]
+    if years is not None:
+        if years[0] is not None: df = df[df['year'] >= years[0]]
+        if years[1] is not None: df = df[df['year'] <= years[1]]
+    return df
+
+def _prepare_frame(df):
+    # Сырые строки CSV -> схема load_data (без индексов): страны, имена колонок,
+    # исходные колонки индексов без пропусков
+    import pandas as pd
+    df = df[df['recipient'].isin(BORDER_COUNTRIES)].copy()
+    df['recipient'] = df['recipient'].str.strip()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+
+    all_cols = GDI_COLS + GSI_COLS + GCI_COLS
+    for c in all_cols:
+        if c not in df.columns: df[c] = 0
+        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    return df
+
+@traced('parse_csv')
+def _read_csv(path, columns=None):
+    # Для индексов gdi/gsi/gci всегда нужны исходные колонки и все строки
+    import pandas as pd
+    usecols = None
+    if columns is not None:
+        wanted = {'year', 'recipient'} | set(columns) | set(GDI_COLS + GSI_COLS + GCI_COLS)
+        usecols = lambda c: str(c).strip().lower() in wanted
+    df = pd.read_csv(path, sep=None, engine='python', encoding='utf-8-sig', na_values='NA', usecols=usecols)
+    return _prepare_frame(df)
+
+def _read_source(path, columns=None):
+    # Книгу Excel разбирает china_xlsx — со сверкой схемы по china_data.csv
+    if str(path).lower().endswith('.xlsx'):
+        from china_xlsx import read_xlsx
+        return _prepare_frame(read_xlsx(path))
+    return _read_csv(path, columns)
+
+def _parse_csv(path, columns=None):
+    from china_indices import add_indices
+    df = _read_source(path, columns)
+    add_indices(df)
+    return df
+
+# === КОМПАКТНАЯ СХЕМА ===
+# recipient -> category, year -> int16, метрики -> float32 там, где это не теряет
+# точность (по умолчанию только без потерь), флаги Y/N -> bool.
+def _fits_float32(s, rtol):
+    v = s.to_numpy(dtype=np.float64)
+    v32 = v.astype(np.float32).astype(np.float64)
+    if rtol:
+        return np.allclose(v32, v, rtol=rtol, atol=0, equal_nan=True)
+    return np.array_equal(v32, v, equal_nan=True)
+
+@traced('compact')
+def compact_frame(df, rtol=0.0, verbose=True):
+    import pandas as pd
+    before = df.memory_usage(deep=True).sum()
+    out = df.copy()
+    for c in out.columns:
+        s = out[c]
+        if c == 'recipient':
+            out[c] = s.astype('category')
+        elif c == 'year':
+            if s.notna().all() and s.between(np.iinfo(np.int16).min, np.iinfo(np.int16).max).all():
+                out[c] = s.astype(np.int16)
+        elif pd.api.types.is_float_dtype(s):
+            if _fits_float32(s, rtol):
+                out[c] = s.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(s):
+            out[c] = pd.to_numeric(s, downcast='integer')
+        elif not pd.api.types.is_numeric_dtype(s) and set(s.dropna().unique()) <= set(FLAG_VALUES):
+            flags = s.map(FLAG_VALUES)
+            out[c] = flags.astype(bool) if s.notna().all() else flags.astype('boolean')
+    if verbose:
+        after = out.memory_usage(deep=True).sum()
+        print(f"Компактная схема: {before / 1e6:.2f} -> {after / 1e6:.2f} МБ "
+              f"(экономия {100 * (1 - after / before):.0f}%)")
+    return out
+
+# mmap=True — колонки кэша отображаются в память без чтения в процесс
+# (используется воркерами render_all при параллельной сборке).
+# columns / recipients / years=(start, end) — читаются только нужные колонки и строки;
+# year и recipient возвращаются всегда.
+@traced('load_data')
+def load_data(path=DATA_FILE, use_cache=True, mmap=False, compact=False,
+              columns=None, recipients=None, years=None):
     try:
-        df = pd.read_csv('china_data.csv', sep=None, engine='python', encoding='utf-8-sig', na_values='NA')
-        df = df[df['recipient'].isin(BORDER_COUNTRIES)].copy()
-        df['recipient'] = df['recipient'].str.strip()
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        
-        all_cols = GDI_COLS + GSI_COLS + GCI_COLS
-        for c in all_cols:
-            if c not in df.columns: df[c] = 0
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-
-        scaler = MinMaxScaler()
-        df['gdi_idx'] = scaler.fit_transform(df[GDI_COLS].mean(axis=1).values.reshape(-1,1))
-        df['gsi_idx'] = scaler.fit_transform(df[GSI_COLS].mean(axis=1).values.reshape(-1,1))
-        df['gci_idx'] = scaler.fit_transform(df[GCI_COLS].values.reshape(-1,1))
-        
+        from china_indices import add_indices, STATE_FILE as INDEX_STATE_FILE
+        df = None
+        if use_cache:
+            cache_path = _cache_path(path)
+            if os.path.exists(os.path.join(cache_path, 'meta.json')):
+                try:
+                    df = _read_cache(cache_path, mmap, columns, recipients, years)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Кэш поврежден, пересобираем: {e}")
+        if df is None:
+            if use_cache:
+                # Кэш всегда строится по полной таблице, проекция — уже при чтении
+                df = _read_source(path)
+                state = add_indices(df)
+                try:
+                    _write_cache(df, cache_path)
+                    state.save(os.path.join(cache_path, INDEX_STATE_FILE))
+                except OSError as e:
+                    print(f"Не удалось записать кэш: {e}")
+            else:
+                df = _parse_csv(path, columns)
+            df = _filter_rows(df, recipients, years)
+            df = df[_projection(df.columns, columns)]
+        if compact:
+            df = compact_frame(df)
+
         return df, 'sec_01_arms_transfer_tiv', 'dev_03_fdi_usd', 'sec_03_military_engagement_ct'
     except Exception as e:
         print(f"Ошибка в china_config: {e}")
-        return None, None, None, None
\ No newline at end of file
+        return None, None, None, None
@@ -0,0 +1,85 @@
+# === КОНСТАНТЫ ПРОЕКТА ===
+# Только данные, без импортов тяжелых библиотек: модуль грузится за миллисекунды.
+# Скриптам и утилитам, которым нужны лишь списки стран и подписи, достаточно
+# импортировать его. china_config реэкспортирует все эти имена.
+
+# Множитель шрифтов для перехваченных методов Matplotlib (см. china_config)
+SCALE_FACTOR = 1.4
+
+SOURCE_TEXT = "Source: Mapping China’s Borderlands Dataset (2025)"
+
+# Палитра seaborn "muted" — задается без импорта seaborn
+PALETTE = ['#4878D0', '#EE854A', '#6ACC64', '#D65F5F', '#956CB4',
+           '#8C613C', '#DC7EC0', '#797979', '#D5BB67', '#82C6E2']
+
+BORDER_COUNTRIES =[
+    "Afghanistan", "Bhutan", "India", "Kazakhstan", "Kyrgyzstan",
+    "Laos", "Mongolia", "Myanmar", "Nepal", "North Korea",
+    "Pakistan", "Russia", "Tajikistan", "Vietnam",
+    "Japan", "South Korea", "Philippines", "Malaysia", "Brunei", "Indonesia"
+]
+
+# === ПЕРЕМЕННЫЕ ===
+# Экономика
+GDI_COLS =['dev_03_fdi_usd', 'dev_01_currency_swap_p_usd']
+
+# Безопасность
+GSI_COLS =['sec_01_arms_transfer_tiv', 'sec_04_joint_exercise_ct', 'sec_03_military_engagement_ct']
+
+# Гуманитарка
+GCI_COLS = ['civ_05_judicial_engagement_ct']
+
+# Композитные индексы: взвешенное среднее колонок, приведенное к [0, 1] по min/max
+# всех строк (china_indices). Веса по умолчанию равные — простое среднее колонок;
+# свои веса, например: {'gsi_idx': {'sec_01_arms_transfer_tiv': 2.0}}
+INDEX_COLS = {'gdi_idx': GDI_COLS, 'gsi_idx': GSI_COLS, 'gci_idx': GCI_COLS}
+INDEX_WEIGHTS = {}
+
+RU_LABELS = {
+    'gdi_idx': 'Экономика (FDI/Swaps)',
+    'gsi_idx': 'Безопасность (Оружие/Учения)',
+    'dev_03_fdi_usd': 'Прямые инвестиции (FDI)',
+    'dev_01_currency_swap_p_usd': 'Валютные свопы',
+    'sec_01_arms_transfer_tiv': 'Торговля оружием',
+    'sec_04_joint_exercise_ct': 'Военные учения',
+    'sec_03_military_engagement_ct': 'Военная дипломатия',
+    'civ_05_judicial_engagement_ct': 'Судебная дипломатия'
+}
+
+COUNTRY_RU = {
+    "Afghanistan": "Афганистан", "Bhutan": "Бутан", "India": "Индия",
+    "Kazakhstan": "Казахстан", "Kyrgyzstan": "Киргизия", "Laos": "Лаос",
+    "Mongolia": "Монголия", "Myanmar": "Мьянма", "Nepal": "Непал",
+    "North Korea": "КНДР", "Pakistan": "Пакистан", "Russia": "Россия",
+    "Tajikistan": "Таджикистан", "Vietnam": "Вьетнам", "Japan": "Япония",
+    "South Korea": "Южная Корея", "Philippines": "Филиппины",
+    "Malaysia": "Малайзия", "Brunei": "Бруней", "Indonesia": "Индонезия"
+}
+
+# Позиция стран по инициативам КНР (Clusters_Positions, группы в china_correlation)
+POSITION_GROUPS = {
+    "SUPPORTED_ALL": ["Bhutan", "Kazakhstan", "Kyrgyzstan", "Laos", "Mongolia", "Myanmar", "Pakistan", "Russia", "Tajikistan", "Malaysia", "Brunei"],
+    "PARTIALLY": ["Nepal", "Vietnam", "Philippines", "Indonesia"],
+    "NOTHING_SAID": ["Afghanistan", "North Korea", "South Korea"],
+    "NOT_SUPPORTED": ["India", "Japan"]
+}
+
+# === ПРОФИЛИ РЕНДЕРА ===
+# print — итоговые картинки (300 dpi), draft — быстрый черновик для подгонки верстки.
+# Профиль выбирается переменной окружения PROFILE_ENV или флагом render_all.py --profile.
+PROFILE_ENV = 'CHINA_RENDER_PROFILE'
+RENDER_PROFILES = {
+    'print': {'dpi': 300, 'format': 'jpg', 'quality': None},
+    'draft': {'dpi': 72, 'format': 'jpg', 'quality': 60},
+}
+
+# === ФЛАГИ ===
+FLAG_SIZE = (300, 300)
+FLAG_CACHE_SIZE = 64
+FLAG_ATLAS = '.atlas'
+
+# === ДАННЫЕ ===
+DATA_FILE = 'china_data.csv'
+CACHE_DIR = '.china_cache'
+CACHE_VERSION = 1
+FLAG_VALUES = {'Y': True, 'N': False}
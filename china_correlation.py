@@ -0,0 +1,267 @@
+import argparse
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from china_constants import POSITION_GROUPS
+from china_trace import traced
+
+# === КОРРЕЛЯЦИИ ===
+# Матрицы Пирсона и Спирмена по наблюдениям страна-год для любого набора метрик:
+# за весь период, по периодам, по скользящим окнам и по группам стран.
+# Пропуски обрабатываются попарно, как в DataFrame.corr(): все попарные суммы —
+# это несколько матричных произведений по маске наличия значений.
+# Спирмен — Пирсон по рангам; при пропусках ранги пары считаются по ее общим строкам.
+# p-значения — перестановочный тест той же статистики r: значения второго столбца пары
+# переставляются внутри общих строк пары (для Спирмена — ранги по этим строкам).
+# Пары с одинаковыми общими строками проверяются вместе, одним матричным произведением на пачку перестановок.
+
+METHODS = ('pearson', 'spearman')
+METRIC_PREFIXES = ('sec_', 'dev_', 'civ_')
+N_PERM = 1000
+SEED = 42
+# Предел числа элементов в одной пачке перестановок (перестановки × общие строки × столбцы)
+PERM_BATCH = 2**24
+# Меньше общих строк — p-значение не считается (у перестановок слишком мало
+# различных значений r)
+MIN_PAIRS = 5
+
+def metric_columns(df):
+    return [c for c in df.select_dtypes('number').columns if c.startswith(METRIC_PREFIXES)]
+
+def _ranks(X):
+    # Средние ранги по столбцам, NaN остаются NaN
+    return pd.DataFrame(X).rank(method='average').to_numpy(dtype=np.float64)
+
+def _pairwise_ranks(X, W):
+    # R[i, k, j] — ранг x_i в строке k среди строк, где есть и x_i, и x_j (как ранжирует
+    # DataFrame.corr('spearman') каждую пару). Один проход сортировки на столбец:
+    # накопленные суммы маски по отсортированным строкам дают ранги сразу для всех j
+    n_rows, n_cols = X.shape
+    R = np.full((n_cols, n_rows, n_cols), np.nan)
+    for i in range(n_cols):
+        rows = np.flatnonzero(W[:, i])
+        if not len(rows):
+            continue
+        rows = rows[np.argsort(X[rows, i], kind='stable')]
+        v, w = X[rows, i], W[rows]
+        # Группы равных значений: строго меньших — до начала группы, равные — средний ранг
+        first = np.flatnonzero(np.r_[True, v[1:] != v[:-1]])
+        group = np.cumsum(np.r_[True, v[1:] != v[:-1]]) - 1
+        below = (np.cumsum(w, axis=0) - w)[first][group]
+        ties = np.add.reduceat(w, first, axis=0)[group]
+        R[i, rows] = np.where(w > 0, below + (ties + 1) / 2, np.nan)
+    return R
+
+def _pearson_sums(n, sx, sxx, sxy):
+    # Попарные суммы -> r; почти нулевая дисперсия (константа на общих строках) -> NaN
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx ** 2 / n
+        var = np.where(var > 1e-12 * sxx, var, 0.0)
+        denom = np.sqrt(var * var.T)
+        r = np.where(denom > 0, cov / denom, np.nan)
+    return np.clip(r, -1.0, 1.0)
+
+def corr_matrix(X, method='pearson'):
+    # X: (строки, метрики) с NaN. Возвращает (r, n): попарные корреляции и число пар
+    X = np.asarray(X, dtype=np.float64)
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод: {method}")
+    valid = ~np.isnan(X)
+    W = valid.astype(np.float64)
+    n = W.T @ W
+    if method == 'spearman' and not valid.all():
+        # С пропусками ранги зависят от пары — суммы по тензору рангов
+        A = _pairwise_ranks(X, valid)
+        B = A.transpose(2, 1, 0)                # B[i, k, j] = A[j, k, i]
+        A, B = np.nan_to_num(A), np.nan_to_num(B)
+        sx = A.sum(axis=1)
+        r = _pearson_sums(n, sx, (A ** 2).sum(axis=1), (A * B).sum(axis=1))
+    else:
+        if method == 'spearman':
+            X = _ranks(X)
+        # Сдвиг на среднее столбца — для точности; на r он не влияет
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            X = X - np.nanmean(X, axis=0)
+        Xz = np.where(valid, X, 0.0)
+        sx = Xz.T @ W              # sx[i, j] — сумма x_i по строкам, где есть и x_i, и x_j
+        r = _pearson_sums(n, sx, (Xz ** 2).T @ W, Xz.T @ Xz)
+    diag = np.diag(r).copy()
+    np.fill_diagonal(r, np.where(np.isnan(diag), np.nan, 1.0))
+    return r, n.astype(np.int64)
+
+def corr_frame(frame, method='pearson'):
+    # Как frame.corr(method), но через corr_matrix
+    r, _ = corr_matrix(frame.to_numpy(dtype=np.float64), method)
+    return pd.DataFrame(r, index=frame.columns, columns=frame.columns)
+
+def _shared_groups(valid):
+    # Пары i < j, сгруппированные по набору общих строк: (строки, i, j) на группу.
+    # Пропуски обычно идут целыми годами, поэтому различных наборов немного
+    # (на всей панели — около 40 на 351 пару)
+    iu, ju = np.triu_indices(valid.shape[1], k=1)
+    if not len(iu):
+        return
+    packed = np.packbits(valid, axis=0)
+    _, inverse = np.unique((packed[:, iu] & packed[:, ju]).T, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for g in range(inverse.max() + 1):
+        sel = np.flatnonzero(inverse == g)
+        yield np.flatnonzero(valid[:, iu[sel[0]]] & valid[:, ju[sel[0]]]), iu[sel], ju[sel]
+
+def perm_pvalues(X, method='pearson', n_perm=N_PERM, seed=SEED):
+    # Двусторонние p-значения для всех пар: доля перестановок значений второго столбца
+    # пары внутри ее общих строк, у которых |r| не меньше наблюдаемого. Значения (для
+    # Спирмена — ранги по общим строкам, как в corr_matrix) и нормировка от перестановки
+    # не зависят и считаются один раз на группу пар с одинаковыми общими строками;
+    # перестановка меняет только сумму произведений
+    X = np.asarray(X, dtype=np.float64)
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод: {method}")
+    n_rows, n_cols = X.shape
+    p = np.full((n_cols, n_cols), np.nan)
+    rng = np.random.default_rng(seed)
+    # Общие для среза перестановки строк. Значения < n, взятые по порядку, — равномерная
+    # перестановка 0..n-1, так что пары с любым числом общих строк берут их отсюда
+    perms = np.argsort(rng.random((n_perm, n_rows)), axis=1)
+    for rows, i, j in _shared_groups(~np.isnan(X)):
+        n = len(rows)
+        if n < 2:
+            continue
+        cols, pos = np.unique(np.r_[i, j], return_inverse=True)
+        V = X[np.ix_(rows, cols)]
+        if method == 'spearman':
+            V = _ranks(V)
+        sxx = (V ** 2).sum(axis=0)
+        V = V - V.mean(axis=0)
+        ss = (V ** 2).sum(axis=0)
+        # Почти нулевая дисперсия (константа на общих строках) -> r и p не считаются
+        ss = np.where(ss > 1e-12 * sxx, ss, 0.0)
+        ia, ib = pos[:len(i)], pos[len(i):]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denom = np.sqrt(ss[ia] * ss[ib])
+            observed = (V[:, ia] * V[:, ib]).sum(axis=0) / denom
+        target = np.abs(observed)
+        tol = 1e-9 * np.maximum(target, 1.0)
+
+        # Столбцов в группе меньше, чем пар: переставляются столбцы, а суммы
+        # произведений для всех их пар дает одно матричное произведение на пачку
+        order = perms[perms < n].reshape(n_perm, n).T                 # (строки, перестановки)
+        hits = np.zeros(len(i), dtype=np.int64)
+        batch = max(1, PERM_BATCH // (n * len(cols)))
+        for b0 in range(0, n_perm, batch):
+            Vp = V[order[:, b0:b0 + batch]]                              # (строки, пачка, столбцы)
+            S = (V.T @ Vp.reshape(n, -1)).reshape(len(cols), Vp.shape[1], len(cols))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                r = S[ia, :, ib] / denom[:, None]
+                hits += (np.abs(r) >= (target - tol)[:, None]).sum(axis=1)
+        p[i, j] = p[j, i] = np.where(np.isfinite(observed), (hits + 1) / (n_perm + 1), np.nan)
+    return p
+
+def _spans(years, periods, window, step, span):
+    # Срезы по годам: (подпись, начало, конец) с границами включительно
+    first, last = (int(years.min()), int(years.max())) if span is None else span
+    out = [('all', first, last)]
+    for s, e, label in periods or ():
+        out.append((label, first if s is None else s, last if e is None else e))
+    if window:
+        for s in range(first, last - window + 2, step):
+            out.append((f"{s}-{s + window - 1}", s, s + window - 1))
+    return out
+
+@traced('correlation')
+def correlations(df, metrics=None, methods=METHODS, periods=None, window=None, step=1,
+                 span=None, groups=None, n_perm=0, seed=SEED, min_rows=3):
+    # Длинная таблица: span, group, method, a, b, r, n (+ p при n_perm > 0) для каждой
+    # пары метрик a < b. Срезы по годам — весь диапазон, periods [(start, end, label)]
+    # и окна ширины window; каждый из них — по всем странам и по группам groups
+    metrics = metric_columns(df) if metrics is None else list(metrics)
+    years = df['year'].to_numpy(dtype=np.int64)
+    recipients = df['recipient'].to_numpy()
+    values = df[metrics].to_numpy(dtype=np.float64)
+
+    # Строки по возрастанию года: срез по годам — непрерывный диапазон
+    order = np.argsort(years, kind='stable')
+    years, recipients, values = years[order], recipients[order], values[order]
+    group_masks = [('all', None)] + [(g, np.isin(recipients, members)) for g, members in (groups or {}).items()]
+    iu = np.triu_indices(len(metrics), k=1)
+
+    parts = []
+    for label, s, e in _spans(years, periods, window, step, span):
+        lo, hi = np.searchsorted(years, [s, e + 1])
+        for group, mask in group_masks:
+            X = values[lo:hi] if mask is None else values[lo:hi][mask[lo:hi]]
+            if len(X) < min_rows:
+                continue
+            for method in methods:
+                r, n = corr_matrix(X, method)
+                cols = {'span': label, 'group': group, 'method': method,
+                        'a': np.asarray(metrics)[iu[0]], 'b': np.asarray(metrics)[iu[1]],
+                        'r': r[iu], 'n': n[iu]}
+                if n_perm > 0:
+                    p = perm_pvalues(X, method, n_perm, seed)
+                    cols['p'] = np.where(n >= MIN_PAIRS, p, np.nan)[iu]
+                parts.append(pd.DataFrame(cols))
+    columns = ['span', 'group', 'method', 'a', 'b', 'r', 'n'] + (['p'] if n_perm > 0 else [])
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+def matrix(table, method='pearson', span='all', group='all', value='r'):
+    # Квадратная матрица из длинной таблицы correlations
+    sel = table[(table['method'] == method) & (table['span'] == span) & (table['group'] == group)]
+    names = list(dict.fromkeys(list(sel['a']) + list(sel['b'])))
+    pos = {name: i for i, name in enumerate(names)}
+    data = np.full((len(names), len(names)), np.nan)
+    ia, ib = sel['a'].map(pos).to_numpy(), sel['b'].map(pos).to_numpy()
+    data[ia, ib] = data[ib, ia] = sel[value].to_numpy()
+    if value == 'r':
+        np.fill_diagonal(data, 1.0)
+    return pd.DataFrame(data, index=names, columns=names)
+
+def _parse_period(text):
+    # '2013-2020', '2021-' или '-2012'; подпись — сам текст
+    start, _, end = text.partition('-')
+    return (int(start) if start else None, int(end) if end else None, text)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Корреляции Пирсона и Спирмена по периодам, окнам и группам")
+    parser.add_argument('--metrics', nargs='+', help=f"метрики (по умолчанию все {'/'.join(METRIC_PREFIXES)})")
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--periods', nargs='+', default=[], help="периоды: 2013-2020, 2021- и т.п.")
+    parser.add_argument('--window', type=int, help="ширина скользящего окна в годах")
+    parser.add_argument('--step', type=int, default=1, help="шаг окна в годах")
+    parser.add_argument('--groups', action='store_true', help="отдельно по группам POSITION_GROUPS")
+    parser.add_argument('--perm', type=int, default=N_PERM, help="число перестановок (0 — без p-значений)")
+    parser.add_argument('--alpha', type=float, default=0.05, help="показывать пары с p < alpha")
+    parser.add_argument('--min-r', type=float, default=0.5, help="показывать пары с |r| >= min-r")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', help="сохранить полную таблицу в CSV")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from china_config import load_data
+    df, _, _, _ = load_data(columns=args.metrics)
+    if df is None:
+        return 1
+    table = correlations(df, args.metrics, args.methods, [_parse_period(p) for p in args.periods],
+                         args.window, args.step, groups=POSITION_GROUPS if args.groups else None,
+                         n_perm=args.perm, seed=args.seed)
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"Сохранено: {args.out}")
+
+    strong = table[table['r'].abs() >= args.min_r]
+    if args.perm > 0:
+        strong = strong[strong['p'] < args.alpha]
+    print(f"Срезов: {table.groupby(['span', 'group', 'method']).ngroups}, пар: {len(table)}, "
+          f"сильных (|r| >= {args.min_r}): {len(strong)}")
+    strong = strong.iloc[np.argsort(-strong['r'].abs().to_numpy(), kind='stable')]
+    print(strong.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from china_constants import INDEX_COLS, INDEX_WEIGHTS
+from china_trace import traced
+
+# === КОМПОЗИТНЫЕ ИНДЕКСЫ ===
+# gdi_idx/gsi_idx/gci_idx: взвешенное среднее исходных колонок, приведенное к [0, 1]
+# по min/max всех строк — с равными весами это ровно прежний MinMaxScaler по
+# среднему колонок. Состояние (колонки, веса, min/max) хранится рядом с кэшем
+# данных. При дозаписи строк индексы считаются только для новых строк; индекс, у
+# которого новые строки расширили диапазон, пересчитывается по всей таблице из
+# исходных колонок — остальные не трогаются. Дозапись новых строк в china_data.csv
+# с обновлением кэша — python china_indices.py --append.
+
+STATE_FILE = 'indices.json'
+
+def resolve_weights(columns, weights=None):
+    # {колонка: вес} -> массив весов по columns; не указанные колонки весят 1
+    weights = dict(weights or {})
+    unknown = set(weights) - set(columns)
+    if unknown:
+        raise ValueError(f"Веса для колонок не из индекса: {', '.join(sorted(unknown))}")
+    w = np.array([float(weights.get(c, 1.0)) for c in columns])
+    if (w < 0).any() or w.sum() <= 0:
+        raise ValueError(f"Веса должны быть неотрицательными и не все нулевыми: {weights}")
+    return w
+
+def composite(df, columns, weights):
+    # Взвешенное среднее; при равных весах совпадает с df[columns].mean(axis=1)
+    X = df[list(columns)].to_numpy(dtype=np.float64)
+    return (X * weights).sum(axis=1) / weights.sum()
+
+def _scale(values, lo, hi):
+    # Как MinMaxScaler: X * scale + min_, нулевой диапазон -> масштаб 1
+    span = hi - lo
+    scale = 1.0 / span if span >= 10 * np.finfo(np.float64).eps else 1.0
+    return values * scale + (0.0 - lo * scale)
+
+class IndexState:
+    def __init__(self, specs):
+        # {индекс: {'columns': [...], 'weights': [...], 'min': x, 'max': y, 'rows': n}}
+        self.specs = specs
+
+    @classmethod
+    def fit(cls, df, indices=INDEX_COLS, weights=INDEX_WEIGHTS):
+        specs = {}
+        for name, columns in indices.items():
+            w = resolve_weights(columns, (weights or {}).get(name))
+            c = composite(df, columns, w)
+            specs[name] = {'columns': list(columns), 'weights': w.tolist(),
+                           'min': float(c.min()) if len(c) else 0.0,
+                           'max': float(c.max()) if len(c) else 0.0,
+                           'rows': int(len(c))}
+        return cls(specs)
+
+    def composites(self, df):
+        return {name: composite(df, s['columns'], np.asarray(s['weights'])) for name, s in self.specs.items()}
+
+    def transform(self, df, composites=None):
+        # Значения индексов для строк df при текущих min/max
+        composites = composites or self.composites(df)
+        return pd.DataFrame({name: _scale(composites[name], s['min'], s['max'])
+                             for name, s in self.specs.items()}, index=df.index)
+
+    def update(self, composites):
+        # Расширить min/max новыми строками; -> индексы, у которых изменился диапазон
+        changed = []
+        for name, s in self.specs.items():
+            c = composites[name]
+            if not len(c):
+                continue
+            lo, hi = min(s['min'], float(c.min())), max(s['max'], float(c.max()))
+            if s['rows'] == 0 or (lo, hi) != (s['min'], s['max']):
+                changed.append(name)
+            s['min'], s['max'] = lo, hi
+            s['rows'] += int(len(c))
+        return changed
+
+    def matches(self, indices=INDEX_COLS, weights=INDEX_WEIGHTS):
+        # Состояние посчитано с теми же колонками и весами, что заданы сейчас
+        return all(
+            name in self.specs and self.specs[name]['columns'] == list(columns)
+            and self.specs[name]['weights'] == resolve_weights(columns, (weights or {}).get(name)).tolist()
+            for name, columns in indices.items()
+        ) and set(self.specs) == set(indices)
+
+    def save(self, path):
+        tmp = path + f'.tmp{os.getpid()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.specs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+@traced('indices')
+def add_indices(df, indices=INDEX_COLS, weights=INDEX_WEIGHTS):
+    # Полный расчет: колонки индексов добавляются в df, возвращается состояние
+    state = IndexState.fit(df, indices, weights)
+    for name, values in state.transform(df).items():
+        df[name] = values.to_numpy()
+    return state
+
+@traced('indices')
+def append_rows(df, new, state):
+    # df — таблица с индексами, new — новые строки в той же схеме (без индексов).
+    # -> (объединенная таблица, индексы, пересчитанные целиком)
+    composites = state.composites(new)
+    changed = state.update(composites)
+    new = new.copy()
+    for name, values in state.transform(new, composites).items():
+        new[name] = values.to_numpy()
+    out = pd.concat([df, new[df.columns]])
+    for name in changed:
+        s = state.specs[name]
+        out[name] = _scale(composite(out, s['columns'], np.asarray(s['weights'])), s['min'], s['max'])
+    return out, changed
+
+def _align_dtypes(new, like):
+    # Новые строки — к типам колонок кэша (маленький CSV может распознаться иначе)
+    out = new.copy()
+    for c in like.columns:
+        if c in out.columns and out[c].dtype != like[c].dtype:
+            try:
+                out[c] = out[c].astype(like[c].dtype)
+            except (TypeError, ValueError):
+                pass
+    return out
+
+def load_state(path, df):
+    # Состояние из кэша данных; если его нет (кэш старой версии) или колонки и веса
+    # поменялись — считается заново по df и сохраняется
+    from china_config import _cache_path
+    state_path = os.path.join(_cache_path(path), STATE_FILE)
+    try:
+        state = IndexState.load(state_path)
+        if state.matches():
+            return state
+    except (OSError, ValueError):
+        pass
+    state = IndexState.fit(df)
+    if os.path.isdir(os.path.dirname(state_path)):
+        state.save(state_path)
+    return state
+
+def append_csv(rows_path, path=None):
+    # Ночная дозапись: строки из rows_path добавляются в конец china_data.csv,
+    # кэш для нового файла собирается из старого кэша без повторного разбора CSV
+    from china_config import load_data, _cache_path, _prepare_frame, _write_cache, DATA_FILE
+    path = path or DATA_FILE
+    if not path.lower().endswith('.csv'):
+        raise ValueError(f"Дописывать можно только в CSV: {path}")
+    df, _, _, _ = load_data(path)
+    if df is None:
+        raise RuntimeError(f"Не удалось загрузить {path}")
+    state = load_state(path, df)
+
+    header = pd.read_csv(path, sep=None, engine='python', encoding='utf-8-sig', nrows=0).columns
+    raw = pd.read_csv(rows_path, sep=None, engine='python', encoding='utf-8-sig', na_values='NA')
+    extra = set(raw.columns) - set(header)
+    if extra:
+        raise ValueError(f"Колонок нет в {path}: {', '.join(sorted(extra))} — нужна полная пересборка")
+    n_existing = len(pd.read_csv(path, sep=None, engine='python', encoding='utf-8-sig', usecols=[0]))
+    raw = raw.reindex(columns=header)
+    raw.index = pd.RangeIndex(n_existing, n_existing + len(raw))
+
+    new = _align_dtypes(_prepare_frame(raw), df)
+    keys = pd.MultiIndex.from_frame(df[['year', 'recipient']])
+    dup = pd.MultiIndex.from_frame(new[['year', 'recipient']]).isin(keys)
+    if dup.any():
+        raise ValueError(f"Строки уже есть в {path}: {new.loc[dup, ['year', 'recipient']].values.tolist()}")
+
+    # Исходный файл может заканчиваться без перевода строки
+    with open(path, 'rb') as f:
+        needs_newline = False
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b'\n', b'\r')
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        if needs_newline:
+            f.write('\n')
+        raw.to_csv(f, header=False, index=False, na_rep='NA', lineterminator='\n')
+
+    out, changed = append_rows(df, new, state)
+    cache_path = _cache_path(path)
+    _write_cache(out, cache_path)
+    state.save(os.path.join(cache_path, STATE_FILE))
+    return out, len(raw), len(new), changed
+
+def _print_state(state):
+    for name, s in state.specs.items():
+        weights = ', '.join(f"{c}={w:g}" for c, w in zip(s['columns'], s['weights']))
+        print(f"{name}: min={s['min']:.6g} max={s['max']:.6g} строк={s['rows']}  [{weights}]")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Композитные индексы: состояние и дозапись новых строк")
+    parser.add_argument('--data', default=None, help="CSV с данными (по умолчанию china_data.csv)")
+    parser.add_argument('--append', metavar='CSV', help="дописать строки из CSV (те же колонки) и обновить кэш")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from china_config import load_data, DATA_FILE
+    path = args.data or DATA_FILE
+    if args.append:
+        try:
+            _, n_raw, n_kept, changed = append_csv(args.append, path)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Дозапись не выполнена: {e}")
+            return 1
+        print(f"Дописано строк: {n_raw} (в панель попало {n_kept})")
+        print("Пересчитаны целиком: " + (', '.join(changed) if changed else "нет — только новые строки"))
+    df, _, _, _ = load_data(path)
+    if df is None:
+        return 1
+    _print_state(load_state(path, df))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
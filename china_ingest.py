@@ -0,0 +1,167 @@
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from china_constants import BORDER_COUNTRIES
+
+# === ПОТОКОВАЯ СБОРКА ТАБЛИЦЫ ИЗ ИСХОДНЫХ БАЗ ===
+# Сырые выгрузки (проекты AidData, заказы SIPRI, контакты NDU) читаются кусками.
+# В каждом куске сразу отбрасываются лишние колонки, страны не из BORDER_COUNTRIES
+# и годы вне диапазона, а остаток сворачивается в суммы по (year, recipient).
+# В памяти держится только накопитель размером страны × годы.
+
+CHUNK_SIZE = 200_000
+YEARS = (1999, 2024)
+
+# Названия стран в исходных базах -> названия в china_data.csv
+RECIPIENT_ALIASES = {
+    "Russian Federation": "Russia",
+    "Korea, Democratic People's Republic of": "North Korea",
+    "Korea, Dem. People's Rep.": "North Korea",
+    "Democratic People's Republic of Korea": "North Korea",
+    "DPRK": "North Korea",
+    "Korea, Republic of": "South Korea",
+    "Korea, Rep.": "South Korea",
+    "Republic of Korea": "South Korea",
+    "Lao PDR": "Laos",
+    "Lao People's Democratic Republic": "Laos",
+    "Viet Nam": "Vietnam",
+    "Kyrgyz Republic": "Kyrgyzstan",
+    "Burma": "Myanmar",
+    "Brunei Darussalam": "Brunei",
+}
+
+INFRA_SECTORS = ["TRANSPORT AND STORAGE", "ENERGY", "COMMUNICATIONS", "WATER SUPPLY AND SANITATION",
+                 "INDUSTRY, MINING, CONSTRUCTION"]
+
+# Описание источников. Для каждой метрики: value — колонка для суммы
+# (без value считается число записей), where — фильтр (колонка, допустимые значения).
+# Названия колонок соответствуют публичным выгрузкам и могут быть переопределены.
+SOURCES = {
+    'aiddata': {
+        'recipient': 'Recipient',
+        'year': 'Commitment Year',
+        'filters': {'Recommended For Aggregates': ['Yes']},
+        'metrics': {
+            'dev_02_infrastructure_usd': {'value': 'Amount (Constant USD 2021)', 'where': ('Sector Name', INFRA_SECTORS)},
+            'dev_02_infrastructure_ct': {'where': ('Sector Name', INFRA_SECTORS)},
+            'civ_02_healthcare_usd': {'value': 'Amount (Constant USD 2021)', 'where': ('Sector Name', ['HEALTH'])},
+            'civ_02_healthcare_ct': {'where': ('Sector Name', ['HEALTH'])},
+        },
+    },
+    'sipri': {
+        'recipient': 'Recipient',
+        'year': 'Year of order',
+        'filters': {'Supplier': ['China']},
+        'metrics': {
+            'sec_01_arms_transfer_tiv': {'value': 'SIPRI TIV for total order'},
+            'sec_01_arms_transfer_tiv_delivered': {'value': 'SIPRI TIV of delivered weapons'},
+            'sec_01_arms_transfer_orders_ct': {},
+        },
+    },
+    'ndu': {
+        'recipient': 'Country',
+        'year': 'Year',
+        'metrics': {
+            'sec_03_military_engagement_ct': {},
+            'sec_04_joint_exercise_ct': {'where': ('Type', ['Military Exercise', 'Joint Exercise'])},
+        },
+    },
+}
+
+def _source_columns(spec):
+    cols = {spec['recipient'], spec['year']}
+    cols.update(spec.get('filters', {}))
+    for m in spec['metrics'].values():
+        if 'value' in m: cols.add(m['value'])
+        if 'where' in m: cols.add(m['where'][0])
+    return sorted(cols)
+
+def _aggregate_chunk(chunk, spec, years):
+    recipient = chunk[spec['recipient']].astype(str).str.strip()
+    recipient = recipient.map(RECIPIENT_ALIASES).fillna(recipient)
+    year = pd.to_numeric(chunk[spec['year']], errors='coerce')
+
+    keep = recipient.isin(BORDER_COUNTRIES) & year.between(*years)
+    for col, allowed in spec.get('filters', {}).items():
+        keep &= chunk[col].isin(allowed)
+    if not keep.any():
+        return None
+
+    chunk = chunk[keep]
+    out = pd.DataFrame({'year': year[keep].astype(int), 'recipient': recipient[keep]})
+    for name, m in spec['metrics'].items():
+        v = pd.to_numeric(chunk[m['value']], errors='coerce') if 'value' in m else pd.Series(1.0, index=chunk.index)
+        if 'where' in m:
+            col, allowed = m['where']
+            v = v.where(chunk[col].isin(allowed))
+        out[name] = v
+    # min_count=1: год, где у метрики нет ни одной записи, остается NA, а не 0
+    return out.groupby(['year', 'recipient']).sum(min_count=1)
+
+def ingest_source(path, spec, years=YEARS, chunksize=CHUNK_SIZE, **read_kwargs):
+    total = None
+    reader = pd.read_csv(path, usecols=_source_columns(spec), chunksize=chunksize,
+                         low_memory=True, **{'encoding': 'utf-8-sig', **read_kwargs})
+    for chunk in reader:
+        part = _aggregate_chunk(chunk, spec, years)
+        if part is None:
+            continue
+        total = part if total is None else total.add(part, fill_value=0)
+    if total is None:
+        index = pd.MultiIndex.from_arrays([[], []], names=['year', 'recipient'])
+        return pd.DataFrame(columns=list(spec['metrics']), index=index, dtype=float)
+    return total
+
+def build_panel(paths, years=YEARS, base=None, chunksize=CHUNK_SIZE):
+    # paths — {имя источника из SOURCES: путь к файлу}
+    parts = []
+    for name, path in paths.items():
+        print(f"[{name}] {path}")
+        parts.append(ingest_source(path, SOURCES[name], years, chunksize))
+    new = pd.concat(parts, axis=1) if parts else pd.DataFrame()
+
+    if base is not None:
+        panel = pd.read_csv(base, encoding='utf-8-sig', na_values='NA').set_index(['year', 'recipient'])
+    else:
+        grid = pd.MultiIndex.from_product([range(years[0], years[1] + 1), sorted(BORDER_COUNTRIES)],
+                                          names=['year', 'recipient'])
+        panel = pd.DataFrame(index=grid)
+
+    # Пересобранные колонки заменяют старые целиком
+    for c in new.columns:
+        panel[c] = new[c].reindex(panel.index)
+    panel = panel.sort_index()
+    return panel.reset_index()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая сборка china_data.csv из исходных баз")
+    for name in SOURCES:
+        parser.add_argument(f'--{name}', metavar='CSV', help=f"выгрузка {name}")
+    parser.add_argument('--base', help="существующая таблица: пересобранные колонки заменяются, остальные сохраняются")
+    parser.add_argument('--out', default='china_data_ingested.csv', help="куда записать результат")
+    parser.add_argument('--from', dest='year_from', type=int, default=YEARS[0])
+    parser.add_argument('--to', dest='year_to', type=int, default=YEARS[1])
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = {name: getattr(args, name) for name in SOURCES if getattr(args, name)}
+    if not paths:
+        print("Не указан ни один источник (" + ", ".join(f"--{n}" for n in SOURCES) + ")")
+        return 1
+    for path in paths.values():
+        if not os.path.exists(path):
+            print(f"Файл не найден: {path}")
+            return 1
+
+    panel = build_panel(paths, (args.year_from, args.year_to), args.base, args.chunksize)
+    panel.to_csv(args.out, index=False, na_rep='NA', encoding='utf-8-sig')
+    print(f"Сохранен {args.out}: {len(panel)} строк, {panel.shape[1]} колонок")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+import argparse
+import importlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex
+from matplotlib.figure import Figure
+from matplotlib.widgets import RangeSlider, Slider
+
+from china_config import load_data, COUNTRY_RU
+from china_periods import PeriodCube
+from bump_charts import rank_periods, bump_layout, FlagLayer, CurveLayer, CUSTOM_PERIODS, CURVE_EFFECTS, LABEL_STYLE
+from dumbbell_charts import (_metric_frame, metric_name, finish, legend_handles, span_label,
+                             PRE, POST, PRE_COLOR, UP_COLOR, DOWN_COLOR)
+
+# === ИНТЕРАКТИВНЫЙ РЕЖИМ ===
+# Фигура и все ее артисты создаются один раз. При смене параметров (ползунки границ
+# периодов, глубина рейтинга) пересчитываются только данные, а у готовых артистов
+# меняются позиции, цвета, тексты и видимость. Артисты, зависящие от данных, помечены
+# animated и рисуются поверх сохраненного фона (блиттинг): оси, сетка, легенда и
+# прочее оформление не перерисовываются. Полная перерисовка (с новым фоном) нужна,
+# только когда меняется сама разметка осей — глубина рейтинга у bump, число строк
+# или диапазон оси X у гантели. Флаги берутся из кэша спрайтов (get_flag_sprite),
+# отмасштабированные — из кэша FlagLayer. Кубы периодов строятся один раз на график.
+#   python china_interactive.py bump --preset invest
+#   python china_interactive.py dumbbell --preset security
+#   python china_interactive.py bump --bench 200      # задержка обновления без окна
+
+SLIDER_COLOR = '#5D6D7E'
+
+class BlitView:
+    def __init__(self, fig):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self._animated = []
+        self._moved = []
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def animate(self, *artists):
+        for a in artists:
+            a.set_animated(True)
+            self._animated.append(a)
+        return artists[0] if len(artists) == 1 else artists
+
+    def add_slider(self, rect, cls, label, **kwargs):
+        # Ползунок не вызывает draw_idle (drawon=False): при блиттинге поверх фона
+        # перерисовываются только оси сдвинутого ползунка
+        ax = self.fig.add_axes(rect)
+        slider = cls(ax, label, color=SLIDER_COLOR, valfmt='%d', **kwargs)
+        slider.drawon = False
+        slider.on_changed(lambda _: self._moved.append(ax))
+        return slider
+
+    def save(self, path, **kwargs):
+        # savefig не рисует animated-артисты — на время сохранения они обычные
+        for a in self._animated:
+            a.set_animated(False)
+        try:
+            self.fig.savefig(path, **kwargs)
+        finally:
+            for a in self._animated:
+                a.set_animated(True)
+            self.refresh(full=True)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for a in self._animated:
+            if a.get_visible():
+                self.fig.draw_artist(a)
+
+    def refresh(self, full=False):
+        moved, self._moved = set(self._moved), []
+        if full or self._background is None:
+            # draw_event сохранит новый фон и нарисует animated-артисты
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        for ax in moved:
+            self.fig.draw_artist(ax)
+        self._draw_animated()
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+# Подписи как готовые картинки, по аналогии с FlagLayer: каждая пара (текст, цвет)
+# растеризуется один раз на dpi, дальше при блиттинге только копируется —
+# без раскладки шрифта и обводки path_effects на каждом кадре
+class LabelLayer(Artist):
+    PAD = 6
+
+    def __init__(self, transform, **style):
+        super().__init__()
+        self._style = style
+        self._items = []
+        self._raster = {}
+        self.set_transform(transform)
+        self.set_zorder(style.pop('zorder', 6))
+
+    def set_items(self, items):
+        # items: [(x, y, текст, цвет)]
+        self._items = list(items)
+        self.stale = True
+
+    def _rasterize(self, text, color, dpi):
+        key = (text, to_hex(color, keep_alpha=True), dpi)
+        if key not in self._raster:
+            fig = Figure(figsize=(8, 2), dpi=dpi, facecolor='none')
+            canvas = FigureCanvasAgg(fig)
+            t = fig.text(0.5, 0.5, text, color=color, **self._style)
+            canvas.draw()
+            w, h = canvas.get_width_height()
+            box = t.get_window_extent(canvas.get_renderer())
+            x0, y0 = max(int(box.x0) - self.PAD, 0), max(int(box.y0) - self.PAD, 0)
+            x1, y1 = min(int(np.ceil(box.x1)) + self.PAD, w), min(int(np.ceil(box.y1)) + self.PAD, h)
+            img = np.asarray(canvas.buffer_rgba())[h - y1:h - y0, x0:x1]
+            # draw_image ждет строки снизу вверх; смещение — от точки привязки текста
+            self._raster[key] = (np.ascontiguousarray(img[::-1]), x0 - w / 2, y0 - h / 2)
+        return self._raster[key]
+
+    def draw(self, renderer):
+        if not self.get_visible() or not self._items:
+            return
+        xy = self.get_transform().transform([(x, y) for x, y, _, _ in self._items])
+        gc = renderer.new_gc()
+        for (px, py), (_, _, text, color) in zip(xy, self._items):
+            img, dx, dy = self._rasterize(text, color, renderer.dpi)
+            renderer.draw_image(gc, round(px + dx), round(py + dy), img)
+        gc.restore()
+        self.stale = False
+
+# === BUMP ===
+# Пресеты повторяют графики bump_charts и Rank_Humanitarian
+BUMP_PRESETS = {
+    'invest': dict(metrics=['dev_03_fdi_usd', 'dev_02_infrastructure_usd'], unit='млрд $', limit=10,
+                   link=2, capstyle='round', figsize=(20, 11)),
+    'arms': dict(metrics=['sec_01_arms_transfer_tiv'], unit='TIV', limit=5,
+                 link=2, capstyle='round', figsize=(20, 11)),
+    'humanitarian': dict(metrics=['civ_02_healthcare_ct', 'civ_06_ci_ct', 'civ_05_judicial_engagement_ct'],
+                         unit='событий', limit=5, link=1.5, capstyle=None, figsize=(18, 10)),
+}
+VALUE_COL = 'composite_idx'
+
+class BumpView(BlitView):
+    def __init__(self, df, metrics, unit, limit, periods=CUSTOM_PERIODS, link=2, capstyle=None,
+                 figsize=(20, 11), flag_zoom=0.18):
+        data = df[['recipient', 'year']].copy()
+        data[VALUE_COL] = df[metrics].sum(axis=1)
+        self.data = data
+        self.cube = PeriodCube(data, [VALUE_COL])
+        self.unit, self.link = unit, link
+        self.scale = 1e9 if 'млрд' in unit else 1
+        self.fmt = '.1f' if self.scale != 1 else '.0f'
+        self.periods = [tuple(p) for p in periods]
+        # Ползунки двигают только внутренние границы: начало первого периода и конец
+        # последнего остаются как в исходных периодах
+        self.start = self.cube.first_year if self.periods[0][0] is None else int(self.periods[0][0])
+        self.end = self.cube.last_year if self.periods[-1][1] is None else int(self.periods[-1][1])
+        self.limit = None
+
+        fig, ax = plt.subplots(figsize=figsize)
+        super().__init__(fig)
+        self.ax = ax
+        plt.subplots_adjust(left=0.08, right=0.76, top=0.98, bottom=0.2)
+        n = len(self.periods)
+        ax.set_xlim(-0.7, n - 0.75)
+        ax.set_xticks(np.arange(n)); ax.set_xticklabels([''] * n)
+        for s in ax.spines.values(): s.set_visible(False)
+        ax.grid(axis='y', linestyle=':', alpha=0.3)
+
+        self.curves = self.animate(CurveLayer([], [], capstyle=capstyle, effects=CURVE_EFFECTS, zorder=3))
+        ax.add_artist(self.curves)
+        self.flags = self.animate(FlagLayer([], [], flag_zoom, zorder=5))
+        ax.add_artist(self.flags)
+        self.labels = self.animate(LabelLayer(ax.transData, **LABEL_STYLE))
+        ax.add_artist(self.labels)
+        # Подписи периодов меняются вместе с границами — это слой подписей, а не подписи делений
+        self.period_labels = self.animate(LabelLayer(ax.get_xaxis_transform(), ha='center', va='top',
+                                                     fontsize=14, fontweight='bold'))
+        ax.add_artist(self.period_labels)
+        # Инфо-панель: общий топ от периодов не зависит и остается в фоне, топ последнего
+        # периода — animated. Знак $ в тексте — не формула
+        info_style = dict(transform=ax.transAxes, va='center', ha='left', fontsize=10.5, fontweight='bold',
+                          color='#2C3E50', zorder=7, parse_math=False,
+                          bbox=dict(boxstyle='round,pad=1.0', facecolor='#F8F9F9', edgecolor='#D5DBDB', alpha=0.95))
+        top = self.cube.sum(self.start, self.end)[VALUE_COL].sort_values(ascending=False).head(5)
+        ax.text(1.03, 0.75, "\n".join([f"ОБЩИЙ ТОП ЛИДЕРОВ ({self.start}-{self.end}):"] + [
+            f"{i+1}. {COUNTRY_RU.get(c, c)}: {v / self.scale:{self.fmt}} {unit}" for i, (c, v) in enumerate(top.items())]),
+            **info_style)
+        self.info = self.animate(ax.text(1.03, 0.3, '', **info_style))
+
+        # Границы: второй период начинается с lo, третий — с hi
+        bounds = [p[0] for p in self.periods[1:]]
+        self.bounds_slider = self.add_slider([0.12, 0.07, 0.6, 0.03], RangeSlider, 'Границы периодов',
+                                             valmin=self.start + 1, valmax=self.end, valinit=bounds[:2], valstep=1)
+        self.limit_slider = self.add_slider([0.12, 0.03, 0.6, 0.03], Slider, 'Глубина рейтинга',
+                                            valmin=3, valmax=15, valinit=limit, valstep=1)
+        self.bounds_slider.on_changed(lambda v: self.update(periods=self._periods_from(v)))
+        self.limit_slider.on_changed(lambda v: self.update(limit=int(v)))
+        self.update(limit=limit, periods=self.periods)
+
+    def _periods_from(self, bounds):
+        lo, hi = (int(b) for b in bounds)
+        spans = [(self.start, lo - 1), (lo, hi - 1), (hi, self.end)]
+        return [(s, e, f"{s}-{e}") for s, e in spans]
+
+    def update(self, limit=None, periods=None):
+        layout = limit is not None and limit != self.limit
+        if layout:
+            self.limit = limit
+            self.ax.set_ylim(limit + 0.5, 0.5)
+            self.ax.set_yticks(range(1, limit + 1))
+            self.ax.set_yticklabels([f"#{i}" for i in range(1, limit + 1)], fontweight='bold', color='gray')
+        if periods is not None:
+            self.periods = [tuple(p) for p in periods]
+
+        ldf, _ = rank_periods(self.data, VALUE_COL, self.periods, self.cube)
+        _, paths, edge_colors, labels, sprites, flag_xy = bump_layout(ldf, self.limit, self.limit + self.link)
+        self.curves.set_curves(paths, edge_colors)
+        self.flags.set_sprites(sprites, flag_xy)
+        self.labels.set_items(labels)
+        self.period_labels.set_items([(i, -0.02, label, 'black') for i, (_, _, label) in enumerate(self.periods)])
+
+        recent = self.periods[-1][2]
+        recent_top = ldf[ldf['period'] == recent].sort_values('rank').head(5)
+        info = [f"ТОП-5 ЭПОХИ ({recent}):"] + [
+            f"{i+1}. {COUNTRY_RU.get(r, r)}: {v / self.scale:{self.fmt}} {self.unit}"
+            for i, (r, v) in enumerate(zip(recent_top['recipient'], recent_top[VALUE_COL]))]
+        self.info.set_text("\n".join(info))
+        self.refresh(full=layout)
+
+    def bench_step(self, rng):
+        lo = int(rng.integers(self.start + 1, self.end - 1))
+        self.bounds_slider.set_val((lo, int(rng.integers(lo + 1, self.end + 1))))
+
+# === ГАНТЕЛИ ===
+# Пресеты повторяют Impact_Dumbbell, Security_Dumbbell и Humanitarian_Dumbbell
+DUMBBELL_PRESETS = {
+    'impact': dict(module='Impact_Dumbbell', fill=None, head=5, tail=10, figsize=(13, 9)),
+    'security': dict(module='Security_Dumbbell', fill=0, head=None, tail=None, figsize=(13, 10)),
+    'humanitarian': dict(module='Humanitarian_Dumbbell', fill=0, head=None, tail=None, figsize=(13, 10)),
+}
+X_MARGIN = 0.05
+
+class DumbbellView(BlitView):
+    def __init__(self, df, metric, fill=0, head=None, tail=None, pre=PRE, post=POST, figsize=(13, 10),
+                 label_size=11, pre_size=120, post_size=180):
+        self.name = metric_name(metric)
+        self.cube = PeriodCube(_metric_frame(df, [metric]), [self.name])
+        self.fill, self.head, self.tail = fill, head, tail
+        self.n_rows, self.xlim = None, None
+        first, last = self.cube.first_year, self.cube.last_year
+        self.pre = (first if pre[0] is None else pre[0], last if pre[1] is None else pre[1])
+        self.post = (first if post[0] is None else post[0], last if post[1] is None else post[1])
+
+        fig, ax = plt.subplots(figsize=figsize)
+        super().__init__(fig)
+        self.ax = ax
+        plt.subplots_adjust(left=0.2, right=0.97, top=0.98, bottom=0.24)
+        self.lines = self.animate(ax.hlines([], [], [], color='gray', alpha=0.4, linewidth=2))
+        self.pre_pts = self.animate(ax.scatter([], [], color=PRE_COLOR, marker='o', s=pre_size, zorder=3))
+        self.up_pts = self.animate(ax.scatter([], [], color=UP_COLOR, marker='o', s=post_size, zorder=4))
+        self.down_pts = self.animate(ax.scatter([], [], color=DOWN_COLOR, marker='s', s=post_size, zorder=4))
+        # Названия стран — тексты у левого края осей, а не подписи делений: порядок строк
+        # меняется при каждом сдвиге периода
+        self.names = self.animate(LabelLayer(ax.get_yaxis_transform(), ha='right', va='center',
+                                             fontweight='bold', fontsize=label_size))
+        ax.add_artist(self.names)
+        self.legend = ax.legend(handles=legend_handles('До', 'Рост', 'Спад'), loc='upper center',
+                                bbox_to_anchor=(0.5, -0.05), ncol=3, frameon=True, borderpad=1)
+        self.animate(self.legend)
+
+        self.pre_slider = self.add_slider([0.2, 0.07, 0.6, 0.03], RangeSlider, 'Период «до»',
+                                          valmin=first, valmax=last, valinit=self.pre, valstep=1)
+        self.post_slider = self.add_slider([0.2, 0.03, 0.6, 0.03], RangeSlider, 'Период «после»',
+                                           valmin=first, valmax=last, valinit=self.post, valstep=1)
+        self.pre_slider.on_changed(lambda v: self.update(pre=tuple(int(x) for x in v)))
+        self.post_slider.on_changed(lambda v: self.update(post=tuple(int(x) for x in v)))
+        self.update()
+
+    def compare(self):
+        # Как compare_periods + отбор строк в скриптах гантелей
+        comp = finish(pd.DataFrame({'pre': self.cube.mean(*self.pre)[self.name],
+                                    'post': self.cube.mean(*self.post)[self.name]}), self.fill)
+        if self.fill is not None:
+            comp = comp[(comp['pre'] > 0) | (comp['post'] > 0)]
+        if self.tail is not None:
+            comp = pd.concat([comp.head(self.head), comp.tail(self.tail)])
+        return comp
+
+    def update(self, pre=None, post=None):
+        if pre is not None:
+            self.pre = pre
+        if post is not None:
+            self.post = post
+        comp = self.compare()
+        n = len(comp)
+        y = np.arange(n, dtype=float)
+        x_pre, x_post = comp['pre'].to_numpy(), comp['post'].to_numpy()
+
+        # Разметка осей меняется, только если изменилось число строк или точки вышли за ось X
+        layout = n != self.n_rows
+        if n:
+            lo, hi = float(min(x_pre.min(), x_post.min())), float(max(x_pre.max(), x_post.max()))
+            if self.xlim is None or lo < self.xlim[0] or hi > self.xlim[1]:
+                # Ось только расширяется: при движении ползунка она не скачет туда-обратно
+                pad = (hi - lo) * X_MARGIN or 1.0
+                lo, hi = lo - pad, hi + pad
+                if self.xlim is not None:
+                    lo, hi = min(lo, self.xlim[0]), max(hi, self.xlim[1])
+                self.xlim = (lo, hi)
+                self.ax.set_xlim(*self.xlim)
+                layout = True
+        if layout:
+            self.n_rows = n
+            self.ax.set_ylim(-0.5, max(n, 1) - 0.5)
+            self.ax.set_yticks(y); self.ax.set_yticklabels([''] * n)
+
+        self.lines.set_segments([[(a, yi), (b, yi)] for a, b, yi in zip(x_pre, x_post, y)])
+        self.pre_pts.set_offsets(np.c_[x_pre, y])
+        down = (comp['diff'] < 0).to_numpy()
+        self.up_pts.set_offsets(np.c_[x_post[~down], y[~down]])
+        self.down_pts.set_offsets(np.c_[x_post[down], y[down]])
+        self.names.set_items([(-0.01, yi, COUNTRY_RU.get(c, c), '.15') for yi, c in zip(y, comp.index)])
+
+        years = self.cube.first_year, self.cube.last_year
+        labels = [f"{span_label(self.pre, *years)} (ср. уровень)", f"Рост в {span_label(self.post, *years)}",
+                  f"Спад в {span_label(self.post, *years)}"]
+        for text, label in zip(self.legend.get_texts(), labels):
+            text.set_text(label)
+        self.refresh(full=layout)
+
+    def bench_step(self, rng):
+        first, last = self.cube.first_year, self.cube.last_year
+        lo = int(rng.integers(first, last))
+        self.post_slider.set_val((lo, int(rng.integers(lo, last + 1))))
+
+def dumbbell_preset(df, name):
+    preset = dict(DUMBBELL_PRESETS[name])
+    metric = importlib.import_module(preset.pop('module')).COLUMNS
+    return DumbbellView(df, metric if len(metric) > 1 else metric[0], **preset)
+
+def bench(view, steps, seed=42):
+    # Задержка реакции на ползунок: пересчет данных + блиттинг, мс
+    rng = np.random.default_rng(seed)
+    times = []
+    for _ in range(steps):
+        t0 = time.perf_counter()
+        view.bench_step(rng)
+        times.append((time.perf_counter() - t0) * 1000)
+    times = np.array(times)
+    print(f"Шагов: {steps}, медиана {np.median(times):.1f} мс, 95% {np.percentile(times, 95):.1f} мс, "
+          f"макс {times.max():.1f} мс")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Интерактивные bump-графики и гантели с ползунками периодов")
+    parser.add_argument('kind', choices=['bump', 'dumbbell'])
+    parser.add_argument('--preset', default=None,
+                        help=f"bump: {', '.join(BUMP_PRESETS)}; dumbbell: {', '.join(DUMBBELL_PRESETS)}")
+    parser.add_argument('--bench', type=int, metavar='N', help="без окна: N случайных сдвигов ползунка и задержка")
+    parser.add_argument('--save', metavar='FILE', help="сохранить текущий кадр")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    presets = BUMP_PRESETS if args.kind == 'bump' else DUMBBELL_PRESETS
+    preset = args.preset or next(iter(presets))
+    if preset not in presets:
+        print(f"Неизвестный пресет: {preset}. Доступны: {', '.join(presets)}")
+        return 1
+    if args.bench or args.save:
+        plt.switch_backend('Agg')
+    df, _, _, _ = load_data()
+    if df is None:
+        return 1
+    if args.kind == 'bump':
+        view = BumpView(df, **BUMP_PRESETS[preset])
+    else:
+        view = dumbbell_preset(df, preset)
+    if args.bench:
+        bench(view, args.bench)
+    if args.save:
+        view.save(args.save)
+        print(f"Сохранено: {args.save}")
+    if not (args.bench or args.save):
+        plt.show()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
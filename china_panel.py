@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# === ПАНЕЛЬ (recipient, year) ===
+# Таблица один раз сортируется по (recipient, year) и запоминаются границы блоков
+# стран. Срез по стране, по диапазону лет или по ячейке страна × период — это
+# searchsorted и iloc-срез, без полного прохода df[df['recipient'] == ...].
+
+class Panel:
+    def __init__(self, df, recipient_col='recipient', year_col='year'):
+        self.recipient_col = recipient_col
+        self.year_col = year_col
+        # Строки без страны ни в один блок не входят (как в groupby и PeriodCube): после
+        # сортировки они оказались бы в конце с кодом -1 и сломали бы searchsorted по кодам
+        df = df[df[recipient_col].notna()]
+        self.df = df.sort_values([recipient_col, year_col], kind='stable')
+
+        codes, recipients = pd.factorize(self.df[recipient_col], sort=True)
+        self.recipients = pd.Index(recipients, name=recipient_col)
+        self._years = self.df[year_col].to_numpy()
+        # bounds[i]:bounds[i + 1] — строки i-й страны
+        self._bounds = np.searchsorted(codes, np.arange(len(recipients) + 1))
+        self._pos = {r: i for i, r in enumerate(recipients)}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _block(self, recipient):
+        i = self._pos.get(recipient)
+        if i is None:
+            return 0, 0
+        return self._bounds[i], self._bounds[i + 1]
+
+    def _year_slice(self, lo, hi, start, end):
+        years = self._years[lo:hi]
+        if start is not None:
+            lo = lo + np.searchsorted(years, start, side='left')
+            years = self._years[lo:hi]
+        if end is not None:
+            hi = lo + np.searchsorted(years, end, side='right')
+        return lo, hi
+
+    def country(self, recipient):
+        lo, hi = self._block(recipient)
+        return self.df.iloc[lo:hi]
+
+    def cell(self, recipient, start=None, end=None):
+        # Строки одной страны за годы [start, end] включительно
+        lo, hi = self._year_slice(*self._block(recipient), start, end)
+        return self.df.iloc[lo:hi]
+
+    def years(self, start=None, end=None):
+        # Все страны за [start, end]: по одному срезу на блок страны
+        parts = [np.arange(*self._year_slice(lo, hi, start, end))
+                 for lo, hi in zip(self._bounds[:-1], self._bounds[1:])]
+        rows = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+        return self.df.iloc[rows]
+
+    def groups(self):
+        # (страна, её строки) для всех стран за один проход
+        for r, lo, hi in zip(self.recipients, self._bounds[:-1], self._bounds[1:]):
+            yield r, self.df.iloc[lo:hi]
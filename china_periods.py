@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# === КУБ ПЕРИОДОВ ===
+# Страна × год × метрика с накопленными суммами по годам. Сумма или среднее
+# за любой период для всех стран и метрик — это разность двух срезов, без
+# повторных масок по df['year'] и groupby. Пропуски (NaN) в суммы не входят
+# и не учитываются в среднем — так же, как в pandas groupby().sum()/mean().
+
+class PeriodCube:
+    def __init__(self, df, metrics=None, recipient_col='recipient', year_col='year'):
+        if metrics is None:
+            metrics = [c for c in df.select_dtypes('number').columns if c != year_col]
+        self.metrics = list(metrics)
+
+        codes, recipients = pd.factorize(df[recipient_col], sort=True)
+        # Строки без страны (код -1) не входят ни в одну страну — как в groupby(dropna=True);
+        # иначе np.add.at по индексу -1 дописал бы их к последней стране
+        keep = codes >= 0
+        codes = codes[keep]
+        years = df[year_col].to_numpy()[keep].astype(np.int64)
+        self.recipients = pd.Index(recipients, name=recipient_col)
+        self.first_year = int(years.min()) if len(years) else 0
+        self.last_year = int(years.max()) if len(years) else -1
+        n_years = self.last_year - self.first_year + 1
+
+        values = df[self.metrics].to_numpy(dtype=np.float64)[keep]
+        valid = ~np.isnan(values)
+        cell = (codes, years - self.first_year)
+
+        shape = (len(recipients), n_years, len(self.metrics))
+        sums = np.zeros(shape)
+        counts = np.zeros(shape, dtype=np.int64)
+        rows = np.zeros(shape[:2], dtype=np.int64)
+        np.add.at(sums, cell, np.where(valid, values, 0.0))
+        np.add.at(counts, cell, valid)
+        np.add.at(rows, cell, 1)
+
+        # Нулевой слой в начале: сумма за [s, e] = cum[e + 1] - cum[s]
+        pad = ((0, 0), (1, 0), (0, 0))
+        self._sum = np.pad(np.cumsum(sums, axis=1), pad)
+        self._count = np.pad(np.cumsum(counts, axis=1), pad)
+        self._rows = np.pad(np.cumsum(rows, axis=1), pad[:2])
+
+    def _bounds(self, start, end):
+        # Годы -> индексы накопленных массивов; границы включительно, вне диапазона обрезаются
+        n = self._rows.shape[1] - 1
+        s = self.first_year if start is None else int(start)
+        e = self.last_year if end is None else int(end)
+        s = min(max(s - self.first_year, 0), n)
+        e = min(max(e - self.first_year + 1, s), n)
+        return s, e
+
+    def _frame(self, data, start, end, present_only):
+        df = pd.DataFrame(data, index=self.recipients, columns=self.metrics)
+        if present_only:
+            s, e = self._bounds(start, end)
+            df = df[self._rows[:, e] - self._rows[:, s] > 0]
+        return df
+
+    def sum(self, start=None, end=None, present_only=True):
+        s, e = self._bounds(start, end)
+        return self._frame(self._sum[:, e] - self._sum[:, s], start, end, present_only)
+
+    def count(self, start=None, end=None, present_only=True):
+        s, e = self._bounds(start, end)
+        return self._frame(self._count[:, e] - self._count[:, s], start, end, present_only)
+
+    def mean(self, start=None, end=None, present_only=True):
+        s, e = self._bounds(start, end)
+        n = self._count[:, e] - self._count[:, s]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data = (self._sum[:, e] - self._sum[:, s]) / n
+        return self._frame(np.where(n > 0, data, np.nan), start, end, present_only)
+
+    def periods(self, periods, how='sum'):
+        # periods — список (start, end, label), как CUSTOM_PERIODS в bump_charts
+        agg = getattr(self, how)
+        parts = {label: agg(s, e) for s, e, label in periods}
+        return pd.concat(parts, names=['period'])
+
+    def stack(self, periods, how='sum'):
+        # Массив период × страна × метрика без DataFrame, для векторных расчетов по всем
+        # периодам сразу; present — были ли у страны строки в периоде
+        bounds = np.array([self._bounds(s, e) for s, e, _ in periods], dtype=np.int64).reshape(-1, 2)
+        s, e = bounds[:, 0], bounds[:, 1]
+        n = (self._count[:, e] - self._count[:, s]).transpose(1, 0, 2)
+        if how == 'count':
+            data = n
+        elif how in ('sum', 'mean'):
+            data = (self._sum[:, e] - self._sum[:, s]).transpose(1, 0, 2)
+            if how == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    data = np.where(n > 0, data / n, np.nan)
+        else:
+            raise ValueError(f"Неизвестная агрегация: {how}")
+        present = (self._rows[:, e] - self._rows[:, s]).T > 0
+        return data, present
+
+    def sliding(self, width, how='sum', step=1):
+        # Все окна [y, y + width - 1] сразу: (окно × страна) × метрика
+        width = int(width)
+        n_years = self._rows.shape[1] - 1
+        starts = np.arange(0, max(n_years - width + 1, 0), step)
+        s_sum = self._sum[:, starts + width] - self._sum[:, starts]
+        if how == 'sum':
+            data = s_sum
+        elif how in ('mean', 'count'):
+            n = self._count[:, starts + width] - self._count[:, starts]
+            if how == 'count':
+                data = n
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    data = np.where(n > 0, s_sum / n, np.nan)
+        else:
+            raise ValueError(f"Неизвестная агрегация: {how}")
+        # (страна, окно, метрика) -> (окно, страна, метрика)
+        data = data.transpose(1, 0, 2).reshape(-1, len(self.metrics))
+        index = pd.MultiIndex.from_product([starts + self.first_year, self.recipients],
+                                           names=['start', self.recipients.name])
+        return pd.DataFrame(data, index=index, columns=self.metrics)
@@ -0,0 +1,302 @@
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from china_constants import DATA_FILE, PROFILE_ENV
+
+# === СЕРВЕР ГРАФИКОВ ===
+# Локальный HTTP-сервис на asyncio (только стандартная библиотека): графики
+# строятся по запросу с параметрами из строки запроса, например
+#   /figure/Rank_Invest.png?limit=8&periods=2005-2012,2013-2020,2021-2024
+#   /figure/Impact_Dumbbell.jpg?periods=2013-2018,2019-
+# Данные один раз загружаются в каждом воркере пула процессов (колонки кэша — через
+# mmap, как в render_all -j), рендер идет в воркерах и не блокирует цикл событий.
+# Готовые картинки (байты) лежат в LRU-кэше в памяти с ETag: повтор запроса отдается
+# из памяти за миллисекунды, с If-None-Match — ответом 304 без тела.
+# Одинаковые запросы, пришедшие во время рендера, ждут один и тот же рендер.
+
+HOST = '127.0.0.1'
+PORT = 8765
+CACHE_BYTES = 256 * 2**20
+KEEPALIVE = 30
+MAX_LIMIT = 30
+CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg'}
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+          405: 'Method Not Allowed', 500: 'Internal Server Error'}
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# === ПАРАМЕТРЫ ЗАПРОСА ===
+def parse_limit(text):
+    limit = int(text)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit должен быть от 1 до {MAX_LIMIT}: {text}")
+    return limit
+
+def parse_periods(text):
+    # '2005-2012,2013-2020,2021-' -> ((2005, 2012, '2005-2012'), ...); подпись — сам текст
+    periods = []
+    for part in text.split(','):
+        start, sep, end = part.strip().partition('-')
+        if not sep or not (start or end):
+            raise ValueError(f"Период задается как 2013-2020, 2021- или -2012: {part}")
+        start, end = (int(start) if start else None), (int(end) if end else None)
+        if start is not None and end is not None and start > end:
+            raise ValueError(f"Начало периода позже конца: {part}")
+        periods.append((start, end, part.strip()))
+    return tuple(periods)
+
+QUERY_PARAMS = {'limit': parse_limit, 'periods': parse_periods}
+
+def parse_query(query, allowed):
+    # -> нормализованные параметры (кортеж пар по имени) — они же часть ключа кэша
+    params = {}
+    for key, values in parse_qs(query, keep_blank_values=True).items():
+        if key not in QUERY_PARAMS:
+            raise ValueError(f"Неизвестный параметр: {key}")
+        if key not in allowed:
+            raise ValueError(f"График не принимает параметр {key} (доступны: {', '.join(allowed) or 'нет'})")
+        params[key] = QUERY_PARAMS[key](values[-1])
+    return tuple(sorted(params.items()))
+
+def _literal(tree, name, default):
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            return ast.literal_eval(node.value)
+    return default
+
+def figure_specs(names=None):
+    # {картинка без расширения: (модуль, PARAMS)} — из исходников, без импорта скриптов
+    from render_all import FIGURES
+    specs = {}
+    for name in names or FIGURES:
+        with open(os.path.join(ROOT, name + '.py'), 'rb') as f:
+            tree = ast.parse(f.read())
+        params = tuple(_literal(tree, 'PARAMS', ()))
+        for output in _literal(tree, 'OUTPUTS', []):
+            specs[os.path.splitext(output)[0]] = (name, params)
+    return specs
+
+# === ВОРКЕРЫ ===
+def _render_images(name, params, fmt):
+    # В воркере: данные уже загружены render_all._init_worker
+    import render_all
+    from china_config import capture_figures
+    if render_all._WORKER_DF is None:
+        raise RuntimeError("воркер не смог загрузить данные")
+    t0 = time.perf_counter()
+    with capture_figures(fmt) as images:
+        render_all.render_figure(name, render_all._WORKER_DF, **dict(params))
+    return images, time.perf_counter() - t0
+
+# === КЭШ ===
+class ImageCache:
+    # LRU по суммарному размеру картинок. Ключ — (модуль, параметры, формат),
+    # значение — {картинка: (байты, ETag)} для всех выходов модуля сразу
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, images):
+        entry = {stem: (data, '"' + hashlib.sha256(data).hexdigest()[:32] + '"') for stem, data in images.items()}
+        if key in self._items:
+            self.size -= self._entry_size(self._items.pop(key))
+        self._items[key] = entry
+        self.size += self._entry_size(entry)
+        while self.size > self.max_bytes and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            self.size -= self._entry_size(old)
+        return entry
+
+    @staticmethod
+    def _entry_size(entry):
+        return sum(len(data) for data, _ in entry.values())
+
+    def stats(self):
+        return {'entries': len(self._items), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+# === HTTP ===
+class FigureServer:
+    def __init__(self, pool, specs, cache):
+        self.pool = pool
+        self.specs = specs
+        self.cache = cache
+        self.pending = {}
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    async def images(self, key):
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry, True
+        # Такой же рендер уже идет — ждем его, а не запускаем второй
+        if key not in self.pending:
+            self.pending[key] = asyncio.ensure_future(self._render(key))
+        return await asyncio.shield(self.pending[key]), False
+
+    async def _render(self, key):
+        name, params, fmt = key
+        try:
+            loop = asyncio.get_running_loop()
+            images, elapsed = await loop.run_in_executor(self.pool, _render_images, name, params, fmt)
+            self.renders += 1
+            self.render_seconds += elapsed
+            return self.cache.put(key, images)
+        finally:
+            del self.pending[key]
+
+    def index(self):
+        return {'figures': {stem: {'module': name, 'params': list(params)}
+                            for stem, (name, params) in self.specs.items()},
+                'formats': list(CONTENT_TYPES),
+                'example': '/figure/Rank_Invest.png?limit=8&periods=2005-2012,2013-2020,2021-2024'}
+
+    def stats(self):
+        return {**self.cache.stats(), 'renders': self.renders, 'in_flight': len(self.pending),
+                'render_seconds': round(self.render_seconds, 3)}
+
+    async def respond(self, method, target, headers):
+        # -> (код, заголовки, тело)
+        if method not in ('GET', 'HEAD'):
+            return _json(405, {'error': f"Метод {method} не поддерживается"})
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        if path in ('/', '/figures'):
+            return _json(200, self.index())
+        if path == '/stats':
+            return _json(200, self.stats())
+        if not path.startswith('/figure/'):
+            return _json(404, {'error': f"Нет такого адреса: {path}"})
+
+        stem, _, fmt = path[len('/figure/'):].rpartition('.')
+        fmt = fmt.lower()
+        if fmt not in CONTENT_TYPES or stem not in self.specs:
+            return _json(404, {'error': f"Нет графика {path[len('/figure/'):]} "
+                                        f"(имя из {', '.join(self.specs)} и расширение {'/'.join(CONTENT_TYPES)})"})
+        name, allowed = self.specs[stem]
+        try:
+            params = parse_query(url.query, allowed)
+        except ValueError as e:
+            return _json(400, {'error': str(e)})
+
+        try:
+            entry, cached = await self.images((name, params, 'jpg' if fmt == 'jpeg' else fmt))
+        except ValueError as e:
+            # Параметры, с которыми график не строится (например, три периода для гантели)
+            return _json(400, {'error': str(e)})
+        except Exception as e:
+            return _json(500, {'error': f"{type(e).__name__}: {e}"})
+        if stem not in entry:
+            return _json(500, {'error': f"{name} не сохранил {stem}"})
+        data, etag = entry[stem]
+        head = {'Content-Type': CONTENT_TYPES[fmt], 'ETag': etag, 'Cache-Control': 'no-cache',
+                'X-Cache': 'hit' if cached else 'miss'}
+        if etag in [t.strip() for t in headers.get('if-none-match', '').split(',')]:
+            return 304, head, b''
+        return 200, head, data
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                t0 = time.perf_counter()
+                headers = {}
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = raw.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                parts = line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, head, body = _json(400, {'error': "Некорректная строка запроса"})
+                    method, target, keep = 'GET', line.decode('latin-1').strip(), False
+                else:
+                    method, target, version = parts
+                    status, head, body = await self.respond(method, target, headers)
+                    keep = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                head['Content-Length'] = str(len(body))
+                head['Connection'] = 'keep-alive' if keep else 'close'
+                out = [f"HTTP/1.1 {status} {STATUS[status]}"] + [f"{k}: {v}" for k, v in head.items()]
+                writer.write(('\r\n'.join(out) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                print(f"{method} {target} {status} {(time.perf_counter() - t0) * 1000:.1f} мс")
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def _json(status, payload):
+    body = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+    return status, {'Content-Type': 'application/json; charset=utf-8'}, body
+
+async def serve(host, port, pool, specs, cache):
+    server = FigureServer(pool, specs, cache)
+    srv = await asyncio.start_server(server.handle, host, port)
+    print(f"Сервер графиков: http://{host}:{port}/ (Ctrl+C — остановить)")
+    async with srv:
+        await srv.serve_forever()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервер графиков с кэшем картинок в памяти")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('-j', '--jobs', type=int, default=2, help="число процессов рендера (0 — по числу ядер)")
+    parser.add_argument('--cache-mb', type=int, default=CACHE_BYTES // 2**20, help="размер кэша картинок, МБ")
+    parser.add_argument('--profile', choices=['draft', 'print'],
+                        help="профиль рендера (по умолчанию из CHINA_RENDER_PROFILE, иначе draft)")
+    parser.add_argument('--data', help="файл данных: CSV или книга XLSX (по умолчанию china_data.csv)")
+    parser.add_argument('--compact', action='store_true', help="компактная схема данных в воркерах")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Профиль задается до загрузки china_config — воркеры наследуют его через окружение
+    os.environ[PROFILE_ENV] = args.profile or os.environ.get(PROFILE_ENV) or 'draft'
+    from china_config import load_data
+    from render_all import _init_worker
+    path = args.data or DATA_FILE
+    # Загрузка в основном процессе собирает кэш данных, воркеры читают его через mmap
+    df, _, _, _ = load_data(path, compact=args.compact)
+    if df is None:
+        return 1
+    del df
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    specs = figure_specs()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(path, args.compact)) as pool:
+        try:
+            asyncio.run(serve(args.host, args.port, pool, specs, ImageCache(args.cache_mb * 2**20)))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
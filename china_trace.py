@@ -0,0 +1,174 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# === ТРАССИРОВКА ЭТАПОВ ===
+# Время, число вызовов и память (текущий и пиковый RSS) по именованным этапам:
+# разбор CSV, кэш, агрегации, KMeans, подписи, tight_layout, флаги, savefig.
+# Включается переменной окружения CHINA_TRACE (значение — файл трассы или 1)
+# или флагом render_all.py --trace. Выключенная трассировка — это одна проверка
+# флага на вызов. Трасса пишется в формате Chrome Trace Event (открывается в
+# chrome://tracing и ui.perfetto.dev), по графикам печатается сводка.
+
+TRACE_ENV = 'CHINA_TRACE'
+TRACE_FILE = 'china_trace.json'
+
+_enabled = bool(os.environ.get(TRACE_ENV))
+_events = []
+_depth = 0
+# График, к которому относятся этапы; при запуске скрипта напрямую — его имя
+_figure = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+
+def enabled():
+    return _enabled
+
+def enable(path=None):
+    # Через окружение трассировку наследуют и процессы-воркеры render_all
+    global _enabled
+    _enabled = True
+    os.environ[TRACE_ENV] = path or os.environ.get(TRACE_ENV) or '1'
+
+def trace_path():
+    value = os.environ.get(TRACE_ENV, '')
+    return TRACE_FILE if value in ('', '1') else value
+
+def set_figure(name):
+    global _figure
+    _figure = name
+
+def _rss_mb():
+    # Текущий RSS из /proc (Linux); где его нет — None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS — байты
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+class _Stage:
+    __slots__ = ('name', 't0', 'depth')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        global _depth
+        self.depth = _depth
+        _depth += 1
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _depth
+        t1 = time.perf_counter()
+        _depth -= 1
+        _events.append({
+            'name': self.name, 'figure': _figure, 'depth': self.depth,
+            'ts': self.t0, 'dur': t1 - self.t0, 'pid': os.getpid(),
+            'rss_mb': _rss_mb(), 'peak_mb': _peak_rss_mb(),
+        })
+        return False
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullStage()
+
+def stage(name):
+    return _Stage(name) if _enabled else _NULL
+
+def traced(name):
+    # Декоратор: весь вызов функции — этап name
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def trace_method(cls, method_name, name=None):
+    setattr(cls, method_name, traced(name or method_name)(getattr(cls, method_name)))
+
+def collect(events):
+    _events.extend(events)
+
+def drain():
+    # Забрать накопленные события (воркеры render_all отдают их в основной процесс)
+    events = _events[:]
+    _events.clear()
+    return events
+
+# === ОТЧЕТ И ФАЙЛ ТРАССЫ ===
+def summarize(events):
+    # {график: {этап: {'calls', 'total', 'max', 'peak_mb', 'depth', 'first'}}}
+    out = {}
+    for e in events:
+        s = out.setdefault(e['figure'], {}).setdefault(
+            e['name'], {'calls': 0, 'total': 0.0, 'max': 0.0, 'peak_mb': None, 'depth': e['depth'], 'first': e['ts']})
+        s['calls'] += 1
+        s['total'] += e['dur']
+        s['max'] = max(s['max'], e['dur'])
+        s['depth'] = min(s['depth'], e['depth'])
+        s['first'] = min(s['first'], e['ts'])
+        if e['peak_mb'] is not None:
+            s['peak_mb'] = max(s['peak_mb'] or 0.0, e['peak_mb'])
+    return out
+
+def report(events):
+    lines = []
+    for figure, stages in summarize(events).items():
+        lines.append(f"[{figure}]")
+        lines.append(f"  {'этап':<24} {'вызовов':>7} {'всего, с':>9} {'макс, с':>8} {'пик RSS, МБ':>12}")
+        # В порядке первого входа: вложенные этапы идут под своими родителями
+        for name, s in sorted(stages.items(), key=lambda kv: kv[1]['first']):
+            peak = f"{s['peak_mb']:.0f}" if s['peak_mb'] is not None else '-'
+            label = '  ' * s['depth'] + name
+            lines.append(f"  {label:<24} {s['calls']:>7} {s['total']:>9.3f} {s['max']:>8.3f} {peak:>12}")
+    return "\n".join(lines)
+
+def write_trace(events, path=None):
+    path = path or trace_path()
+    start = min((e['ts'] for e in events), default=0.0)
+    trace = [{
+        'name': e['name'], 'cat': e['figure'], 'ph': 'X',
+        'ts': (e['ts'] - start) * 1e6, 'dur': e['dur'] * 1e6,
+        'pid': e['pid'], 'tid': e['pid'],
+        'args': {'figure': e['figure'], 'rss_mb': e['rss_mb'], 'peak_mb': e['peak_mb']},
+    } for e in events]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return path
+
+def _dump_at_exit():
+    # Скрипт, запущенный напрямую с CHINA_TRACE: сводка и трасса при выходе.
+    # render_all забирает события сам (drain), поэтому здесь они уже пусты.
+    if not (_enabled and _events):
+        return
+    events = drain()
+    print(report(events))
+    print(f"Трасса: {write_trace(events)}")
+
+atexit.register(_dump_at_exit)
@@ -0,0 +1,268 @@
+import argparse
+import os
+import posixpath
+import sys
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+import pandas as pd
+
+from china_constants import DATA_FILE
+from china_trace import traced
+
+# === КОНВЕРТАЦИЯ XLSX ===
+# china_data.xlsx читается напрямую из XML внутри архива — потоково (iterparse),
+# без openpyxl (который к тому же не понимает книги в формате Strict OOXML).
+# Все листы со схемой данных (есть year и recipient) склеиваются, типы колонок
+# выводятся так же, как у pd.read_csv (NA и пустые ячейки — пропуски, целые без
+# пропусков — int64). Схема сверяется с china_data.csv; результат попадает в тот же
+# колоночный кэш, что и у CSV, так что книга разбирается один раз на версию файла,
+# а скрипты работают с кэшем: load_data('china_data.xlsx').
+
+NA_VALUES = {'', 'NA', 'N/A', '#N/A', 'NaN', 'nan', 'NULL', 'null'}
+KEY_COLUMNS = ('year', 'recipient')
+
+def _local(tag):
+    # Имя тега без пространства имен: у Strict и Transitional OOXML они разные
+    return tag.rsplit('}', 1)[-1]
+
+def _attr(elem, name):
+    for k, v in elem.attrib.items():
+        if _local(k) == name:
+            return v
+    return None
+
+def _column_index(ref):
+    # 'AB12' -> 27
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - 64)
+    return n - 1
+
+def _shared_strings(z):
+    if 'xl/sharedStrings.xml' not in z.namelist():
+        return []
+    strings = []
+    with z.open('xl/sharedStrings.xml') as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == 'si':
+                # Строка с форматированием разбита на несколько <r><t>
+                strings.append(''.join(t.text or '' for t in elem.iter() if _local(t.tag) == 't'))
+                elem.clear()
+    return strings
+
+def sheet_paths(z):
+    # [(имя листа, путь в архиве)] в порядке книги
+    rels = {}
+    with z.open('xl/_rels/workbook.xml.rels') as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == 'Relationship':
+                target = elem.get('Target')
+                rels[elem.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                        else posixpath.normpath(posixpath.join('xl', target)))
+    sheets = []
+    with z.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == 'sheet':
+                sheets.append((elem.get('name'), rels[_attr(elem, 'id')]))
+    return sheets
+
+def _cell_value(cell, strings):
+    kind = cell.get('t', 'n')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter() if _local(t.tag) == 't')
+    v = next((c.text for c in cell if _local(c.tag) == 'v'), None)
+    if v is None or kind == 'e':
+        return None
+    if kind == 's':
+        return strings[int(v)]
+    if kind in ('str', 'd'):
+        return v
+    if kind == 'b':
+        return v == '1'
+    return float(v)
+
+def _read_rows(z, path, strings):
+    # -> список строк, строка — список значений по номерам колонок
+    rows = []
+    with z.open(path) as f:
+        row, width = None, 0
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = _local(elem.tag)
+            if event == 'start':
+                if tag == 'row':
+                    row = {}
+                continue
+            if tag == 'c':
+                ref = elem.get('r')
+                col = _column_index(ref) if ref else len(row)
+                row[col] = _cell_value(elem, strings)
+                elem.clear()
+            elif tag == 'row':
+                width = max(width, max(row, default=-1) + 1)
+                rows.append(row)
+                elem.clear()
+    return [[r.get(i) for i in range(width)] for r in rows]
+
+def _typed(values):
+    # Тип колонки — как у pd.read_csv(na_values='NA')
+    values = [None if (isinstance(v, str) and v.strip() in NA_VALUES) else v for v in values]
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        return pd.Series(values, dtype='boolean' if len(present) < len(values) else bool)
+    if all(isinstance(v, float) for v in present):
+        arr = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        if present and len(present) == len(values) and np.all(arr == np.floor(arr)) \
+                and np.all(np.abs(arr) < 2**63):
+            return pd.Series(arr.astype(np.int64))
+        return pd.Series(arr)
+    # Текст; числа в текстовой колонке — как их записал бы CSV
+    return pd.Series([v if v is None or isinstance(v, str)
+                      else (str(int(v)) if isinstance(v, float) and v.is_integer() else str(v))
+                      for v in values])
+
+def _sheet_frame(rows):
+    header = [str(h).strip() if h is not None else '' for h in rows[0]]
+    body = rows[1:]
+    # Пустые строки в конце листа (форматирование без данных) отбрасываются
+    while body and all(v is None for v in body[-1]):
+        body.pop()
+    data = {}
+    for i, name in enumerate(header):
+        if name:
+            data[name] = _typed([r[i] for r in body])
+    return pd.DataFrame(data)
+
+@traced('xlsx_read')
+def read_workbook(path):
+    # -> (таблица из всех листов со схемой данных, [использованные листы], [пропущенные])
+    with zipfile.ZipFile(path) as z:
+        strings = _shared_strings(z)
+        frames, used, skipped = [], [], []
+        for name, sheet in sheet_paths(z):
+            rows = _read_rows(z, sheet, strings)
+            frame = _sheet_frame(rows) if rows else pd.DataFrame()
+            if not set(KEY_COLUMNS) <= {str(c).strip().lower() for c in frame.columns}:
+                skipped.append(name)
+                continue
+            if frames and list(frame.columns) != list(frames[0].columns):
+                missing = set(frames[0].columns) ^ set(frame.columns)
+                if missing:
+                    raise ValueError(f"Лист {name}: колонки не совпадают с листом {used[0]}: "
+                                     f"{', '.join(sorted(missing))}")
+                frame = frame[frames[0].columns]
+            frames.append(frame)
+            used.append(name)
+    if not frames:
+        raise ValueError(f"{path}: нет листов с колонками {', '.join(KEY_COLUMNS)}")
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return df, used, skipped
+
+def _kind(s):
+    if s.isna().all():
+        return None
+    return 'number' if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) else 'text'
+
+def check_schema(df, reference=None):
+    # -> список расхождений с раскладкой CSV (пустой — схема совпадает).
+    # Без CSV проверяются только ключи (недостающие колонки индексов load_data заполнит нулями)
+    problems = []
+    if reference and os.path.exists(reference):
+        ref = pd.read_csv(reference, sep=None, engine='python', encoding='utf-8-sig', na_values='NA')
+        missing = [c for c in ref.columns if c not in df.columns]
+        extra = [c for c in df.columns if c not in ref.columns]
+        if missing:
+            problems.append(f"нет колонок: {', '.join(missing)}")
+        if extra:
+            problems.append(f"лишние колонки: {', '.join(extra)}")
+        for c in ref.columns:
+            if c in df.columns:
+                a, b = _kind(ref[c]), _kind(df[c])
+                if a and b and a != b:
+                    problems.append(f"{c}: в CSV {a}, в XLSX {b}")
+    else:
+        missing = [c for c in KEY_COLUMNS if c not in df.columns]
+        if missing:
+            problems.append(f"нет колонок: {', '.join(missing)}")
+    return problems
+
+def reference_csv(path):
+    # CSV, с которым сверяется книга: china_data.csv рядом с ней
+    return os.path.join(os.path.dirname(os.path.abspath(path)), DATA_FILE)
+
+def to_layout(df, reference):
+    # Порядок колонок — как в CSV, чтобы кэш книги не отличался от кэша CSV
+    if reference and os.path.exists(reference):
+        header = pd.read_csv(reference, sep=None, engine='python', encoding='utf-8-sig', nrows=0).columns
+        df = df[list(header)]
+    return df
+
+def read_xlsx(path, reference=None):
+    # Сырые строки книги в раскладке CSV; при расхождении схемы — ValueError
+    df, _, _ = read_workbook(path)
+    reference = reference or reference_csv(path)
+    problems = check_schema(df, reference)
+    if problems:
+        raise ValueError(f"Схема {path} не совпадает с {reference}: " + "; ".join(problems))
+    return to_layout(df, reference)
+
+def write_cache(path, raw):
+    # Сырые строки книги -> кэш load_data (со своими индексами и их состоянием)
+    from china_config import _cache_path, _prepare_frame, _write_cache
+    from china_indices import add_indices, STATE_FILE as INDEX_STATE_FILE
+    cache_path = _cache_path(path)
+    df = _prepare_frame(raw)
+    state = add_indices(df)
+    _write_cache(df, cache_path)
+    state.save(os.path.join(cache_path, INDEX_STATE_FILE))
+    return cache_path, df
+
+def is_converted(path):
+    from china_config import _cache_path
+    return os.path.exists(os.path.join(_cache_path(path), 'meta.json'))
+
+def convert(path, reference=None, force=False):
+    # Разбор книги в кэш один раз на версию файла -> (каталог кэша или None, если уже был)
+    if not force and is_converted(path):
+        return None
+    return write_cache(path, read_xlsx(path, reference))[0]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Конвертация china_data.xlsx в кэш данных")
+    parser.add_argument('xlsx', nargs='?', default='china_data.xlsx', help="книга Excel")
+    parser.add_argument('--reference', help="CSV для сверки схемы (по умолчанию china_data.csv рядом с книгой)")
+    parser.add_argument('--force', action='store_true', help="пересобрать кэш, даже если он уже есть")
+    parser.add_argument('--check', action='store_true', help="только проверить схему, кэш не писать")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.xlsx):
+        print(f"Файл не найден: {args.xlsx}")
+        return 1
+    if is_converted(args.xlsx) and not (args.force or args.check):
+        print("Кэш для этой версии книги уже есть (--force — пересобрать)")
+        return 0
+    reference = args.reference or reference_csv(args.xlsx)
+    df, used, skipped = read_workbook(args.xlsx)
+    print(f"Листы: {', '.join(used)}" + (f" (пропущены: {', '.join(skipped)})" if skipped else ""))
+    print(f"Строк: {len(df)}, колонок: {df.shape[1]}")
+    problems = check_schema(df, reference)
+    if problems:
+        print(f"Схема не совпадает с {reference}:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    print(f"Схема совпадает с {reference}" if os.path.exists(reference)
+          else f"{reference} нет — проверены только колонки {', '.join(KEY_COLUMNS)}")
+    if args.check:
+        return 0
+    cache_path, _ = write_cache(args.xlsx, to_layout(df, reference))
+    print(f"Кэш записан: {cache_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import math
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from china_config import load_data, add_source, save_figure, COUNTRY_RU, RU_LABELS
+from china_periods import PeriodCube
+from china_trace import traced
+
+# Общий движок «гантелей»: среднегодовое значение метрики в двух периодах.
+# Метрика — колонка или список колонок, которые складываются построчно
+# (пропуск в любой из них дает пропуск, как при a + b + c).
+PRE = (2013, 2020)
+POST = (2021, None)
+
+PRE_COLOR = '#95A5A6'
+UP_COLOR, DOWN_COLOR = '#27AE60', '#E74C3C'
+
+def split_periods(periods=None):
+    # Периоды из запроса [(start, end, подпись), (start, end, подпись)] -> (pre, post)
+    if periods is None:
+        return PRE, POST
+    if len(periods) != 2:
+        raise ValueError(f"Для гантели нужны ровно два периода, задано: {len(periods)}")
+    return tuple(periods[0][:2]), tuple(periods[1][:2])
+
+def span_label(period, first_year, last_year):
+    # Открытые границы периода (None) — первый и последний год данных
+    start, end = period
+    return f"{start if start is not None else first_year}-{end if end is not None else last_year}"
+
+def metric_name(metric):
+    return metric if isinstance(metric, str) else '+'.join(metric)
+
+def _metric_frame(df, metrics):
+    data = {'recipient': df['recipient'], 'year': df['year']}
+    for m in metrics:
+        cols = [m] if isinstance(m, str) else list(m)
+        data[metric_name(m)] = df[cols].sum(axis=1, min_count=len(cols))
+    return pd.DataFrame(data)
+
+@traced('data')
+def compare_periods(df, metrics, pre=PRE, post=POST):
+    # Все страны и все метрики за один проход: {имя метрики: DataFrame pre/post/diff}
+    frame = _metric_frame(df, metrics)
+    names = [metric_name(m) for m in metrics]
+    cube = PeriodCube(frame, names)
+    pre_means, post_means = cube.mean(*pre), cube.mean(*post)
+    return {n: pd.DataFrame({'pre': pre_means[n], 'post': post_means[n]}) for n in names}
+
+def compare_metric(df, metric, pre=PRE, post=POST):
+    return compare_periods(df, [metric], pre, post)[metric_name(metric)]
+
+def finish(comp, fill=None):
+    # fill=None — страны без данных в одном из периодов отбрасываются, иначе заполняются
+    comp = comp.dropna() if fill is None else comp.fillna(fill)
+    comp = comp.assign(diff=comp['post'] - comp['pre'])
+    return comp.sort_values('diff', ascending=True)
+
+def draw_dumbbell(ax, comp, label_size=11, pre_size=120, post_size=180):
+    y = np.arange(len(comp))
+    ax.hlines(y=y, xmin=comp['pre'], xmax=comp['post'], color='gray', alpha=0.4, linewidth=2)
+    ax.scatter(comp['pre'], y, color=PRE_COLOR, marker='o', s=pre_size, zorder=3)
+
+    # Рост и спад — по одному вызову scatter
+    down = (comp['diff'] < 0).to_numpy()
+    ax.scatter(comp['post'][~down], y[~down], color=UP_COLOR, marker='o', s=post_size, zorder=4)
+    ax.scatter(comp['post'][down], y[down], color=DOWN_COLOR, marker='s', s=post_size, zorder=4)
+
+    ax.set_yticks(y)
+    ax.set_yticklabels([COUNTRY_RU.get(c, c) for c in comp.index], fontweight='bold', fontsize=label_size)
+
+def legend_handles(pre_label, up_label, down_label):
+    return [
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=PRE_COLOR, markersize=12, label=pre_label),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=UP_COLOR, markersize=12, label=up_label),
+        Line2D([0], [0], marker='s', color='w', markerfacecolor=DOWN_COLOR, markersize=12, label=down_label)
+    ]
+
+def render_grid(df, metrics, filename, pre=PRE, post=POST, ncols=3, fill=0):
+    # Приложение: сетка гантелей по многим метрикам на одном рисунке
+    comps = compare_periods(df, metrics, pre, post)
+    nrows = math.ceil(len(comps) / ncols)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(6 * ncols, 5.5 * nrows), squeeze=False)
+
+    for ax, (name, comp) in zip(axes.flat, comps.items()):
+        comp = finish(comp, fill)
+        comp = comp[(comp['pre'] != 0) | (comp['post'] != 0)]
+        draw_dumbbell(ax, comp, label_size=7, pre_size=30, post_size=45)
+        ax.set_title(RU_LABELS.get(name, name), fontsize=10, fontweight='bold')
+        ax.tick_params(axis='x', labelsize=8)
+    for ax in axes.flat[len(comps):]:
+        ax.axis('off')
+
+    end = post[1] if post[1] is not None else int(df['year'].max())
+    fig.legend(handles=legend_handles(f'{pre[0]}-{pre[1]}', f'Рост в {post[0]}-{end}', f'Спад в {post[0]}-{end}'),
+               loc='lower center', ncol=3, frameon=True)
+    add_source(fig)
+    plt.tight_layout(rect=[0, 0.04, 1, 0.99])
+    save_figure(filename, fig)
+    plt.close(fig)
+
+if __name__ == "__main__":
+    # Приложение по всем метрикам sec_/dev_/civ_
+    df, _, _, _ = load_data()
+    if df is not None:
+        metrics = [c for c in df.select_dtypes('number').columns if c.startswith(('sec_', 'dev_', 'civ_'))]
+        render_grid(df, metrics, 'Dumbbell_Appendix.jpg', ncols=4)
+        print("Сохранен Dumbbell_Appendix.jpg")
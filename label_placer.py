@@ -0,0 +1,172 @@
+import math
+
+import numpy as np
+
+# === РАССТАНОВКА ПОДПИСЕЙ ===
+# Замена adjustText: у каждой точки перебирается фиксированный набор позиций
+# подписи (8 направлений × несколько радиусов), пересечения с уже поставленными
+# подписями и маркерами проверяются через сетку (spatial hash). Сначала ставятся
+# подписи в самых плотных местах, затем несколько проходов доводки для тех,
+# что все еще пересекаются. Случайности нет — при тех же данных результат тот же.
+# Подпись становится аннотацией со смещением в пунктах от своей точки,
+# поэтому последующие tight_layout/subplots_adjust ее не отрывают от точки.
+
+# Направления (dx, dy) в порядке предпочтения: справа, слева, по диагоналям, сверху, снизу
+DIRECTIONS = [(1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1)]
+RADII = [1.0, 1.6, 2.4, 3.5, 5.0, 7.0]
+DEFAULT_SIZE = 36  # площадь маркера в pt^2, если размеры точек не заданы
+PASSES = 3
+MAX_EVALS = 200_000
+
+# Веса штрафов: пересечение с подписью хуже, чем с чужим маркером; выход за оси — хуже всего
+W_LABEL, W_MARKER, W_OUTSIDE, W_DISTANCE = 1.0, 0.6, 2.0, 1e-3
+
+class _Grid:
+    # Равномерная сетка: ячейка -> индексы прямоугольников, которые ее задевают
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+
+    def _span(self, box):
+        c = self.cell
+        return (range(int(math.floor(box[0] / c)), int(math.floor(box[2] / c)) + 1),
+                range(int(math.floor(box[1] / c)), int(math.floor(box[3] / c)) + 1))
+
+    def add(self, i, box):
+        xs, ys = self._span(box)
+        for gx in xs:
+            for gy in ys:
+                self.cells.setdefault((gx, gy), set()).add(i)
+
+    def remove(self, i, box):
+        xs, ys = self._span(box)
+        for gx in xs:
+            for gy in ys:
+                self.cells.get((gx, gy), set()).discard(i)
+
+    def query(self, box):
+        xs, ys = self._span(box)
+        found = set()
+        for gx in xs:
+            for gy in ys:
+                found.update(self.cells.get((gx, gy), ()))
+        return found
+
+def _overlap(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+def _outside(box, bounds):
+    inner = _overlap(box, bounds)
+    return (box[2] - box[0]) * (box[3] - box[1]) - inner
+
+def _candidate_box(px, py, w, h, direction, dist):
+    dx, dy = direction
+    if dx and dy:
+        dist = dist / math.sqrt(2)
+    # Подпись прилегает к точке стороной (или углом), обращенной к ней
+    x0 = px + dist if dx > 0 else px - dist - w if dx < 0 else px - w / 2
+    y0 = py + dist if dy > 0 else py - dist - h if dy < 0 else py - h / 2
+    return (x0, y0, x0 + w, y0 + h)
+
+def place_labels(texts, sizes=None, arrowprops=None, pad=3.0, passes=PASSES, max_evals=MAX_EVALS):
+    # texts — подписи ax.text(x, y, ...) в координатах данных, как для adjust_text;
+    # sizes — площади маркеров (s из scatter) для тех же точек.
+    # Возвращает аннотации, заменившие исходные подписи.
+    if not texts:
+        return []
+    ax = texts[0].axes
+    fig = ax.figure
+    renderer = fig.canvas.get_renderer()
+    px_per_pt = fig.dpi / 72.0
+
+    n = len(texts)
+    sizes = np.full(n, DEFAULT_SIZE, dtype=float) if sizes is None else np.asarray(sizes, dtype=float)
+    anchors = ax.transData.transform(np.array([t.get_position() for t in texts], dtype=float))
+    extents = [t.get_window_extent(renderer) for t in texts]
+    wh = np.array([(e.width, e.height) for e in extents])
+    radius = np.sqrt(sizes) / 2 * px_per_pt
+    bounds = tuple(ax.bbox.extents)
+
+    grid = _Grid(max(float(np.median(wh[:, 1])) * 2, 1.0))
+    markers = [(x - r, y - r, x + r, y + r) for (x, y), r in zip(anchors, radius)]
+    # Маркеры и подписи — в одной сетке: индексы маркеров 0..n-1, подписей n..2n-1
+    for i, box in enumerate(markers):
+        grid.add(i, box)
+    boxes = [None] * n
+    ring = [0] * n
+    far = [0.0] * n
+
+    def penalty(i, box):
+        # Площадь пересечений с весами; 0 — позиция свободна
+        c = W_OUTSIDE * _outside(box, bounds)
+        for j in grid.query(box):
+            if j < n:
+                c += W_MARKER * _overlap(box, markers[j])
+            elif j - n != i:
+                c += W_LABEL * _overlap(box, boxes[j - n])
+        return c
+
+    evals = 0
+    def best_position(i):
+        # -> (стоимость, штраф за пересечения, прямоугольник, номер кольца, штраф за удаленность)
+        nonlocal evals
+        best = None
+        px, py = anchors[i]
+        for k, mult in enumerate(RADII):
+            dist = (radius[i] + pad * px_per_pt) * mult
+            for direction in DIRECTIONS:
+                box = _candidate_box(px, py, wh[i, 0], wh[i, 1], direction, dist)
+                p = penalty(i, box)
+                far = W_DISTANCE * dist * (wh[i, 0] + wh[i, 1])
+                evals += 1
+                if best is None or p + far < best[0]:
+                    best = (p + far, p, box, k, far)
+            # На ближайшем кольце нашлось свободное место — дальше не ищем
+            if best[1] == 0:
+                break
+        return best
+
+    # Сначала самые плотные места: число соседей в радиусе двух высот подписи
+    reach = 2 * wh[:, 1].max()
+    dists = np.hypot(*(anchors[:, None, :] - anchors[None, :, :]).transpose(2, 0, 1))
+    crowd = (dists < reach).sum(axis=1)
+    order = sorted(range(n), key=lambda i: (-crowd[i], anchors[i][0], anchors[i][1], i))
+
+    for i in order:
+        _, _, boxes[i], ring[i], far[i] = best_position(i)
+        grid.add(n + i, boxes[i])
+
+    # Доводка: переставляем подписи, у которых остались пересечения
+    for _ in range(passes):
+        moved = False
+        for i in order:
+            if evals >= max_evals:
+                break
+            current = penalty(i, boxes[i])
+            if current == 0:
+                continue
+            grid.remove(n + i, boxes[i])
+            c, _, box, k, f = best_position(i)
+            if c < current + far[i] - 1e-9:
+                boxes[i], ring[i], far[i] = box, k, f
+                moved = True
+            grid.add(n + i, boxes[i])
+        if not moved:
+            break
+
+    annotations = []
+    for i, t in enumerate(texts):
+        x0, y0 = boxes[i][0], boxes[i][1]
+        offset = ((x0 - anchors[i][0]) / px_per_pt, (y0 - anchors[i][1]) / px_per_pt)
+        kwargs = {}
+        # Стрелка — только для подписей, отодвинутых дальше первого кольца
+        if arrowprops is not None and ring[i] > 0:
+            kwargs['arrowprops'] = {'shrinkA': 1, 'shrinkB': radius[i] / px_per_pt, **arrowprops}
+        ann = ax.annotate(t.get_text(), xy=t.get_position(), xytext=offset, textcoords='offset points',
+                          ha='left', va='bottom', fontproperties=t.get_fontproperties(),
+                          color=t.get_color(), zorder=t.get_zorder(), **kwargs)
+        t.remove()
+        annotations.append(ann)
+    return annotations
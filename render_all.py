@@ -0,0 +1,279 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import china_trace
+
+# Все скрипты с графиками. Каждый модуль экспортирует render(df).
+FIGURES = [
+    'bump_charts',
+    'Rank_Humanitarian',
+    'Impact_Dumbbell',
+    'Security_Dumbbell',
+    'Humanitarian_Dumbbell',
+    'Clusters_Positions',
+    'Dynamic_Clusters',
+    'Correlation',
+    'Digital_Control',
+    'Russia_Anomaly',
+    'Russia_Pivot',
+    'Initiative_Groups',
+    'Initiative_Performance',
+    'Initiatives_Comparison',
+    'Land_vs_Sea',
+    'Security_Structure',
+]
+
+def select_figures(only=None, exclude=None):
+    known = {f.lower(): f for f in FIGURES}
+    for name in (only or []) + (exclude or []):
+        if name.lower() not in known:
+            raise SystemExit(f"Неизвестный график: {name}. Доступны: {', '.join(FIGURES)}")
+    only = {n.lower() for n in only} if only else None
+    exclude = {n.lower() for n in exclude or []}
+    return [f for f in FIGURES if (only is None or f.lower() in only) and f.lower() not in exclude]
+
+# === МАНИФЕСТ СБОРКИ ===
+# Для каждого графика храним хэши: исходника скрипта (вместе с локальными модулями,
+# которые он импортирует), констант china_config, которыми он пользуется,
+# и значений входных колонок (module.COLUMNS). Константы china_constants
+# учитываются по значениям, как и остальные константы china_config. С --incremental перестраиваются
+# только графики, у которых что-то из этого изменилось или пропал выходной файл.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = 'build_manifest.json'
+# Глобальные настройки china_config, влияющие на любой график
+ALWAYS_CONSTANTS = ['SCALE_FACTOR']
+
+def _parse_module(mod):
+    path = os.path.join(ROOT, mod + '.py')
+    if not os.path.exists(path):
+        return None, None
+    with open(path, 'rb') as f:
+        src = f.read()
+    return src, ast.parse(src)
+
+def _imports(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            yield node.module
+
+def _used_names(tree):
+    names = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == 'china_config':
+            names.update(a.name for a in node.names)
+    return names
+
+def _config_function_deps():
+    # Какие константы china_config читает каждая его функция (add_source -> SOURCE_TEXT и т.д.)
+    _, tree = _parse_module('china_config')
+    deps = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            deps[node.name] = {n for n in _used_names(node) if n.isupper()}
+    return deps
+
+def _script_fingerprint(name):
+    import china_config
+    h = hashlib.sha256()
+    used = set(ALWAYS_CONSTANTS)
+    deps = _config_function_deps()
+    stack, seen = [name], set()
+    while stack:
+        mod = stack.pop()
+        if mod in seen or mod in ('china_config', 'china_constants'):
+            continue
+        seen.add(mod)
+        src, tree = _parse_module(mod)
+        if src is None:
+            continue
+        h.update(mod.encode()); h.update(src)
+        names = _used_names(tree)
+        used.update(n for n in names if n.isupper())
+        for n in names & deps.keys():
+            used.update(deps[n])
+        stack.extend(sorted(set(_imports(tree))))
+
+    constants = {n: getattr(china_config, n) for n in sorted(used) if hasattr(china_config, n)}
+    config = hashlib.sha256(json.dumps(constants, sort_keys=True, default=repr, ensure_ascii=False).encode())
+    return h.hexdigest(), config.hexdigest()
+
+def _data_fingerprint(df, columns):
+    import pandas as pd
+    cols = ['year', 'recipient'] + [c for c in columns if c in df.columns]
+    h = hashlib.sha256(json.dumps([cols, sorted(set(columns) - set(cols))]).encode())
+    h.update(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def fingerprint(name, df):
+    from china_config import output_path
+    module = importlib.import_module(name)
+    script, config = _script_fingerprint(name)
+    return {
+        'script': script,
+        'config': config,
+        'data': _data_fingerprint(df, getattr(module, 'COLUMNS', list(df.columns))),
+        'outputs': [output_path(f) for f in getattr(module, 'OUTPUTS', [])],
+    }
+
+def is_up_to_date(entry, current):
+    return entry == current and bool(current['outputs']) and all(os.path.exists(f) for f in current['outputs'])
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def render_figure(name, df, **params):
+    # params — параметры из module.PARAMS (limit, periods), их задает china_server
+    import matplotlib.pyplot as plt
+    china_trace.set_figure(name)
+    with china_trace.stage('import'):
+        module = importlib.import_module(name)
+    try:
+        # Скрипты не меняют df (новые колонки — через assign), а поверхностная копия
+        # бережет общий кадр воркера, если скрипт все же что-то допишет: данные
+        # колонок (в воркере — mmap кэша) не копируются
+        with china_trace.stage('render'):
+            module.render(df.copy(deep=False), **params)
+    finally:
+        plt.close('all')
+
+def render_all(names, df):
+    failed = []
+    for name in names:
+        t0 = time.perf_counter()
+        try:
+            render_figure(name, df)
+        except Exception as e:
+            print(f"[{name}] ОШИБКА: {e}")
+            failed.append(name)
+            continue
+        print(f"[{name}] готово за {time.perf_counter() - t0:.1f} с")
+    return failed
+
+# === ПАРАЛЛЕЛЬНАЯ СБОРКА ===
+# Воркер не разбирает CSV: колонки кэша отображаются в память (mmap),
+# так что все процессы делят одни и те же страницы файла.
+_WORKER_DF = None
+
+def _init_worker(path, compact=False):
+    import matplotlib
+    matplotlib.use('Agg')
+    from china_config import load_data
+    global _WORKER_DF
+    # При fork воркер наследует события основного процесса — они уже учтены там
+    china_trace.drain()
+    china_trace.set_figure('render_all')
+    _WORKER_DF, _, _, _ = load_data(path, mmap=True, compact=compact)
+
+def _render_job(name):
+    if _WORKER_DF is None:
+        raise RuntimeError("воркер не смог загрузить данные")
+    t0 = time.perf_counter()
+    render_figure(name, _WORKER_DF)
+    # События трассировки воркера уходят в основной процесс вместе с результатом
+    return time.perf_counter() - t0, china_trace.drain()
+
+def render_parallel(names, jobs, path, compact=False):
+    failed = []
+    # Порядок FIGURES начинается с самых тяжелых графиков — они уходят в работу первыми
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(path, compact)) as pool:
+        futures = {pool.submit(_render_job, name): name for name in names}
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                elapsed, events = fut.result()
+            except Exception as e:
+                print(f"[{name}] ОШИБКА: {e}")
+                failed.append(name)
+                continue
+            china_trace.collect(events)
+            print(f"[{name}] готово за {elapsed:.1f} с")
+    return failed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Построение всех графиков за один запуск")
+    parser.add_argument('--only', nargs='+', metavar='FIG', help="построить только указанные графики")
+    parser.add_argument('--exclude', nargs='+', metavar='FIG', help="пропустить указанные графики")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="число параллельных процессов (0 — по числу ядер)")
+    parser.add_argument('--incremental', action='store_true',
+                        help=f"пропускать графики, входы которых не менялись с прошлой сборки ({MANIFEST_FILE})")
+    parser.add_argument('--compact', action='store_true',
+                        help="компактная схема данных (category/int16/float32/bool) для экономии памяти")
+    parser.add_argument('--flag-atlas', action='store_true',
+                        help="пересобрать атлас круглых флагов flags/.atlas.npy перед построением")
+    parser.add_argument('--profile', choices=['draft', 'print'],
+                        help="профиль рендера: draft — черновик 72 dpi, print — итоговые 300 dpi "
+                             "(по умолчанию из CHINA_RENDER_PROFILE, иначе print)")
+    parser.add_argument('--trace', nargs='?', const=china_trace.TRACE_FILE, metavar='FILE',
+                        help="замерить этапы (время, вызовы, память): сводка по графикам и трасса "
+                             f"в формате Chrome Trace (по умолчанию {china_trace.TRACE_FILE})")
+    parser.add_argument('--data', help="файл данных: CSV или книга XLSX (по умолчанию china_data.csv)")
+    parser.add_argument('--list', action='store_true', help="показать список графиков и выйти")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        print("\n".join(FIGURES))
+        return 0
+
+    names = select_figures(args.only, args.exclude)
+    if args.trace:
+        china_trace.enable(args.trace)
+    from china_config import load_data, build_flag_atlas, set_render_profile, DATA_FILE
+    if args.profile:
+        set_render_profile(args.profile)
+    if args.flag_atlas:
+        print(f"Атлас флагов: {build_flag_atlas()} шт.")
+    # Загрузка в основном процессе заодно прогревает кэш для воркеров
+    path = args.data or DATA_FILE
+    df, _, _, _ = load_data(path, compact=args.compact)
+    if df is None:
+        return 1
+
+    manifest = load_manifest()
+    current = {name: fingerprint(name, df) for name in names}
+    if args.incremental:
+        fresh = [n for n in names if is_up_to_date(manifest.get(n), current[n])]
+        for name in fresh:
+            print(f"[{name}] без изменений, пропускаем")
+        names = [n for n in names if n not in fresh]
+
+    failed = []
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    jobs = min(jobs, len(names))
+    if jobs > 1:
+        failed = render_parallel(names, jobs, path, args.compact)
+    elif names:
+        failed = render_all(names, df)
+
+    for name in names:
+        if name not in failed:
+            manifest[name] = current[name]
+    save_manifest(manifest)
+    if china_trace.enabled():
+        events = china_trace.drain()
+        print(china_trace.report(events))
+        print(f"Трасса: {china_trace.write_trace(events)}")
+    print(f"Построено: {len(names) - len(failed)}/{len(names)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# === БЮДЖЕТ ВРЕМЕНИ ИМПОРТА ===
+# Каждый модуль импортируется в чистом интерпретаторе (python -X importtime),
+# берется лучшее из нескольких повторов. Проверяется и то, что тяжелые
+# зависимости не подтягиваются при импорте: это не зависит от скорости машины.
+
+# Модуль -> допустимое время импорта, с. china_config при импорте загружает только
+# numpy: pandas, matplotlib и PIL подгружаются функциями, которым они нужны.
+BUDGETS = {
+    'china_constants': 0.02,
+    'china_ingest': 0.8,
+    'render_all': 0.1,
+    'china_config': 0.3,
+}
+# Не должны загружаться при импорте перечисленных модулей
+HEAVY_MODULES = ['sklearn', 'seaborn', 'scipy']
+# Для отдельных модулей — дополнительно к HEAVY_MODULES
+LAZY_MODULES = {
+    'china_config': ['pandas', 'matplotlib', 'PIL', 'china_indices'],
+}
+REPEATS = 3
+
+_PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+def measure(module, repeats=REPEATS):
+    best, heavy = None, []
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                               _PROBE.format(module=module, heavy=HEAVY_MODULES + LAZY_MODULES.get(module, []))],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{module}: {proc.stderr.strip().splitlines()[-1]}")
+        # Строка модуля верхнего уровня: "import time: self | cumulative | module"
+        total = None
+        for line in proc.stderr.splitlines():
+            parts = [p.strip() for p in line.split('|')]
+            if len(parts) == 3 and parts[2] == module:
+                total = int(parts[1]) / 1e6
+        heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+        if total is not None and (best is None or total < best):
+            best = total
+    return best, heavy
+
+def check(modules=None, repeats=REPEATS):
+    results, ok = {}, True
+    for module in modules or BUDGETS:
+        elapsed, heavy = measure(module, repeats)
+        budget = BUDGETS.get(module)
+        passed = not heavy and (budget is None or elapsed <= budget)
+        ok &= passed
+        results[module] = {'seconds': elapsed, 'budget': budget, 'heavy': heavy, 'ok': passed}
+        mark = "OK  " if passed else "FAIL"
+        limit = f" / {budget:.2f}" if budget is not None else ""
+        extra = f"  тяжелые модули: {', '.join(heavy)}" if heavy else ""
+        print(f"{mark} {module:<16} {elapsed:.3f}{limit} с{extra}")
+    return ok, results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка времени импорта модулей проекта")
+    parser.add_argument('modules', nargs='*', help=f"модули (по умолчанию: {', '.join(BUDGETS)})")
+    parser.add_argument('-n', '--repeats', type=int, default=REPEATS, help="число повторов, берется лучший")
+    parser.add_argument('--json', metavar='FILE', help="сохранить результаты в JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    ok, results = check(args.modules, args.repeats)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())